@@ -1,15 +1,20 @@
+from threading import Thread, Lock
+from Queue import Queue, Empty
 import importlib
+import json
+import ast
+import sys
 import os
 import traceback
 
 import zero_app
-from helpers import setup_logger
-from ui import Printer, Menu, HelpOverlay, GridMenu, Entry, \
+from helpers import setup_logger, monotonic
+from ui import Printer, Menu, HelpOverlay, GridMenu, Entry, IconAtlas, \
                GridMenuLabelOverlay, GridMenuSidebarOverlay, GridMenuNavOverlay
 
-from PIL import Image, ImageOps
-
 logger = setup_logger(__name__, "info")
+# Made absolute on import, since module paths can be relative to the working directory
+zpui_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 
 class AppManager(object):
@@ -32,6 +37,12 @@ class AppManager(object):
     }
     """
     ordering_cache = {}
+    import_times = {}
+    """Example of import_times (in seconds):
+    {'apps/network_apps/wpa_cli': 0.0812,
+    ...
+    'apps/system_apps/system': 0.0025}
+    """
 
     def __init__(self, app_directory, context_manager, config=None, default_plugins=True):
         self.subdir_menus = {}
@@ -41,28 +52,54 @@ class AppManager(object):
         self.subdir_paths = []
         self.app_list = {}
         self.failed_apps = {}
+        self.import_times = {}
         self.app_directory = app_directory
         self.cm = context_manager
         self.i, self.o = self.cm.get_io_for_context("main")
         self.config = config if config else {}
+        self.lazy_load = self.config.get("lazy_load", False)
+        self.prefetch_workers = self.config.get("prefetch_workers", 1)
+        self.prefetch_queue = Queue()
+        self.prefetch_lock = Lock()
+        cache_path = self.config.get("discovery_cache", "app_discovery_cache.json")
+        if cache_path and not os.path.isabs(cache_path):
+            # Relative to the ZPUI directory, not to the current working directory
+            cache_path = os.path.join(zpui_dir, cache_path)
+        self.discovery_cache = AppDiscoveryCache(cache_path) if cache_path else None
+        self.icon_atlas = None
         #logger.warning(self.config)
         if default_plugins and self.config.get("default_overlays", True):
             self.register_default_plugins()
 
+    def get_icon_atlas(self):
+        """
+        Returns an ``IconAtlas`` with the main menu icons and the sidebar,
+        creating it if it doesn't yet exist.
+        """
+        if self.icon_atlas is None:
+            cache_path = self.config.get("icon_atlas_cache", "icon_atlas")
+            if cache_path and not os.path.isabs(cache_path):
+                cache_path = os.path.join(zpui_dir, cache_path)
+            atlas = IconAtlas(self.o.device_mode, cache_path=cache_path)
+            dir = os.path.join(zpui_dir, "resources")
+            for f in os.listdir(dir):
+                if f.endswith(".png"):
+                    atlas.add(f.rsplit('.', 1)[0], os.path.join(dir, f))
+            atlas.add("sidebar", os.path.join(zpui_dir, "sidebar.png"), invert=True)
+            atlas.load()
+            self.icon_atlas = atlas
+        return self.icon_atlas
+
     def create_main_menu(self, menu_name, contents):
-        dir = "resources/"
-        icons = [f for f in os.listdir(dir) if f.endswith(".png")]
-        icon_paths = [[f.rsplit('.', 1)[0], os.path.join(dir, f)] for f in icons]
+        atlas = self.get_icon_atlas()
+        icon_names = [name for name in atlas.sources.keys() if name != "sidebar"]
         used_icons = []
         for entry in contents:
-            for icon_name, icon_path in icon_paths:
+            for icon_name in icon_names:
                 if entry.basename.startswith(icon_name):
-                    entry.icon = Image.open(icon_path)
+                    entry.icon = atlas.get(icon_name)
                     used_icons.append(icon_name)
-                    continue
-            else:
-                pass
-        print([x for x, y, in icon_paths if x not in used_icons])
+        logger.debug("Unused main menu icons: {}".format([x for x in icon_names if x not in used_icons]))
         font = ("Fixedsys62.ttf", 16)
         menu = GridMenu(contents, self.i, self.o, font=font, entry_width=32, name="Main menu", draw_lines=False,  exitable=False)
         menu.exit_entry = ["Exit", "exit"]
@@ -70,14 +107,13 @@ class AppManager(object):
         return menu
 
     def sidebar_cb(self, c, ui_el, coords):
-        sidebar_image = ImageOps.invert(Image.open("sidebar.png").convert('L'))
-        sidebar_image.convert(c.o.device_mode)
+        sidebar_image = self.get_icon_atlas().get("sidebar")
         c.image.paste(sidebar_image, (coords.left+3, coords.top-5))
 
     def overlay_main_menu(self, menu):
         main_menu_help = "ZPUI main menu. Navigate the folders to get to different apps, or press KEY_PROG2 (anywhere in ZPUI) to get to the context menu."
         GridMenuNavOverlay().apply_to(menu)
-        GridMenuSidebarOverlay(self.sidebar_cb).apply_to(menu)
+        GridMenuSidebarOverlay(self.sidebar_cb, static=True).apply_to(menu)
         GridMenuLabelOverlay().apply_to(menu)
         HelpOverlay(main_menu_help).apply_to(menu)
 
@@ -141,7 +177,8 @@ class AppManager(object):
     def load_all_apps(self, interactive=True):
         apps_blocked_in_config = self.config.get("do_not_load", [])
         self.subdir_paths.append(self.app_directory.rstrip("/"))
-        for path, subdirs, modules in app_walk(self.app_directory):
+        lazy_apps = []
+        for path, subdirs, modules in app_walk(self.app_directory, cache=self.discovery_cache):
             for subdir in subdirs:
                 subdir_path = os.path.join(path, subdir)
                 self.subdir_paths.append(subdir_path)
@@ -153,8 +190,14 @@ class AppManager(object):
                     if module_path in apps_blocked_in_config:
                         logger.warning("App {} blocked from config; not loading".format(module_path))
                         continue
-                    app = self.load_app(module_path)
-                    logger.info("Loaded app {}".format(module_path))
+                    metadata = get_app_metadata(module_path) if self.lazy_load else None
+                    if metadata and metadata["lazy"]:
+                        app = LazyApp(self, module_path, metadata)
+                        logger.info("Deferred loading app {}".format(module_path))
+                        lazy_apps.append(app)
+                    else:
+                        app = self.load_app(module_path)
+                        logger.info("Loaded app {}".format(module_path))
                     self.app_list[module_path] = app
                     menu_name = self.get_app_name(app, module_path)
                     self.bind_context(app, module_path, menu_name)
@@ -176,8 +219,70 @@ class AppManager(object):
                 else:
                     logger.info("Executed 'after all contexts' hook for {}".format(app_path))
         base_menu = self.create_menu_structure()
+        if self.discovery_cache:
+            self.discovery_cache.save()
+        self.log_import_times()
+        if lazy_apps and self.prefetch_workers:
+            self.start_prefetch(lazy_apps)
         return base_menu
 
+    def start_prefetch(self, lazy_apps):
+        """
+        Imports modules of lazily loaded apps in the background, so that
+        they're ready by the time they're activated. Python 2 has a global
+        import lock, so more than one worker only helps if apps' imports
+        block on something other than Python code (i.e. disk access).
+        """
+        for app in lazy_apps:
+            self.prefetch_queue.put(app)
+        for n in range(self.prefetch_workers):
+            t = Thread(target=self.prefetch_worker, name="App prefetch worker {}".format(n))
+            t.daemon = True
+            t.start()
+
+    def prefetch_worker(self):
+        while True:
+            try:
+                app = self.prefetch_queue.get_nowait()
+            except Empty:
+                break
+            try:
+                app.prefetch()
+            except:
+                logger.exception("Failed to prefetch app {}".format(app.path))
+                self.failed_apps[app.path] = traceback.format_exc()
+            # Only the worker that finishes the last app logs the import times
+            with self.prefetch_lock:
+                self.prefetch_queue.task_done()
+                finished = self.prefetch_queue.unfinished_tasks == 0
+            if finished:
+                logger.info("Finished prefetching apps")
+                self.log_import_times()
+
+    def import_app_module(self, app_path):
+        """
+        Imports the ``main.py`` of an app (given its import path), recording
+        the time the import took if the module hasn't yet been imported.
+        """
+        module_name = app_path + '.main'
+        if module_name in sys.modules:
+            return sys.modules[module_name]
+        start = monotonic()
+        app = importlib.import_module(module_name, package='apps')
+        self.import_times[app_path.replace('.', '/')] = monotonic() - start
+        return app
+
+    def log_import_times(self):
+        """Logs a table of app import times, the slowest apps first."""
+        if not self.import_times:
+            return
+        import_times = sorted(self.import_times.items(), key=lambda x: x[1], reverse=True)
+        width = max([len(path) for path, _ in import_times])
+        lines = ["App import times ({} apps, {:.3f}s total):".format(len(import_times), sum(self.import_times.values()))]
+        for path, import_time in import_times:
+            lines.append("{} {:8.1f}ms".format(path.ljust(width), import_time*1000))
+        logger.info("\n".join(lines))
+
     def app_has_callback(self, app):
         return (hasattr(app, "callback") and callable(app.callback)) or \
                (hasattr(app, "on_start") and callable(app.on_start))
@@ -225,10 +330,11 @@ class AppManager(object):
         app = self.load_app(app_import_path, threaded=threaded)
         return app_import_path, app
 
-    def load_app(self, path, threaded=True):
+    def load_app(self, path, threaded=True, context=None):
         app_path = path.replace('/', '.')
-        app = importlib.import_module(app_path + '.main', package='apps')
-        context = self.cm.create_context(app_path)
+        app = self.import_app_module(app_path)
+        if context is None:
+            context = self.cm.create_context(app_path)
         context.threaded = threaded
         i, o = self.cm.get_io_for_context(app_path)
         if is_class_based_module(app):
@@ -270,21 +376,34 @@ class AppManager(object):
         This function gets a subdirectory path and imports __init__.py from it.
         It then gets _menu_name attribute from __init__.py and returns it.
         If failed to either import __init__.py or get the _menu_name attribute,
-        it returns the subdirectory name.
+        it returns the subdirectory name. The menu name is stored in the
+        discovery cache, so __init__.py only needs to be imported once it changes.
         """
+        if self.discovery_cache:
+            menu_name = self.discovery_cache.get_metadata(subdir_path, "menu_name")
+            if menu_name is not None:
+                return menu_name
         subdir_import_path = subdir_path.replace('/', '.')
         try:
             subdir_object = importlib.import_module(subdir_import_path + '.__init__')
-            return subdir_object._menu_name
+            menu_name = subdir_object._menu_name
         except:
             logger.exception("Exception while loading __init__.py for subdir {}".format(subdir_path))
             return os.path.split(subdir_path)[1].capitalize().replace("_", " ")
+        if self.discovery_cache:
+            self.discovery_cache.set_metadata(subdir_path, "menu_name", menu_name)
+        return menu_name
 
     def get_ordering(self, path):
-        """This function gets a subdirectory path and imports __init__.py from it. It then gets _ordering attribute from __init__.py and returns it. It also caches the attribute for faster initialization.
+        """This function gets a subdirectory path and imports __init__.py from it. It then gets _ordering attribute from __init__.py and returns it. It also caches the attribute for faster initialization (both in memory and in the discovery cache).
         If failed to either import __init__.py or get the _ordering attribute, it returns an empty list."""
         if path in self.ordering_cache:
             return self.ordering_cache[path]
+        if self.discovery_cache:
+            ordering = self.discovery_cache.get_metadata(path, "ordering")
+            if ordering is not None:
+                self.ordering_cache[path] = ordering
+                return ordering
         import_path = path.replace('/', '.')
         ordering = []
         try:
@@ -294,14 +413,202 @@ class AppManager(object):
         except ImportError as e:
             logger.error("Exception while loading __init__.py for directory {}".format(path))
             logger.debug(e)
-        except AttributeError as e:
-            pass
-        finally:
+            # Not storing it in the discovery cache, in case it's a temporary problem
             self.ordering_cache[path] = ordering
             return ordering
+        except AttributeError as e:
+            pass
+        self.ordering_cache[path] = ordering
+        if self.discovery_cache:
+            self.discovery_cache.set_metadata(path, "ordering", ordering)
+        return ordering
 
 
-def app_walk(base_dir):
+class AppDiscoveryCache(object):
+    """
+    A persistent (JSON file-based) cache of the app directory tree, so that
+    ``app_walk`` doesn't need to list every directory and ``AppManager`` doesn't
+    need to import every ``__init__.py`` on each boot. For each directory,
+    stores its type (submenu directory, app directory or neither), its child
+    directories and submenu metadata (menu name and ordering).
+
+    Directory entries are keyed by modification times of the directory and its
+    ``__init__.py`` file - adding or removing files (i.e. ``main.py`` or
+    ``do_not_load``) changes the directory's modification time, so only the
+    directories that changed are rescanned.
+    """
+    version = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.dirs = {}
+        self.visited = set()
+        self.rescanned = []
+        self.changed = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            logger.info("App discovery cache not found or broken, rebuilding")
+            return
+        if data.get("version", None) == self.version:
+            self.dirs = data.get("dirs", {})
+
+    def save(self):
+        if not self.changed and set(self.dirs.keys()) == self.visited:
+            return
+        # Dropping directories that no longer exist (or are no longer part of the tree)
+        dirs = {path: info for path, info in self.dirs.items() if path in self.visited}
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, "w") as f:
+                json.dump({"version": self.version, "dirs": dirs}, f)
+            os.rename(temp_path, self.path)
+        except (IOError, OSError):
+            logger.exception("Can't save the app discovery cache to {}".format(self.path))
+        else:
+            self.dirs = dirs
+            self.changed = False
+        if self.rescanned:
+            logger.info("App discovery: rescanned {} of {} directories".format(len(self.rescanned), len(self.visited)))
+
+    def get_dir_info(self, dir_path):
+        """
+        Returns a dictionary with the directory's ``type`` ("subdir", "module"
+        or ``None``) and ``children`` (names of child directories). Only lists
+        the directory if it changed since the last time it was scanned.
+        """
+        dir_path = os.path.normpath(dir_path)
+        self.visited.add(dir_path)
+        stamp = [get_mtime(dir_path), get_mtime(os.path.join(dir_path, "__init__.py"))]
+        info = self.dirs.get(dir_path, None)
+        if info is not None and info["stamp"] == stamp:
+            return info
+        logger.debug("App discovery: scanning {}".format(dir_path))
+        self.rescanned.append(dir_path)
+        contents = os.listdir(dir_path)
+        children = [e for e in contents if os.path.isdir(os.path.join(dir_path, e))]
+        info = {"stamp": stamp, "type": get_dir_type(contents), "children": children}
+        self.dirs[dir_path] = info
+        self.changed = True
+        return info
+
+    def get_metadata(self, dir_path, key):
+        """Returns a cached metadata value for a directory, or ``None`` if it's not cached."""
+        info = self.dirs.get(os.path.normpath(dir_path), None)
+        return info.get(key, None) if info else None
+
+    def set_metadata(self, dir_path, key, value):
+        info = self.dirs.get(os.path.normpath(dir_path), None)
+        if info is not None and info.get(key, None) != value:
+            info[key] = value
+            self.changed = True
+
+
+def get_mtime(path):
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+class LazyApp(object):
+    """
+    A placeholder for an app that's only loaded once it's activated
+    (or once its module has been prefetched). Has the same menu name
+    as the app, and a callback that loads the app and calls its callback.
+    The app's context is created right away, so that it can be switched to.
+    """
+
+    def __init__(self, app_manager, path, metadata):
+        self.app_manager = app_manager
+        self.path = path
+        self.menu_name = metadata["menu_name"] if metadata["menu_name"] else \
+                         os.path.split(path)[-1].capitalize().replace("_", " ")
+        self.context = app_manager.cm.create_context(path.replace('/', '.'))
+        self.app = None
+        self.lock = Lock()
+
+    def prefetch(self):
+        self.app_manager.import_app_module(self.path.replace('/', '.'))
+
+    def load(self):
+        with self.lock:
+            if self.app is None:
+                logger.info("Loading app {}".format(self.path))
+                try:
+                    self.app = self.app_manager.load_app(self.path, context=self.context)
+                except:
+                    logger.exception("Failed to load app {}".format(self.path))
+                    self.app_manager.failed_apps[self.path] = traceback.format_exc()
+                    raise
+                self.app_manager.app_list[self.path] = self.app
+            return self.app
+
+    def callback(self):
+        try:
+            app = self.load()
+        except:
+            Printer(["Failed to load:", self.menu_name], self.app_manager.i, self.app_manager.o, 1)
+            return
+        if hasattr(app, "callback") and callable(app.callback):
+            return app.callback()
+        elif hasattr(app, "on_start") and callable(app.on_start):
+            return app.on_start()
+        else:
+            logger.error("App {} was loaded lazily, but doesn't have a callback!".format(self.path))
+
+
+def get_app_metadata(app_path):
+    """
+    Gets app metadata without importing the app, by parsing its ``main.py``.
+    Returns a dictionary with the app's ``menu_name`` (or ``None`` if it
+    can't be determined) and a ``lazy`` flag, which is ``True`` if the app can
+    be loaded lazily - that is, it has a callback and doesn't have hooks
+    that need to be called when ZPUI loads (``set_context`` and
+    ``execute_after_contexts``). Returns ``None`` if ``main.py`` can't be parsed.
+    """
+    try:
+        with open(os.path.join(app_path, "main.py"), "r") as f:
+            tree = ast.parse(f.read())
+    except (IOError, SyntaxError):
+        logger.exception("Can't parse main.py of app {}".format(app_path))
+        return None
+    # Only module-level functions and methods of the app class are the app's
+    # entry points and hooks - not nested functions or methods of other classes
+    app_classes = [node for node in tree.body if isinstance(node, ast.ClassDef) and is_zeroapp_class_def(node)]
+    nodes = list(tree.body)
+    for app_class in app_classes:
+        nodes += app_class.body
+    function_names = [node.name for node in nodes if isinstance(node, ast.FunctionDef)]
+    # The menu name can also be set in a method of the app class (i.e. ``__init__``)
+    for app_class in app_classes:
+        nodes += list(ast.walk(app_class))
+    menu_name = None
+    for node in nodes:
+        if isinstance(node, ast.Assign) and menu_name is None and isinstance(node.value, ast.Str):
+            for target in node.targets:
+                if (isinstance(target, ast.Name) and target.id == "menu_name") or \
+                   (isinstance(target, ast.Attribute) and target.attr == "menu_name"):
+                    menu_name = node.value.s
+    has_callback = "callback" in function_names or "on_start" in function_names
+    has_hooks = "set_context" in function_names or "execute_after_contexts" in function_names
+    return {"menu_name": menu_name, "lazy": has_callback and not has_hooks}
+
+
+def is_zeroapp_class_def(node):
+    """Checks whether a class definition (an ``ast.ClassDef``) inherits from ``ZeroApp``."""
+    for base in node.bases:
+        if (isinstance(base, ast.Name) and base.id == "ZeroApp") or \
+           (isinstance(base, ast.Attribute) and base.attr == "ZeroApp"):
+            return True
+    return False
+
+
+def app_walk(base_dir, cache=None):
     """Example of app_walk(directory):
     [('./apps', ['ee_apps', 'media_apps', 'test', 'system_apps', 'skeleton', 'network_apps'], ['__init__.pyc', '__init__.py']),
     ('./apps/ee_apps', ['i2ctools'], ['__init__.pyc', '__init__.py']),
@@ -309,20 +616,27 @@ def app_walk(base_dir):
     ('./apps/media_apps', ['mocp', 'volume'], ['__init__.pyc', '__init__.py']),
     ('./apps/media_apps/mocp', [], ['__init__.pyc', '__init__.py', 'main.pyc', 'main.py']),
     ('./apps/media_apps/volume', [], ['__init__.pyc', '__init__.py', 'main.pyc', 'main.py'])]
+
+    If an ``AppDiscoveryCache`` is passed, only the directories that changed
+    since they were last scanned are listed.
     """
     walk_results = []
     modules = []
     subdirs = []
-    for element in os.listdir(base_dir):
+    if cache is not None:
+        children = [(e, cache.get_dir_info(os.path.join(base_dir, e))["type"]) for e in cache.get_dir_info(base_dir)["children"]]
+    else:
+        children = [(e, get_dir_type(os.listdir(os.path.join(base_dir, e)))) for e in os.listdir(base_dir) \
+                    if os.path.isdir(os.path.join(base_dir, e))]
+    for element, dir_type in children:
         full_path = os.path.join(base_dir, element)
-        if os.path.isdir(full_path):
-            if is_subdir(full_path):
-                subdirs.append(element)
-                results = app_walk(full_path)
-                for result in results:
-                    walk_results.append(result)
-            elif is_module_dir(full_path):
-                modules.append(element)
+        if dir_type == "subdir":
+            subdirs.append(element)
+            results = app_walk(full_path, cache=cache)
+            for result in results:
+                walk_results.append(result)
+        elif dir_type == "module":
+            modules.append(element)
     walk_results.append((base_dir, subdirs, modules))
     return walk_results
 
@@ -346,13 +660,31 @@ def is_class_based_module(module_):
 
 
 def is_module_dir(dir_path):
-    contents = os.listdir(dir_path)
-    return "main.py" in contents and "do_not_load" not in contents
+    return get_dir_type(os.listdir(dir_path)) == "module"
 
 
 def is_subdir(dir_path):
-    contents = os.listdir(dir_path)
-    return "__init__.py" in contents and "main.py" not in contents and "do_not_load" not in contents
+    return get_dir_type(os.listdir(dir_path)) == "subdir"
+
+
+def get_dir_type(contents):
+    """
+    Given a list of files in a directory, returns "module" if it's an app
+    directory, "subdir" if it's a submenu directory, ``None`` otherwise.
+
+    >>> get_dir_type(["__init__.py", "main.py"])
+    'module'
+    >>> get_dir_type(["__init__.py", "main.py", "do_not_load"])
+    >>> get_dir_type(["__init__.py", "network_apps"])
+    'subdir'
+    """
+    if "do_not_load" in contents:
+        return None
+    if "main.py" in contents:
+        return "module"
+    if "__init__.py" in contents:
+        return "subdir"
+    return None
 
 
 if __name__ == "__main__":
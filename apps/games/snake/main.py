@@ -162,16 +162,16 @@ def create_apple():
 
 def draw_field():
 	c = Canvas(o)
-	c.rectangle((0, 0, width-1, height-1))
-	c.point(snake)
 	if not(applex and appley):
 		create_apple()
 	if level == 1:		# We draw the apple
-		c.point([(applex, appley-1),									# the leaf
+		apple = [(applex, appley-1),									# the leaf
 			(applex-1, appley),(applex, appley),(applex+1, appley),	# the top half
-			(applex-1, appley+1),(applex, appley+1),(applex+1, appley+1)]) # the lower half
+			(applex-1, appley+1),(applex, appley+1),(applex+1, appley+1)] # the lower half
 	else:
-		c.point((applex, appley))
+		apple = [(applex, appley)]
+	# The whole field in one call - all the coordinates are integers already
+	c.draw_batch(points=snake+apple, rectangles=[(0, 0, width-1, height-1)], checked=True)
 	c.display() 		# Display the canvas on the screen
 
 def start_game():
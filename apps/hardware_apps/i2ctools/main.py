@@ -93,11 +93,11 @@ def i2c_read_ui(address, reg=None):
         last_values.append(answer)
         return fvitg(list(reversed(last_values)), o)
 
-    r = Refresher(read_value, i, o, refresh_interval=0.5)
+    r = Refresher(read_value, i, o, refresh_interval=0.5, async_refresh=True, refresh_timeout=2)
     def change_interval(): # A helper function to adjust the Refresher's refresh interval while it's running
-        new_interval = IntegerAdjustInput(int(r.refresh_interval), i, o, message="Refresh interval:").activate()
+        new_interval = IntegerAdjustInput(int(r.refresh_interval*1000), i, o, message="Interval, ms:", interval=10, min=10).activate()
         if new_interval is not None:
-            r.set_refresh_interval(new_interval)
+            r.set_refresh_interval(new_interval/1000.0)
     r.update_keymap({"KEY_RIGHT":change_interval})
     r.activate()
 
@@ -35,7 +35,7 @@ def show_status():
 i = None; o = None
 
 def callback():
-    Refresher(show_status, i, o, 0.1, name="Assistant status monitor").activate()
+    Refresher(show_status, i, o, 0.1, name="Assistant status monitor", async_refresh=True, refresh_timeout=5).activate()
 
 def init_app(input, output):
     global i, o
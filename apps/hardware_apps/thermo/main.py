@@ -25,7 +25,7 @@ i = None #Input device
 o = None #Output device
 
 def callback():
-    Refresher(show_temp, i, o, 0.1, name="Temperature monitor").activate()
+    Refresher(show_temp, i, o, 0.1, name="Temperature monitor", async_refresh=True, refresh_timeout=2).activate()
 
 def init_app(input, output):
     global i, o
@@ -13,18 +13,21 @@ config_path = local_path(config_filename)
 config = read_or_create_config(config_path, default_config, menu_name+" app")
 
 import os
-from subprocess import call, check_output
+from subprocess import call
 
 from ui import Menu, IntegerAdjustInput, Listbox, ellipsize
+from libs.command_cache import get_command_cache
 
 #amixer commands
 def amixer_command(command):
     with open(os.devnull, "w") as f:
-        return call(['amixer'] + list(command), stdout=f)
+        result = call(['amixer'] + list(command), stdout=f)
+    get_command_cache().invalidate(["amixer"])
+    return result
 
 def amixer_get_channels():
     controls = []
-    output = check_output(['amixer', '-c', str(config["card"])])
+    output = get_command_cache().check_output(['amixer', '-c', str(config["card"])], ttl=5)
     for line in output.split('\n'):
         if 'mixer control' in line:
             controls.append(line.split("'")[1])
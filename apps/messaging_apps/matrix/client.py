@@ -9,7 +9,7 @@ logger = setup_logger(__name__, 'info')
 
 class Client():
 
-	def __init__(self, username, password=None, token=None, server="matrix.org"):
+	def __init__(self, username, password=None, token=None, server="matrix.org", cache=None):
 
 		self.username = username
 		self.server = server
@@ -19,7 +19,9 @@ class Client():
 
 		# Create the matrix client
 		if token == None and password != None:
-			self.matrix_client = MatrixClient(self.server_url)
+			self.matrix_client = MatrixClient(self.server_url, lazy_sync=True)
+			if cache is not None:
+				cache.attach(self.matrix_client)
 
 			# Try logging in the user
 			try:
@@ -37,9 +39,17 @@ class Client():
 				logger.exception("Bad URL format")
 
 		else:
-			self.matrix_client = MatrixClient(self.server_url, token=token, user_id=username)
+			self.matrix_client = MatrixClient(self.server_url, token=token, user_id=username, initial_sync=False, lazy_sync=True)
 			self.user = User(self.matrix_client, self.matrix_client.user_id)
 
+			# Restoring the rooms from the cache lets the sync continue from the stored sync token,
+			# otherwise, a full initial sync is needed
+			restored = cache is not None and cache.restore(self.matrix_client)
+			if cache is not None:
+				cache.attach(self.matrix_client)
+			if not restored:
+				self.matrix_client.listen_for_events()
+
 	# Return the user's display name
 	def get_user_display_name(self):
 		return self.user.get_display_name()
@@ -7,6 +7,8 @@ from ui import Listbox, PrettyPrinter as Printer, NumpadCharInput, Menu, Loading
 from helpers import setup_logger, read_or_create_config, local_path_gen, save_config_method_gen, BackgroundRunner
 
 from client import Client, MatrixRequestError
+from store import MessageStore
+from timeline_cache import TimelineCache
 
 local_path = local_path_gen(__name__)
 
@@ -15,8 +17,9 @@ logger = setup_logger(__name__, "info")
 class MatrixClientApp(ZeroApp):
 
 	menu_name = "Matrix Client"
-	default_config = '{"server":"matrix.org", "user_id":"", "token":"", "your_other_usernames":[], "show_join_leave_messages":"True"}'
+	default_config = '{"server":"matrix.org", "user_id":"", "token":"", "your_other_usernames":[], "show_join_leave_messages":"True", "max_messages_per_room":500}'
 	config_filename = "config.json"
+	timeline_cache_filename = "timeline_cache.db"
 
 	client = None
 
@@ -28,6 +31,7 @@ class MatrixClientApp(ZeroApp):
 		self.save_config = save_config_method_gen(self, local_path(self.config_filename))
 
                 self.server = self.config.get("server", "matrix.org")
+		self.timeline_cache = TimelineCache(local_path(self.timeline_cache_filename))
 		self.login_runner = BackgroundRunner(self.background_login)
 		self.login_runner.run()
 
@@ -37,7 +41,8 @@ class MatrixClientApp(ZeroApp):
 		self.stored_messages = {}
 		self.messages_menu = None
 		self.active_room = ""
-		self.seen_events = []
+		# Menu entries generated for each room's messages, see _get_messages_menu_contents
+		self.menu_contents = {}
 		self.has_processed_new_events = Event()
 
 	def on_start(self):
@@ -77,7 +82,7 @@ class MatrixClientApp(ZeroApp):
 
 	def login_with_token(self):
 		try:
-			self.client = Client(self.config['user_id'], token=self.config['token'], server=self.server)
+			self.client = Client(self.config['user_id'], token=self.config['token'], server=self.server, cache=self.timeline_cache)
 		except MatrixRequestError as e:
 			logger.exception("Wrong or outdated token/username?")
 			logger.error(dir(e))
@@ -114,7 +119,7 @@ class MatrixClientApp(ZeroApp):
 
 		# Show a beautiful loading animation while setting everything up
 		with LoadingIndicator(self.i, self.o, message="Logging in ...") as l:
-			self.client = Client(username, password=password, server=self.server)
+			self.client = Client(username, password=password, server=self.server, cache=self.timeline_cache)
 
 			# Store username and token
 			if self.client.logged_in:
@@ -137,10 +142,7 @@ class MatrixClientApp(ZeroApp):
 		# Add a listener for new events to all rooms the user is in
 		for room_name in self.rooms:
 			self.rooms[room_name].add_listener(self._on_message)
-			self.stored_messages[room_name] = {}
-
-			# Used to store data for each event
-			self.stored_messages[room_name]["events"] = []
+			self._get_store(room_name)
 
 		# Start a new thread for the listeners, waiting for events to happen
 		self.client.matrix_client.start_listener_thread()
@@ -153,6 +155,7 @@ class MatrixClientApp(ZeroApp):
 			current_room = self.rooms[r]
 
 			# Count the amount of backfilled messages for each room
+			self._get_store(current_room.room_id)
 			self.stored_messages[current_room.room_id]["backfilled"] = 0
 
 			# Get the last 10 messages for each room and update stored_messages
@@ -197,6 +200,7 @@ class MatrixClientApp(ZeroApp):
 		self.config["token"] = ''
 		self.config["username"] = ''
 		self.save_config()
+		self.timeline_cache.clear()
 		self.init_vars()
 
 		raise MenuExitException
@@ -247,10 +251,9 @@ class MatrixClientApp(ZeroApp):
 
 	# Used as callback for the room listeners
 	def _on_message(self, room, event):
-		if event["event_id"] in self.seen_events:
+		if not self._get_store(room.room_id).mark_seen(event["event_id"]):
 			logger.debug("Event {} seen, ignoring".format(event["event_id"]))
 			return
-		self.seen_events.append(event["event_id"])
 		logger.debug(u"New event: {}".format(event['type']))
 		event_type = event.get('type', "not_a_defined_event")
 		# Check if a user joined the room
@@ -318,35 +321,48 @@ class MatrixClientApp(ZeroApp):
 			logger.debug("New event processed, setting flag")
 		self.has_processed_new_events.set()
 
+	# Returns the message store for a room, creating it if the room is new
+	def _get_store(self, room_id):
+		if room_id not in self.stored_messages:
+			max_messages = int(self.config.get("max_messages_per_room", 500))
+			self.stored_messages[room_id] = {"events": MessageStore(max_messages=max_messages), "backfilled": 0}
+		return self.stored_messages[room_id]["events"]
+
 	def _add_new_message(self, room_id, new_message):
-		# Check whether it's a duplicate - shouldn't trigger because of the deduplication
-		for m in self.stored_messages[room_id]['events']:
-			if m['id'] == new_message['id']:
-				logger.error("Message ID check triggered despite deduplication")
-				return
+		# Duplicates are filtered out by deduplication in _on_message, so False
+		# means the store is full and the message is older than all the stored ones
+		if not self._get_store(room_id).add(new_message):
+			logger.debug("Message {} not stored".format(new_message['id']))
 
-		self.stored_messages[room_id]['events'].append(new_message)
+	def _get_message_entry(self, message):
+		if "menu_entry" not in message:
+			content = rfa(message["content"])
+			message["menu_entry"] = [content, lambda c=content, s=rfa(message['sender']), t=message['timestamp']: self.display_single_message(c, s, t)]
+		return message["menu_entry"]
 
 	# Uses stored_messages to create a suitable list of menu entries for MessagesMenu
 	def _get_messages_menu_contents(self, room_id):
-		# Sort messages by their timestamp
-		sorted_messages = sorted(self.stored_messages[room_id]['events'], key=lambda k: k['timestamp'])
-
-		menu_contents = []
-
-		for message in sorted_messages:
-			if not self.config["show_join_leave_messages"] and message["type"] == "m.room.member":
+		store = self._get_store(room_id)
+		show_join_leave = self.config["show_join_leave_messages"]
+		generation, shown, processed, entries = self.menu_contents.get(room_id, (None, None, 0, []))
+		if generation != store.generation or shown != show_join_leave:
+			# Messages were inserted in the middle or evicted, regenerating the list
+			processed, entries = 0, []
+		# Otherwise, only the messages appended since the last call need to be processed
+		for message in store.messages[processed:]:
+			if not show_join_leave and message["type"] == "m.room.member":
 				continue
-			content = rfa(message["content"])
-			menu_contents.append([content, lambda c=content, s=rfa(message['sender']), t=message['timestamp']: self.display_single_message(c, s, t)])
+			entries.append(self._get_message_entry(message))
+		self.menu_contents[room_id] = (store.generation, show_join_leave, len(store), entries)
 
-		menu_contents.append(["Write message", lambda r=self.rooms[room_id]: self.write_message(r)])
-
-		return menu_contents
+		return entries + [["Write message", lambda r=self.rooms[room_id]: self.write_message(r)]]
 
 	# Callback for MessagesMenu
 	def _handle_messages_top(self, room):
 		messages_to_load = 5
+		if self._get_store(room.room_id).is_full():
+			# Older messages wouldn't be stored anyway
+			return False
 		self.has_processed_new_events.clear()
 		try:
 			room.backfill_previous_messages(limit=self.stored_messages[room.room_id]["backfilled"]+messages_to_load, reverse=True, num_of_messages=messages_to_load)
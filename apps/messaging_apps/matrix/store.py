@@ -0,0 +1,79 @@
+from bisect import bisect_right
+from collections import deque
+from itertools import count
+
+
+class MessageStore(object):
+	"""
+	Stores messages of a single room, ordered by their timestamps and indexed by
+	their event IDs. Keeps at most ``max_messages`` messages - once that's reached,
+	the oldest messages are evicted to make place for new ones, and messages older
+	than all the stored ones aren't added. Also keeps the IDs of the last ``max_seen``
+	events received, so that events received twice can be ignored.
+	"""
+
+	def __init__(self, max_messages=500, max_seen=2000):
+		self.max_messages = max_messages
+		self.max_seen = max_seen
+		# Sort keys, (timestamp, insertion counter), kept in the same order as the messages
+		self.keys = []
+		self.messages = []
+		self.index = {}
+		self.seen = set()
+		self.seen_order = deque()
+		self.counter = count()
+		# Incremented each time messages are inserted before other messages or evicted
+		self.generation = 0
+
+	def mark_seen(self, event_id):
+		"""
+		Returns False if the event has already been seen, otherwise
+		remembers the event ID and returns True.
+		"""
+		if event_id in self.seen:
+			return False
+		self.seen.add(event_id)
+		self.seen_order.append(event_id)
+		if len(self.seen_order) > self.max_seen:
+			self.seen.discard(self.seen_order.popleft())
+		return True
+
+	def add(self, message):
+		"""
+		Adds a message (a dictionary with "id" and "timestamp" keys) to the store.
+		Returns False if the message has been stored already or is too old to be stored.
+		"""
+		if message['id'] in self.index:
+			return False
+		key = (message['timestamp'], next(self.counter))
+		if self.is_full() and key < self.keys[0]:
+			return False
+		position = bisect_right(self.keys, key)
+		self.keys.insert(position, key)
+		self.messages.insert(position, message)
+		self.index[message['id']] = message
+		if position != len(self.messages) - 1:
+			self.generation += 1
+		if len(self.messages) > self.max_messages:
+			evicted = len(self.messages) - self.max_messages
+			for old_message in self.messages[:evicted]:
+				del self.index[old_message['id']]
+			del self.keys[:evicted]
+			del self.messages[:evicted]
+			self.generation += 1
+		return True
+
+	def is_full(self):
+		return len(self.messages) >= self.max_messages
+
+	def get(self, message_id, default=None):
+		return self.index.get(message_id, default)
+
+	def __contains__(self, message_id):
+		return message_id in self.index
+
+	def __len__(self):
+		return len(self.messages)
+
+	def __iter__(self):
+		return iter(self.messages)
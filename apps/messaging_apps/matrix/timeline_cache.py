@@ -0,0 +1,128 @@
+import json
+import sqlite3
+from threading import Lock
+
+from libs.matrix_client.matrix_client.room import Room
+from helpers import setup_logger
+
+logger = setup_logger(__name__, "info")
+
+
+class TimelineCache(object):
+	"""
+	Keeps the Matrix client state - joined rooms with their state events, recent
+	timeline events and ``prev_batch`` tokens, as well as the client's sync token -
+	in an SQLite database. That way, after a restart, the room list and the latest
+	messages can be shown right away, and syncing continues from the stored sync
+	token instead of starting with a full initial sync.
+	"""
+
+	events_per_room = 20
+
+	schema = [
+		"CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+		"CREATE TABLE IF NOT EXISTS rooms (room_id TEXT PRIMARY KEY, prev_batch TEXT, summary TEXT)",
+		"CREATE TABLE IF NOT EXISTS state_events (room_id TEXT, type TEXT, state_key TEXT, event TEXT, "
+			"PRIMARY KEY (room_id, type, state_key))",
+		"CREATE TABLE IF NOT EXISTS events (seq INTEGER PRIMARY KEY, event_id TEXT UNIQUE, room_id TEXT, event TEXT)",
+		"CREATE INDEX IF NOT EXISTS events_room ON events (room_id, seq)",
+	]
+
+	def __init__(self, path):
+		self.path = path
+		self.lock = Lock()
+		# Syncs are stored from the listener thread, so the connection is shared between threads
+		self.conn = sqlite3.connect(path, check_same_thread=False)
+		with self.lock, self.conn:
+			for statement in self.schema:
+				self.conn.execute(statement)
+
+	def _get_meta(self, key):
+		row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+		return row[0] if row else None
+
+	def _set_meta(self, key, value):
+		self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+	def _clear(self):
+		for table in ("meta", "rooms", "state_events", "events"):
+			self.conn.execute("DELETE FROM {}".format(table))
+
+	def _forget_room(self, room_id):
+		for table in ("rooms", "state_events", "events"):
+			self.conn.execute("DELETE FROM {} WHERE room_id = ?".format(table), (room_id,))
+
+	def clear(self):
+		"""Removes all the stored data - i.e. when the user logs out."""
+		with self.lock, self.conn:
+			self._clear()
+
+	def restore(self, client):
+		"""
+		Recreates the rooms stored for ``client.user_id`` in the client and sets
+		the client's sync token. Returns False if there's nothing stored for the user.
+		"""
+		with self.lock:
+			if self._get_meta("user_id") != client.user_id:
+				return False
+			sync_token = self._get_meta("sync_token")
+			if sync_token is None:
+				return False
+			rooms = self.conn.execute("SELECT room_id, prev_batch, summary FROM rooms").fetchall()
+			for room_id, prev_batch, summary in rooms:
+				room = Room(client, room_id, verify_devices=client.verify_devices)
+				room.prev_batch = prev_batch
+				room.summary = json.loads(summary) if summary else {}
+				for (event,) in self.conn.execute("SELECT event FROM state_events WHERE room_id = ?", (room_id,)):
+					if client.lazy_sync:
+						room._defer_state_event(json.loads(event))
+					else:
+						room._process_state_event(json.loads(event))
+				# State is already up to date, so the events are added without being processed
+				events = self.conn.execute("SELECT event FROM events WHERE room_id = ? ORDER BY seq DESC LIMIT ?",
+				                           (room_id, room.event_history_limit)).fetchall()
+				for (event,) in reversed(events):
+					room.events.append(json.loads(event))
+				client.rooms[room_id] = room
+			client.sync_token = sync_token
+		logger.info("Restored {} rooms from the timeline cache".format(len(rooms)))
+		return True
+
+	def attach(self, client):
+		"""Makes the cache store every sync response the client processes."""
+		client.add_sync_listener(lambda response: self.store_sync(client.user_id, response))
+
+	def store_sync(self, user_id, response):
+		"""Stores a /sync response in a single transaction."""
+		rooms = response.get("rooms", {})
+		with self.lock, self.conn:
+			if self._get_meta("user_id") != user_id:
+				# Another user has logged in
+				self._clear()
+				self._set_meta("user_id", user_id)
+			for room_id in rooms.get("leave", {}):
+				self._forget_room(room_id)
+			for room_id, sync_room in rooms.get("join", {}).items():
+				timeline = sync_room.get("timeline", {})
+				row = self.conn.execute("SELECT prev_batch, summary FROM rooms WHERE room_id = ?", (room_id,)).fetchone()
+				prev_batch, summary = row if row else (None, None)
+				if "summary" in sync_room:
+					# Summary is only sent when it changes
+					summary = json.dumps(dict(json.loads(summary) if summary else {}, **sync_room["summary"]))
+				self.conn.execute("INSERT OR REPLACE INTO rooms (room_id, prev_batch, summary) VALUES (?, ?, ?)",
+				                  (room_id, timeline.get("prev_batch", prev_batch), summary))
+				events = timeline.get("events", [])
+				state_events = sync_room.get("state", {}).get("events", []) + [e for e in events if "state_key" in e]
+				self.conn.executemany("INSERT OR REPLACE INTO state_events (room_id, type, state_key, event) VALUES (?, ?, ?, ?)",
+				                      [(room_id, e["type"], e["state_key"], json.dumps(e)) for e in state_events if "type" in e])
+				if events:
+					self.conn.executemany("INSERT OR IGNORE INTO events (event_id, room_id, event) VALUES (?, ?, ?)",
+					                      [(e.get("event_id", None), room_id, json.dumps(e)) for e in events])
+					self.conn.execute("DELETE FROM events WHERE room_id = ? AND seq NOT IN "
+					                  "(SELECT seq FROM events WHERE room_id = ? ORDER BY seq DESC LIMIT ?)",
+					                  (room_id, room_id, self.events_per_room))
+			self._set_meta("sync_token", response["next_batch"])
+
+	def close(self):
+		with self.lock:
+			self.conn.close()
@@ -455,7 +455,7 @@ def status_refresher_data():
 
 def status_monitor():
     keymap = {"KEY_ENTER":wireless_status, "KEY_RIGHT":lambda: scan(False), "KEY_UP":lambda: reconnect()}
-    refresher = Refresher(status_refresher_data, i, o, 0.5, keymap, "Wireless monitor")
+    refresher = Refresher(status_refresher_data, i, o, 0.5, keymap, "Wireless monitor", async_refresh=True, refresh_timeout=5)
     refresher.activate()
 
 def get_wireless_status_mc():
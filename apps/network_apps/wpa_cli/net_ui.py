@@ -25,3 +25,13 @@ class NetworkMenuRenderingMixin(MenuRenderingMixin):
             else:
                 # draw "o" on the top
                 c.text("o", (x, y))
+
+    def get_line_extras(self, index):
+        # The markers drawn by draw_graphic depend on the entry's flags, not only its text
+        entry = self.el.contents[self.first_displayed_entry + index/self.entry_height]
+        extras = MenuRenderingMixin.get_line_extras(self, index)
+        if isinstance(entry, Entry) \
+          and hasattr(entry, "network_secured") \
+          and hasattr(entry, "network_known"):
+            return (extras, entry.network_known, entry.network_secured)
+        return extras
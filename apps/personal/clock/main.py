@@ -10,7 +10,7 @@ from subprocess import check_output, CalledProcessError
 
 from apps import ZeroApp
 from actions import FirstBootAction
-from ui import Menu, Refresher, Canvas, IntegerAdjustInput, Listbox, LoadingBar, PrettyPrinter as Printer
+from ui import Menu, Refresher, get_pooled_canvas, IntegerAdjustInput, Listbox, LoadingBar, PrettyPrinter as Printer
 
 from helpers import read_or_create_config, local_path_gen, setup_logger
 
@@ -136,9 +136,10 @@ class ClockApp(ZeroApp, Refresher):
         clock_y = eval(clock_y)
         radius = eval(radius)
         c.ellipse((clock_x - radius, clock_y - radius, clock_x + radius, clock_y + radius), fill=False, outline="white")
-        self.draw_needle(c, 60 - time.second / 60, eval(s_len), clock_x, clock_y, 1)
-        self.draw_needle(c, 60 - time.minute / 60, eval(m_len), clock_x, clock_y, 1)
-        self.draw_needle(c, 24 - time.hour / 24, eval(h_len), clock_x, clock_y, 1)
+        needles = [self.get_needle_coords(60 - time.second / 60, eval(s_len), clock_x, clock_y),
+                   self.get_needle_coords(60 - time.minute / 60, eval(m_len), clock_x, clock_y),
+                   self.get_needle_coords(24 - time.hour / 24, eval(h_len), clock_x, clock_y)]
+        c.draw_batch(lines=needles, width=1, fill=True, checked=True)
 
     def draw_countdown(self, c, countdown_x="(center_x/2)-10", countdown_y="center_y/2*3", **kwargs):
         """Draws the digital clock, with parameters configurable through config.json."""
@@ -167,7 +168,7 @@ class ClockApp(ZeroApp, Refresher):
         return self.render_clock(current_time, **self.config)
 
     def render_clock(self, time, **kwargs):
-        c = Canvas(self.o)
+        c = get_pooled_canvas(self.o)
         width, height = c.size
         self.draw_text(c, time, **kwargs)
         self.draw_analog_clock(c, time, **kwargs)
@@ -175,18 +176,14 @@ class ClockApp(ZeroApp, Refresher):
             self.draw_countdown(c, **kwargs)
         return c.get_image()
 
-    def draw_needle(self, c, progress, radius, x, y, width):
-        # type: (Canvas, float, float, float, float, int) -> None
+    def get_needle_coords(self, progress, radius, x, y):
+        # type: (float, float, float, float) -> tuple
         hour_angle = math.pi * 2 * progress + math.pi
-        c.line(
-            (
-                int(x),
-                int(y),
-                int(x + radius * math.sin(hour_angle)),
-                int(y + radius * math.cos(hour_angle))
-            ),
-            width=width,
-            fill=True
+        return (
+            int(x),
+            int(y),
+            int(x + radius * math.sin(hour_angle)),
+            int(y + radius * math.cos(hour_angle))
         )
 
     def on_start(self):
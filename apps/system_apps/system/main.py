@@ -22,7 +22,7 @@ def uptime_load_data():
     return [uptime_string, loadavg_string]
 
 def uptime_load_monitor():
-    Refresher(uptime_load_data, i, o, 1).activate()
+    Refresher(uptime_load_data, i, o, 1, async_refresh=True).activate()
 
 def memory_menu_data():
     memory_info = sys_info.free()
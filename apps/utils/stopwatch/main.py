@@ -14,7 +14,7 @@ class StopwatchApp(ZeroApp):
         self.__instructions = ["", "UP/ENTER to start/pause", "RIGHT : restart", "DOWN : reset"]
 
     def on_start(self):
-        self.refresher = Refresher(self.refresh_function, self.i, self.o, .1, {
+        self.refresher = Refresher(self.refresh_function, self.i, self.o, .05, {
             "KEY_UP": self.counter.toggle,
             "KEY_RIGHT": self.counter.start,
             "KEY_ENTER": self.counter.toggle,
@@ -0,0 +1,116 @@
+#!/usr/bin/env python2
+"""
+Counts PIL images (and image memory) allocated per frame by UI elements that
+draw a new frame on each refresh - with a new ``Canvas`` created for every frame
+vs. with canvases reused from the output's ``CanvasPool``. Also measures the
+time a frame takes in both cases.
+
+ZPUI runs on Python 2, which doesn't have ``tracemalloc`` - and image buffers
+are allocated by PIL outside of the Python allocator anyway, so allocations
+are counted by wrapping ``PIL.Image.Image._new``, which every new image
+(``Image.new()``, ``copy()``, ``crop()``, conversions) goes through.
+
+Usage: ``python benchmarks/canvas_allocations.py [frame_count]``
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock import Mock
+from PIL import Image
+
+from ui import Throbber, CircularProgressBar, GridMenu, GridMenuLabelOverlay, MockOutput
+from ui.canvas import CanvasPool
+
+
+class BenchmarkOutput(MockOutput):
+    """ Keeps a reference to the image displayed, the way output proxies do. """
+    rows = 8
+    cols = 21
+    char_width = 6
+    char_height = 8
+    current_image = None
+
+    def display_image(self, image, **kwargs):
+        self.current_image = image
+
+    def display_data(self, *data):
+        pass
+
+    def clear(self):
+        pass
+
+
+class AllocationCounter(object):
+    # Bytes per pixel that PIL uses to store images of a given mode
+    pixel_sizes = {"1": 1, "L": 1, "P": 1}
+
+    def __init__(self):
+        self.images = 0
+        self.bytes = 0
+
+    def __enter__(self):
+        self.original_new = original_new = Image.Image._new
+        counter = self
+        def _new(image, im):
+            counter.images += 1
+            counter.bytes += im.size[0]*im.size[1]*self.pixel_sizes.get(im.mode, 4)
+            return original_new(image, im)
+        Image.Image._new = _new
+        return self
+
+    def __exit__(self, *exc_info):
+        Image.Image._new = self.original_new
+
+
+def get_throbber():
+    t = Throbber(Mock(), BenchmarkOutput(), message="Loading")
+    t.in_foreground = True
+    return t.refresh
+
+def get_progress_bar():
+    pb = CircularProgressBar(Mock(), BenchmarkOutput())
+    def refresh():
+        # Setting the progress refreshes the progress bar
+        pb.progress = (pb.progress + 1) % 100
+    return refresh
+
+def get_grid_menu():
+    contents = [["Entry {}".format(i), str(i)] for i in range(30)]
+    mu = GridMenu(contents, Mock(), BenchmarkOutput(), name="Benchmark grid menu", config={})
+    GridMenuLabelOverlay().apply_to(mu)
+    mu.to_foreground()
+    return mu.view.refresh
+
+def measure(get_refresh, count, pooled):
+    """ Returns (images per frame, kilobytes per frame, milliseconds per frame). """
+    CanvasPool.max_size = 4 if pooled else 0
+    try:
+        refresh = get_refresh()
+        # Warming up the caches (text, coordinates, pools)
+        for i in range(10):
+            refresh()
+        with AllocationCounter() as counter:
+            for i in range(count):
+                refresh()
+        images = float(counter.images)/count
+        kilobytes = counter.bytes/1024.0/count
+        ms = timeit.timeit(refresh, number=count)*1000.0/count
+        return images, kilobytes, ms
+    finally:
+        CanvasPool.max_size = 4
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for name, get_refresh in (("Throbber", get_throbber), ("CircularProgressBar", get_progress_bar),
+                              ("GridMenu with label overlay", get_grid_menu)):
+        old = measure(get_refresh, count, False)
+        new = measure(get_refresh, count, True)
+        print("{}: new canvas {:.1f} images ({:.1f}KB), pooled {:.1f} images ({:.1f}KB) allocated per frame".format(
+              name, old[0], old[1], new[0], new[1]))
+        print("{}: new canvas {:.3f}ms, pooled {:.3f}ms per frame ({:.1f}x faster)".format(
+              name, old[2], new[2], old[2]/new[2]))
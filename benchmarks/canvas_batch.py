@@ -0,0 +1,89 @@
+#!/usr/bin/env python2
+"""
+Compares drawing a snake field and a clock face with ``Canvas`` primitives
+(validating each coordinate) vs. with a single ``Canvas.draw_batch()`` call, as well as
+parsing string offset coordinates vs. using the coordinate cache.
+
+Usage: ``python benchmarks/canvas_batch.py [iterations]``
+"""
+import os
+import sys
+import math
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ui import Canvas, MockOutput
+
+
+def get_snake(length=200, width=128, height=64):
+    snake = []
+    x, y, dx = 2, 2, 1
+    for i in range(length):
+        snake.append((x, y))
+        if not 2 <= x + dx < width - 2:
+            y += 2
+            dx = -dx
+        else:
+            x += dx
+    return snake
+
+def get_clock_lines(cx=64, cy=32, radius=30):
+    lines = []
+    for i in range(60):
+        angle = math.pi * 2 * i / 60
+        length = 4 if i % 5 == 0 else 2
+        lines.append((int(cx + (radius - length) * math.sin(angle)), int(cy + (radius - length) * math.cos(angle)),
+                      int(cx + radius * math.sin(angle)), int(cy + radius * math.cos(angle))))
+    return lines
+
+def draw_snake_primitives(snake):
+    c = Canvas(MockOutput())
+    c.rectangle((0, 0, "-1", "-1"))
+    # Every pair gets validated
+    c.point(snake)
+    return c
+
+def draw_snake_batch(snake):
+    c = Canvas(MockOutput())
+    c.draw_batch(points=snake, rectangles=[(0, 0, 127, 63)], checked=True)
+    return c
+
+def draw_clock_primitives(lines):
+    c = Canvas(MockOutput())
+    for line in lines:
+        c.line(line)
+    return c
+
+def draw_clock_batch(lines):
+    c = Canvas(MockOutput())
+    c.draw_batch(lines=lines, checked=True)
+    return c
+
+def run(iterations):
+    snake = get_snake()
+    lines = get_clock_lines()
+    c = Canvas(MockOutput())
+    offsets = [(str(-i), "-1", str(i), "-10") for i in range(10)]
+    def parse():
+        for coords in offsets:
+            c.parse_coordinates(coords)
+    def resolve():
+        for coords in offsets:
+            c.resolve_coordinates(coords)
+    results = [
+        ("snake field, {} points".format(len(snake)), lambda: draw_snake_primitives(snake), lambda: draw_snake_batch(snake)),
+        ("clock face, {} lines".format(len(lines)), lambda: draw_clock_primitives(lines), lambda: draw_clock_batch(lines)),
+    ]
+    for name, old, new in results:
+        old_time = timeit.timeit(old, number=iterations)*1000.0/iterations
+        new_time = timeit.timeit(new, number=iterations)*1000.0/iterations
+        print("{}: per primitive {:.3f}ms, batched {:.3f}ms ({:.1f}x faster)".format(name, old_time, new_time, old_time/new_time))
+    old_time = timeit.timeit(parse, number=iterations)*1000000.0/iterations/len(offsets)
+    new_time = timeit.timeit(resolve, number=iterations)*1000000.0/iterations/len(offsets)
+    print("string offsets: parsed {:.2f}us, cached {:.2f}us ({:.1f}x faster)".format(old_time, new_time, old_time/new_time))
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    run(iterations)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python2
+"""
+Measures the throughput of the crypto store writes made while processing sync
+responses with many key events - with a commit after each write vs. with the
+``CryptoStore`` in write-behind mode, where the writes made while processing the
+to-device events of a sync response are committed in one transaction (the way
+``MatrixClient._sync`` groups them).
+
+Each key event is an ``m.room_key`` to-device event received over an existing
+Olm session, which is saved after decryption, followed by the new Megolm inbound
+session. Each sync response also updates the keys of a few devices and the sync
+token, like a response with ``device_lists`` changes - these writes are made by
+the device list thread, outside of the batch, so they're committed one by one in
+both cases. The databases are on disk, in a temporary directory.
+
+Usage: ``python benchmarks/crypto_store_writes.py [sync_count] [key_events_per_sync]``
+"""
+import os
+import sys
+import shutil
+import tempfile
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "libs/matrix_client"))
+
+import olm
+
+from matrix_client.crypto.crypto_store import CryptoStore
+from matrix_client.crypto.sessions import MegolmOutboundSession, MegolmInboundSession
+from matrix_client.device import Device
+
+USER_ID = "@alice:example.com"
+DEVICE_ID = "AUIETSRN"
+ROOM_ID = "!room:example.com"
+
+
+def get_sync_batches(sync_count, key_events, senders=10):
+    account = olm.Account()
+    curve_key = account.identity_keys["curve25519"]
+    ed_key = account.identity_keys["ed25519"]
+    olm_sessions = [olm.OutboundSession(account, curve_key, curve_key) for _ in range(senders)]
+    device_keys = {USER_ID: {"DEVICE{}".format(i): Device(None, USER_ID, "DEVICE{}".format(i),
+                                                          curve25519_key=curve_key, ed25519_key=ed_key)
+                             for i in range(senders)}}
+    batches = []
+    for s in range(sync_count):
+        events = []
+        for e in range(key_events):
+            out_session = MegolmOutboundSession()
+            events.append((olm_sessions[e % senders], MegolmInboundSession(out_session.session_key, ed_key)))
+        batches.append(("s{}".format(s), events, device_keys))
+    return account, curve_key, batches
+
+def process_syncs(directory, write_behind, account, curve_key, batches):
+    db_name = "crypto_{}.db".format("write_behind" if write_behind else "commit")
+    store = CryptoStore(USER_ID, device_id=DEVICE_ID, db_path=directory, db_name=db_name,
+                        write_behind=write_behind)
+    store.save_olm_account(account)
+    for sync_token, events, device_keys in batches:
+        with store.batch():
+            for olm_session, megolm_session in events:
+                store.save_olm_session(curve_key, olm_session)
+                store.save_inbound_session(ROOM_ID, curve_key, megolm_session)
+        store.save_device_keys(device_keys)
+        store.save_tracked_users(set(device_keys))
+        store.save_sync_token(sync_token)
+    store.close()
+    os.remove(os.path.join(directory, db_name))
+
+
+if __name__ == "__main__":
+    sync_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    key_events = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    account, curve_key, batches = get_sync_batches(sync_count, key_events)
+    directory = tempfile.mkdtemp()
+    try:
+        old = timeit.timeit(lambda: process_syncs(directory, False, account, curve_key, batches), number=3)/3
+        new = timeit.timeit(lambda: process_syncs(directory, True, account, curve_key, batches), number=3)/3
+        events = sync_count*key_events
+        print("Sync processing ({} syncs, {} key events each): old {:.0f}ms ({:.0f} events/s), new {:.0f}ms ({:.0f} events/s) ({:.1f}x faster)".format(
+              sync_count, key_events, old*1000, events/old, new*1000, events/new, old/new))
+    finally:
+        shutil.rmtree(directory)
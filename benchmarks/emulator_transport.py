@@ -0,0 +1,61 @@
+#!/usr/bin/env python2
+"""
+Compares the pipe and the shared memory transports between the emulator
+output driver and the pygame emulator process, by pushing full-frame
+changes as fast as possible and measuring the frame rate as well as
+the CPU time spent by ZPUI and by the emulator process.
+
+Usage: ``python benchmarks/emulator_transport.py [frame_count]``
+(set ``SDL_VIDEODRIVER=dummy`` to run it without a display)
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from time import time, sleep
+
+import psutil
+from PIL import Image
+
+
+def get_frames(count=50, width=128, height=64):
+    """ Returns frames that are entirely different from each other """
+    return [Image.frombytes("1", (width, height), os.urandom(width*height/8)) for i in range(count)]
+
+def get_cpu_time(process):
+    times = process.cpu_times()
+    return times.user + times.system
+
+def run(transport, frame_count=2000):
+    from emulator import EmulatorProxy
+    proxy = EmulatorProxy(transport=transport)
+    # Letting the emulator process start up
+    sleep(1)
+    frames = get_frames()
+    parent = psutil.Process(os.getpid())
+    child = psutil.Process(proxy.proc.pid)
+    parent_cpu, child_cpu = get_cpu_time(parent), get_cpu_time(child)
+    start = time()
+    for i in range(frame_count):
+        proxy.display_image(frames[i % len(frames)])
+    elapsed = time() - start
+    # Letting the emulator process catch up
+    sleep(0.5)
+    parent_cpu = get_cpu_time(parent) - parent_cpu
+    child_cpu = get_cpu_time(child) - child_cpu
+    proxy.quit()
+    return {"fps": frame_count/elapsed, "parent_cpu": parent_cpu, "child_cpu": child_cpu,
+            "bytes": proxy.get_output_stats()["bus_bytes"]}
+
+def main():
+    frame_count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print("{} frames, 128x64 1-bit".format(frame_count))
+    print("{:<10}{:>12}{:>16}{:>18}".format("transport", "frames/s", "ZPUI CPU, s", "emulator CPU, s"))
+    for transport in ("pipe", "shm"):
+        r = run(transport, frame_count)
+        print("{:<10}{:>12.1f}{:>16.3f}{:>18.3f}".format(transport, r["fps"], r["parent_cpu"], r["child_cpu"]))
+
+
+if __name__ == "__main__":
+    main()
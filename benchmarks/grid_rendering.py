@@ -0,0 +1,54 @@
+#!/usr/bin/env python2
+"""
+Measures the per-keypress render time of a main menu-like ``GridMenu`` on
+a 128x64 "1"-mode display, with every label rendered on each refresh
+(the grid layout and tile caches dropped before each keypress) vs. with
+cached tiles and pages.
+
+Usage: ``python benchmarks/grid_rendering.py [keypress_count]``
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock import Mock
+
+from ui import GridMenu
+
+
+def get_mock_graphical_output(width=128, height=64, mode="1", cw=6, ch=8):
+    m = Mock()
+    m.configure_mock(rows=height/ch, cols=width/cw, width=width, height=height, device_mode=mode,
+                     char_height=ch, char_width=cw, type=["b&w"])
+    return m
+
+def time_keypresses(count, cached, entries=20):
+    """ Returns the average time a keypress (with the resulting refresh) takes, in milliseconds. """
+    o = get_mock_graphical_output()
+    contents = [["App {}".format(i), str(i)] for i in range(entries)]
+    mu = GridMenu(contents, Mock(), o, name="Benchmark grid menu", entry_width=32, draw_lines=False, config={})
+    mu.to_foreground()
+    keypresses = []
+    for i in range(count):
+        # Going through the whole menu and back
+        keypresses.append(mu.move_down if (i // entries) % 2 == 0 else mu.move_up)
+    keypresses = iter(keypresses)
+    def keypress():
+        if not cached:
+            mu.view.layout = None
+            mu.view.clear_tile_cache()
+        next(keypresses)()
+    # Not keeping the references to all the frames displayed
+    o.display_image = lambda image: None
+    return timeit.timeit(keypress, number=count)*1000.0/count
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    uncached = time_keypresses(count, False)
+    cached = time_keypresses(count, True)
+    print("GridMenu: tiles rendered {:.3f}ms, cached {:.3f}ms per keypress ({:.1f}x faster)".format(
+          uncached, cached, uncached/cached))
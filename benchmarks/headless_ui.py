@@ -0,0 +1,79 @@
+#!/usr/bin/env python2
+"""
+Runs UI elements with the headless input and output drivers, feeding them
+a scripted key timeline, and reports how long it took to process the keys,
+as well as the frame count and frame intervals.
+
+Usage: ``python benchmarks/headless_ui.py [keypress_count]``
+"""
+import os
+import sys
+
+zpui_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(zpui_dir)
+
+from helpers import monotonic
+from context_manager import ContextManager
+from input import input
+from output import output
+from ui import Menu, GridMenu, Refresher
+
+
+def get_io():
+    """ Sets up ZPUI IO with headless drivers, same way ``main.py`` does """
+    screen = output.init([{"driver": "headless"}])
+    cm = ContextManager()
+    i, dm = input.init([{"driver": "headless"}], cm)
+    cm.init_io(i, screen)
+    cm.switch_to_context("main")
+    driver = i.initial_drivers.values()[0]
+    return cm.get_io_for_context("main") + (screen, driver, i)
+
+def run(element_cb, timeline, speed=0):
+    i, o, screen, driver, processor = get_io()
+    driver.speed = speed
+    element = element_cb(i, o)
+    # Only starting to send keys once the UI element is ready to process them
+    to_foreground = element.to_foreground
+    def to_foreground_and_play():
+        to_foreground()
+        if not driver.timeline:
+            driver.add_timeline(timeline)
+    element.to_foreground = to_foreground_and_play
+    start = monotonic()
+    element.activate()
+    elapsed = monotonic() - start
+    processor.atexit()
+    driver.thread.join()
+    stats = screen.get_frame_stats()
+    stats["elapsed"] = elapsed
+    stats["keys"] = len(driver.key_times)
+    return stats
+
+def scroll_timeline(keypresses, keys=("KEY_DOWN", "KEY_UP"), period=30):
+    timeline = [[0, keys[(n // period) % 2]] for n in range(keypresses)]
+    return timeline + [[0, "KEY_LEFT"]]
+
+def main():
+    # ZPUI uses paths relative to its directory (i.e. for fonts)
+    os.chdir(zpui_dir)
+    keypresses = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    contents = [["Entry {}".format(n), str(n)] for n in range(30)]
+    grid_contents = [[str(n), str(n)] for n in range(30)]
+    benchmarks = [
+      ["Menu", lambda i, o: Menu(contents, i, o, name="Benchmark menu", config={}),
+        scroll_timeline(keypresses), 0],
+      ["GridMenu", lambda i, o: GridMenu(grid_contents, i, o, name="Benchmark grid menu", config={}),
+        scroll_timeline(keypresses, keys=("KEY_RIGHT", "KEY_LEFT"), period=10)[:-1] + [[0, "KEY_F1"]], 0],
+      ["Refresher", lambda i, o: Refresher(lambda: "Refresher", i, o, refresh_interval=0.01, name="Benchmark refresher"),
+        [[2, "KEY_LEFT"]], 1],
+    ]
+    print("{:<12}{:>8}{:>8}{:>12}{:>14}{:>14}".format("element", "keys", "frames", "elapsed, s", "avg frame, ms", "max frame, ms"))
+    for name, element_cb, timeline, speed in benchmarks:
+        s = run(element_cb, timeline, speed=speed)
+        print("{:<12}{:>8}{:>8}{:>12.3f}{:>14.2f}{:>14.2f}".format(name, s["keys"], s["frames"], s["elapsed"],
+              s.get("avg_interval", 0)*1000, s.get("max_interval", 0)*1000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python2
+"""
+Measures the time it takes for a key to get from an input driver's
+``send_key`` to the callback set in the current ``InputProxy``.
+
+Usage: ``python benchmarks/input_latency.py [key_count]``
+"""
+import os
+import sys
+from threading import Event
+from time import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from input.input import InputProcessor, InputProxy
+from input.drivers.test_input import InputDevice
+
+
+def measure_latency(count=5000):
+    """
+    Sends ``count`` synthetic keys through a test driver, one at a time,
+    and returns a list of send_key->callback latencies, in seconds.
+    """
+    driver = InputDevice(threaded=False)
+    i = InputProcessor([driver], None)
+    proxy = InputProxy("benchmark")
+    received = Event()
+    proxy.set_streaming(lambda key: received.set())
+    i.attach_proxy(proxy)
+    i.listen()
+    latencies = []
+    for _ in range(count):
+        received.clear()
+        start = time()
+        driver.send_key("KEY_BENCHMARK")
+        received.wait()
+        latencies.append(time() - start)
+    i.stop_listen()
+    i.processor_thread.join()
+    return latencies
+
+def print_stats(latencies):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    print("Keys sent: {}".format(count))
+    print("Mean:   {:.3f} ms".format(sum(latencies)/count*1000))
+    print("Median: {:.3f} ms".format(latencies[count//2]*1000))
+    print("99th:   {:.3f} ms".format(latencies[int(count*0.99)]*1000))
+    print("Max:    {:.3f} ms".format(latencies[-1]*1000))
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print_stats(measure_latency(count))
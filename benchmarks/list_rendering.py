@@ -0,0 +1,52 @@
+#!/usr/bin/env python2
+"""
+Measures the per-keypress render time of a menu on a 128x64 "1"-mode
+display, with list views redrawing the whole frame vs. redrawing only
+the lines that changed.
+
+Usage: ``python benchmarks/list_rendering.py [keypress_count]``
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock import Mock
+
+from ui import Menu
+from ui.base_list_ui import EightPtView
+
+
+def get_mock_graphical_output(width=128, height=64, mode="1", cw=6, ch=8):
+    m = Mock()
+    m.configure_mock(rows=height/ch, cols=width/cw, width=width, height=height, device_mode=mode,
+                     char_height=ch, char_width=cw, type=["b&w"])
+    return m
+
+def time_keypresses(view, count, incremental, entries=30):
+    """ Returns the average time a keypress (with the resulting refresh) takes, in milliseconds. """
+    EightPtView.incremental = incremental
+    o = get_mock_graphical_output()
+    contents = [["Menu entry number {}".format(i), str(i)] for i in range(entries)]
+    mu = Menu(contents, Mock(), o, name="Benchmark menu", config={"base_list_ui": {"default": view}})
+    mu.to_foreground()
+    keypresses = []
+    for i in range(count):
+        # Scrolling down and up through the whole menu
+        keypresses.append(mu.move_down if (i // entries) % 2 == 0 else mu.move_up)
+    keypresses = iter(keypresses)
+    try:
+        return timeit.timeit(lambda: next(keypresses)(), number=count)*1000.0/count
+    finally:
+        EightPtView.incremental = True
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for view in ("EightPtView", "SixteenPtView"):
+        full = time_keypresses(view, count, False)
+        incremental = time_keypresses(view, count, True)
+        print("{}: full redraw {:.3f}ms, incremental {:.3f}ms per keypress ({:.1f}x faster)".format(
+              view, full, incremental, full/incremental))
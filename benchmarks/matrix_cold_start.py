@@ -0,0 +1,114 @@
+#!/usr/bin/env python2
+"""
+Measures the time it takes the Matrix app's client to get to the room list (all
+rooms created, with their display names and latest events available) when starting
+with a stored token - with a full initial sync vs. with the rooms restored from
+the SQLite timeline cache, followed by an incremental sync.
+
+The homeserver is simulated with ``responses``, and every request takes the
+round-trip time plus the time the response takes to transfer at the given bandwidth.
+The sync response is generated: each room has a name, members and recent messages.
+
+Usage: ``python benchmarks/matrix_cold_start.py [room_count] [members_per_room]``
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import timeit
+from time import sleep
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "apps/messaging_apps/matrix"))
+
+import responses
+
+from libs.matrix_client.matrix_client.client import MatrixClient
+from libs.matrix_client.matrix_client.api import MATRIX_V2_API_PATH
+
+from timeline_cache import TimelineCache
+
+HOSTNAME = "http://example.com"
+USER_ID = "@alice:example.com"
+# A mobile connection
+RTT = 0.1
+BANDWIDTH = 1000000/8.0 # bytes per second
+
+
+def get_sync_response(room_count, members, next_batch="s2", messages=20):
+    rooms = {}
+    for r in range(room_count):
+        room_id = "!room{}:example.com".format(r)
+        state = [{"type": "m.room.name", "state_key": "", "sender": USER_ID, "content": {"name": "Room {}".format(r)},
+                  "event_id": "$name{}".format(r), "origin_server_ts": 1}]
+        for m in range(members):
+            user_id = "@user{}:example.com".format(m)
+            state.append({"type": "m.room.member", "state_key": user_id, "sender": user_id,
+                          "content": {"membership": "join", "displayname": "User {}".format(m)},
+                          "event_id": "$member{}_{}".format(r, m), "origin_server_ts": 2})
+        timeline = [{"type": "m.room.message", "sender": "@user0:example.com", "origin_server_ts": 10+m,
+                     "content": {"msgtype": "m.text", "body": "Message {} in room {}".format(m, r)},
+                     "event_id": "$message{}_{}".format(r, m)} for m in range(messages)]
+        rooms[room_id] = {"state": {"events": state}, "timeline": {"events": timeline, "prev_batch": "p{}".format(r), "limited": True},
+                          "ephemeral": {"events": []}}
+    return {"next_batch": next_batch, "presence": {"events": []},
+            "rooms": {"join": rooms, "invite": {}, "leave": {}}}
+
+def add_responses(rsps, sync_body, transferred):
+    def respond(body):
+        def callback(request):
+            transferred.append(len(body))
+            sleep(RTT + len(body)/BANDWIDTH)
+            return (200, {}, body)
+        return callback
+    rsps.add_callback(responses.GET, HOSTNAME+MATRIX_V2_API_PATH+"/account/whoami",
+                      callback=respond(json.dumps({"user_id": USER_ID})))
+    rsps.add_callback(responses.GET, HOSTNAME+MATRIX_V2_API_PATH+"/sync", callback=respond(sync_body))
+
+def get_room_list(client):
+    return sorted(room.display_name for room in client.rooms.values())
+
+def start_with_full_sync(room_count, members, transferred):
+    with responses.RequestsMock() as rsps:
+        add_responses(rsps, json.dumps(get_sync_response(room_count, members)), transferred)
+        client = MatrixClient(HOSTNAME, token="token", initial_sync=False)
+        client.listen_for_events()
+        return get_room_list(client)
+
+def start_with_cache(cache_path, transferred):
+    # The incremental sync that follows runs in the listener thread, after the room list is shown
+    with responses.RequestsMock(assert_all_requests_are_fired=False) as rsps:
+        add_responses(rsps, json.dumps(get_sync_response(0, 0, next_batch="s3")), transferred)
+        client = MatrixClient(HOSTNAME, token="token", initial_sync=False)
+        cache = TimelineCache(cache_path)
+        assert cache.restore(client)
+        room_list = get_room_list(client)
+        cache.close()
+        return room_list
+
+def fill_cache(cache_path, room_count, members):
+    with responses.RequestsMock() as rsps:
+        add_responses(rsps, json.dumps(get_sync_response(room_count, members)), [])
+        client = MatrixClient(HOSTNAME, token="token", initial_sync=False)
+        cache = TimelineCache(cache_path)
+        cache.attach(client)
+        client.listen_for_events()
+        cache.close()
+
+
+if __name__ == "__main__":
+    room_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    members = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    directory = tempfile.mkdtemp()
+    try:
+        cache_path = os.path.join(directory, "timeline_cache.db")
+        fill_cache(cache_path, room_count, members)
+        full_transferred, cached_transferred = [], []
+        assert start_with_full_sync(room_count, members, []) == start_with_cache(cache_path, [])
+        full = timeit.timeit(lambda: start_with_full_sync(room_count, members, full_transferred), number=3)/3*1000.0
+        cached = timeit.timeit(lambda: start_with_cache(cache_path, cached_transferred), number=3)/3*1000.0
+        print("Time to room list ({} rooms, {} members each): full sync {:.0f}ms ({:.1f}KB), timeline cache {:.0f}ms ({:.1f}KB) ({:.1f}x faster)".format(
+              room_count, members, full, sum(full_transferred)/3.0/1024, cached, sum(cached_transferred)/3.0/1024, full/cached))
+    finally:
+        shutil.rmtree(directory)
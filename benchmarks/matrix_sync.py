@@ -0,0 +1,91 @@
+#!/usr/bin/env python2
+"""
+Measures the time it takes ``MatrixClient`` to parse and process an initial sync
+of a large account, and the size of the parsed response - with the
+default sync (full room state, presence) vs. with ``lazy_sync`` (the response a
+server sends for the uploaded filter - lazy-loaded members and no presence, with
+membership events processed only once a room is opened).
+
+The responses are generated from the ``example_sync`` fixture in
+``libs/matrix_client/test/response_examples.py``, scaled up to many rooms with
+many members; the client has a few event type-specific listeners, like the apps do.
+Memory is estimated by the count of objects in the parsed response, all of which
+are alive while the sync is processed.
+
+Usage: ``python benchmarks/matrix_sync.py [room_count] [members_per_room]``
+"""
+import os
+import gc
+import sys
+import json
+import timeit
+from copy import deepcopy
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.matrix_client.matrix_client.client import MatrixClient
+from libs.matrix_client.test.response_examples import example_sync
+
+HOSTNAME = "http://example.com"
+USER_ID = "@alice:example.com"
+EXAMPLE_ROOM = "!726s6s6q:example.com"
+
+
+def member_event(user_id, ts):
+    return {"type": "m.room.member", "state_key": user_id, "sender": user_id, "origin_server_ts": ts,
+            "content": {"membership": "join", "displayname": user_id[1:].split(":")[0]},
+            "event_id": "$member_{}_{}".format(user_id, ts)}
+
+def get_sync_response(room_count, members, lazy, senders=5, messages=20):
+    response = deepcopy(example_sync)
+    template = response["rooms"]["join"].pop(EXAMPLE_ROOM)
+    response["presence"]["events"] = [] if lazy else \
+        [dict(example_sync["presence"]["events"][0], sender="@user{}:example.com".format(m)) for m in range(members)]
+    for r in range(room_count):
+        room = deepcopy(template)
+        room_members = ["@user{}:example.com".format(m) for m in range(members)]
+        # With lazy-loaded members, only the members that sent the timeline events are included
+        state_members = room_members[:senders] if lazy else room_members
+        room["state"]["events"] += [member_event(user_id, r) for user_id in state_members]
+        room["timeline"]["events"] = [
+            {"type": "m.room.message", "sender": room_members[m % senders], "origin_server_ts": 1000+m,
+             "content": {"msgtype": "m.text", "body": "Message {}".format(m)}, "event_id": "$message_{}_{}".format(r, m)}
+            for m in range(messages)]
+        if lazy:
+            room["summary"] = {"m.heroes": room_members[:5], "m.joined_member_count": members}
+        response["rooms"]["join"]["!room{}:example.com".format(r)] = room
+    return json.dumps(response)
+
+def sync(body, lazy):
+    client = MatrixClient(HOSTNAME, lazy_sync=lazy)
+    client.user_id = USER_ID
+    client.api.sync = lambda *args, **kwargs: json.loads(body)
+    client.api.create_filter = lambda *args: {"filter_id": "1"}
+    for event_type in ("m.room.message", "m.room.encrypted", "m.room.redaction", "m.reaction", "m.sticker"):
+        client.add_listener(lambda event: None, event_type=event_type)
+    client._sync()
+    return client
+
+def count_objects(body):
+    """ Returns the count of objects in the parsed response - which are all alive while it's processed. """
+    gc.collect()
+    before = len(gc.get_objects())
+    response = json.loads(body)
+    after = len(gc.get_objects())
+    del response
+    return after - before
+
+
+if __name__ == "__main__":
+    room_count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    members = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    full_body = get_sync_response(room_count, members, False)
+    lazy_body = get_sync_response(room_count, members, True)
+    full = timeit.timeit(lambda: sync(full_body, False), number=5)/5*1000.0
+    lazy = timeit.timeit(lambda: sync(lazy_body, True), number=5)/5*1000.0
+    print("Initial sync ({} rooms, {} members each): full state {:.0f}ms ({:.0f}KB), lazy {:.0f}ms ({:.0f}KB) ({:.1f}x faster)".format(
+          room_count, members, full, len(full_body)/1024.0, lazy, len(lazy_body)/1024.0, full/lazy))
+    full_objects = count_objects(full_body)
+    lazy_objects = count_objects(lazy_body)
+    print("Objects in the parsed response: full state {}, lazy {} ({:.1f}x fewer)".format(
+          full_objects, lazy_objects, float(full_objects)/lazy_objects))
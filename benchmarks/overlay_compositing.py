@@ -0,0 +1,72 @@
+#!/usr/bin/env python2
+"""
+Measures the per-keypress render time of a main menu-like ``GridMenu`` with
+the sidebar, label and help overlays applied, with each overlay copying the
+frame and drawing itself on every refresh (the way overlays used to work) vs.
+with cached overlay layers pasted onto a single copy of the frame.
+
+Usage: ``python benchmarks/overlay_compositing.py [keypress_count]``
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock import Mock
+from PIL import Image
+
+from ui import Canvas, GridMenu, GridMenuSidebarOverlay, GridMenuLabelOverlay, HelpOverlay
+
+
+def get_mock_graphical_output(width=128, height=64, mode="1", cw=6, ch=8):
+    m = Mock()
+    m.configure_mock(rows=height/ch, cols=width/cw, width=width, height=height, device_mode=mode,
+                     char_height=ch, char_width=cw, type=["b&w"])
+    return m
+
+sidebar = Image.new("1", (24, 64))
+sidebar.paste(1, (4, 8, 20, 56))
+
+def sidebar_cb(c, ui_el, coords):
+    c.image.paste(sidebar, (coords.left+3, coords.top-5))
+
+def draw_overlays_separately(mu, image):
+    """ Every overlay copies the frame and draws itself onto the copy. """
+    for overlay in mu.overlay_compositor.overlays:
+        state = overlay.get_layer_state(mu)
+        if state is not None:
+            c = Canvas(mu.o, base_image=image)
+            overlay.draw_layer(c, mu, state)
+            image = c.get_image()
+    return image
+
+def time_keypresses(count, composited, entries=20):
+    """ Returns the average time a keypress (with the resulting refresh) takes, in milliseconds. """
+    o = get_mock_graphical_output()
+    contents = [["App {}".format(i), str(i)] for i in range(entries)]
+    mu = GridMenu(contents, Mock(), o, name="Benchmark main menu", entry_width=32, draw_lines=False, config={})
+    GridMenuSidebarOverlay(sidebar_cb, static=True).apply_to(mu)
+    GridMenuLabelOverlay().apply_to(mu)
+    HelpOverlay(lambda: True).apply_to(mu)
+    if not composited:
+        mu.view.wrappers = [lambda image: draw_overlays_separately(mu, image)]
+    mu.before_foreground()
+    mu.to_foreground()
+    keypresses = []
+    for i in range(count):
+        # Going through the whole menu and back
+        keypresses.append(mu.move_down if (i // entries) % 2 == 0 else mu.move_up)
+    keypresses = iter(keypresses)
+    # Not keeping the references to all the frames displayed
+    o.display_image = lambda image: None
+    return timeit.timeit(lambda: next(keypresses)(), number=count)*1000.0/count
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    separate = time_keypresses(count, False)
+    composited = time_keypresses(count, True)
+    print("Main menu with 3 overlays: overlays drawn separately {:.3f}ms, composited {:.3f}ms per keypress ({:.1f}x faster)".format(
+          separate, composited, separate/composited))
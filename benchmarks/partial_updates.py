@@ -0,0 +1,61 @@
+#!/usr/bin/env python2
+"""
+Compares the amount of display data sent for a scrolling menu when pushing
+full frames vs. pushing only the changed SSD1306/SH1106 pages.
+
+Usage: ``python benchmarks/partial_updates.py [keypress_count]``
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock import Mock
+
+from output.drivers.damage import get_dirty_pages, group_pages, get_page_data
+from ui import Menu
+
+
+def get_mock_graphical_output(width=128, height=64, mode="1", cw=6, ch=8):
+    m = Mock()
+    m.configure_mock(rows=height/ch, cols=width/cw, width=width, height=height, device_mode=mode,
+                     char_height=ch, char_width=cw, type=["b&w"])
+    return m
+
+def get_menu_frames(keypresses=200, entries=30):
+    """ Renders a menu being scrolled down and up, returns the frames displayed. """
+    o = get_mock_graphical_output()
+    contents = [["Entry {}".format(i), str(i)] for i in range(entries)]
+    mu = Menu(contents, Mock(), o, name="Benchmark menu", config={})
+    frames = []
+    o.display_image.side_effect = lambda image, **k: frames.append(image.copy())
+    mu.to_foreground()
+    for i in range(keypresses):
+        if (i // entries) % 2 == 0:
+            mu.move_down()
+        else:
+            mu.move_up()
+    return frames
+
+def count_bytes(frames, width=128, height=64):
+    full = 0
+    partial = 0
+    previous = None
+    for frame in frames:
+        full += width*height/8
+        pages, x0, x1 = get_dirty_pages(previous, frame)
+        for first_page, last_page in group_pages(pages):
+            # 6 bytes of SSD1306 addressing commands per page run
+            partial += 6 + len(get_page_data(frame, first_page, last_page, x0, x1))
+        previous = frame
+    return full, partial
+
+
+if __name__ == "__main__":
+    keypresses = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    frames = get_menu_frames(keypresses)
+    full, partial = count_bytes(frames)
+    print("Frames: {}".format(len(frames)))
+    print("Full frame updates:    {} bytes ({} per frame)".format(full, full/len(frames)))
+    print("Partial page updates:  {} bytes ({} per frame)".format(partial, partial/len(frames)))
+    print("Saved: {:.1f}%".format(100.0*(full-partial)/full))
@@ -0,0 +1,62 @@
+#!/usr/bin/env python2
+"""
+Compares the in-place ``Canvas`` raster operations (``invert_rect``,
+``invert`` and ``clear``) with the way they used to be done - converting
+"1" images to "L" and back, and clearing with ``rectangle()``.
+
+Usage: ``python benchmarks/raster_ops.py [iterations]``
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import ImageOps
+
+from ui import Canvas, MockOutput
+
+
+def convert_invert_rect(c, coords):
+    coords = c.check_coordinates(coords)
+    image_subset = c.image.crop(coords)
+    image_subset = image_subset.convert("L")
+    image_subset = ImageOps.invert(image_subset)
+    image_subset = image_subset.convert(c.o.device_mode)
+    c.rectangle(coords, fill=c.background_color, outline=c.background_color)
+    c.image.paste(image_subset, (coords[0], coords[1]))
+
+def convert_invert(c):
+    image = ImageOps.invert(c.image.convert("L"))
+    c.image = image.convert("1")
+
+def rectangle_clear(c, coords):
+    coords = c.check_coordinates(coords)
+    c.rectangle(coords, fill=c.background_color, outline=c.background_color)
+
+def get_canvas():
+    c = Canvas(MockOutput())
+    c.text("Hello world", (5, 5))
+    return c
+
+def run(iterations):
+    c = get_canvas()
+    # A menu cursor and a GridMenu cell
+    cursor = (4, 16, 128, 24)
+    cell = (32, 0, 64, 32)
+    results = [
+        ("invert_rect (cursor)", lambda: convert_invert_rect(c, cursor), lambda: c.invert_rect(cursor)),
+        ("invert_rect (cell)", lambda: convert_invert_rect(c, cell), lambda: c.invert_rect(cell)),
+        ("invert", lambda: convert_invert(c), lambda: c.invert()),
+        ("clear (cursor)", lambda: rectangle_clear(c, cursor), lambda: c.clear(cursor)),
+    ]
+    for name, old, new in results:
+        old_time = timeit.timeit(old, number=iterations)*1000000.0/iterations
+        new_time = timeit.timeit(new, number=iterations)*1000000.0/iterations
+        print("{}: conversions {:.1f}us, in place {:.1f}us ({:.1f}x faster)".format(name, old_time, new_time, old_time/new_time))
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    run(iterations)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python2
+"""
+Measures the time it takes a ``Room`` to process a long timeline - keeping the
+event history and dispatching the events to the room's listeners - with the
+previous implementation (a list trimmed with ``pop(0)``, and a scan through all
+the listeners for each event) vs. the current one (a bounded deque, and listeners
+indexed by event type).
+
+The timeline is a replay of 100k events of a few different types, and the room has
+several event type-specific listeners, like the ones apps add, and a wildcard one.
+
+Usage: ``python benchmarks/room_events.py [event_count] [event_history_limit]``
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from libs.matrix_client.matrix_client.client import MatrixClient
+from libs.matrix_client.matrix_client.room import Room
+
+EVENT_TYPES = ("m.room.message", "m.reaction", "m.room.redaction", "m.room.encrypted", "m.sticker",
+               "m.call.invite", "m.call.hangup", "m.room.message.feedback")
+
+
+class ListRoom(Room):
+    """ The previous implementation of the event history and listener dispatch. """
+
+    def __init__(self, client, room_id):
+        Room.__init__(self, client, room_id)
+        self.events = []
+        self.list_listeners = []
+        self.limit = 20
+
+    def add_listener(self, callback, event_type=None):
+        self.list_listeners.append({'callback': callback, 'event_type': event_type})
+
+    def _put_event(self, event):
+        self.events.append(event)
+        if len(self.events) > self.limit:
+            self.events.pop(0)
+        for listener in self.list_listeners:
+            if listener['event_type'] is None or listener['event_type'] == event['type']:
+                listener['callback'](self, event)
+
+
+def get_timeline(count):
+    return [{"type": EVENT_TYPES[i % len(EVENT_TYPES)], "sender": "@user{}:example.com".format(i % 10),
+             "content": {"body": "Event {}".format(i)}, "event_id": "$event{}".format(i)}
+            for i in range(count)]
+
+def make_room(cls, limit):
+    room = cls(MatrixClient("http://example.com"), "!room:example.com")
+    if cls is ListRoom:
+        room.limit = limit
+    else:
+        room.event_history_limit = limit
+    for event_type in EVENT_TYPES[:6]:
+        for _ in range(4):
+            room.add_listener(lambda room, event: None, event_type=event_type)
+    room.add_listener(lambda room, event: None)
+    return room
+
+def replay(cls, timeline, limit):
+    room = make_room(cls, limit)
+    for event in timeline:
+        room._put_event(event)
+    return room
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    timeline = get_timeline(count)
+    assert list(replay(ListRoom, timeline, limit).events) == replay(Room, timeline, limit).get_events()
+    old = timeit.timeit(lambda: replay(ListRoom, timeline, limit), number=3)/3*1000.0
+    new = timeit.timeit(lambda: replay(Room, timeline, limit), number=3)/3*1000.0
+    print("Timeline replay ({} events, history of {}): old {:.0f}ms, new {:.0f}ms ({:.1f}x faster)".format(
+          count, limit, old, new, old/new))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python2
+"""
+Measures menu refresh time on a 128x64 "1"-mode display, with text rendered
+through ``ImageDraw.text`` every time vs. through the ``Canvas`` text cache.
+
+Usage: ``python benchmarks/text_rendering.py [refresh_count]``
+"""
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock import Mock
+
+from ui import Menu, Canvas
+from ui.canvas import TextCache
+
+
+def get_mock_graphical_output(width=128, height=64, mode="1", cw=6, ch=8):
+    m = Mock()
+    m.configure_mock(rows=height/ch, cols=width/cw, width=width, height=height, device_mode=mode,
+                     char_height=ch, char_width=cw, type=["b&w"])
+    return m
+
+def get_menu(view, entries=30):
+    o = get_mock_graphical_output()
+    contents = [["Menu entry number {}".format(i), str(i)] for i in range(entries)]
+    mu = Menu(contents, Mock(), o, name="Benchmark menu", config={"base_list_ui": {"default": view}})
+    mu.to_foreground()
+    return mu
+
+def time_refreshes(view, count, text_cache):
+    """ Returns the average time a menu refresh takes, in milliseconds. """
+    Canvas.text_cache = text_cache
+    mu = get_menu(view)
+    refresh = mu.view.refresh
+    def scroll():
+        # Scrolling ticks and cursor movement - mostly the same lines redrawn
+        refresh()
+        mu.move_down()
+    try:
+        return timeit.timeit(scroll, number=count)*1000.0/count
+    finally:
+        Canvas.text_cache = TextCache()
+
+
+if __name__ == "__main__":
+    os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for view in ("EightPtView", "SixteenPtView"):
+        uncached = time_refreshes(view, count, None)
+        cached = time_refreshes(view, count, TextCache())
+        print("{}: ImageDraw.text {:.3f}ms, text cache {:.3f}ms per refresh ({:.1f}x faster)".format(
+              view, uncached, cached, uncached/cached))
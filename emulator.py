@@ -15,15 +15,20 @@ hardcoded values in EmulatorProxy =)
 """
 
 from multiprocessing import Process, Pipe
+from multiprocessing import Lock as ProcessLock, Event as ProcessEvent
+from multiprocessing.sharedctypes import RawArray, RawValue
 from threading import Lock
-from time import sleep
+from time import time
+import ctypes
 
 import luma.emulator.device
 import pygame
 from luma.core.render import canvas
+from PIL import Image
 
 from helpers import setup_logger, KEY_PRESSED, KEY_RELEASED, KEY_HELD
 from output.output import GraphicalOutputDevice, CharacterOutputDevice
+from output.drivers.damage import PartialUpdateManager, get_dirty_bbox, get_image_fingerprint
 
 logger = setup_logger(__name__, "warning")
 
@@ -38,37 +43,134 @@ def get_emulator():
     return __EMULATOR_PROXY
 
 
-class EmulatorProxy(object):
+class SharedFramebuffer(object):
+    """
+    A framebuffer in memory shared between ZPUI and the emulator process,
+    with a sequence counter that's incremented on every frame written.
+    Frames are written as raw image bytes, so, unlike with the pipe,
+    there's no pickling involved. Has to be created before the emulator
+    process is started.
+
+    ``wakeup`` is an event that's set whenever there's something new
+    for the emulator process to process - a frame or a message in the pipe.
+    """
+    def __init__(self, mode, size):
+        self.mode = mode
+        self.size = size
+        self.length = len(Image.new(mode, size).tobytes())
+        self.buffer = RawArray(ctypes.c_char, self.length)
+        self.sequence = RawValue(ctypes.c_ulong, 0)
+        self.lock = ProcessLock()
+        self.wakeup = ProcessEvent()
+
+    def accepts(self, image):
+        return image.mode == self.mode and image.size == self.size
+
+    def write(self, image):
+        data = image.tobytes()
+        with self.lock:
+            self.buffer.raw = data
+            self.sequence.value += 1
+        self.wakeup.set()
+
+    def get_sequence(self):
+        with self.lock:
+            return self.sequence.value
+
+    def read(self, last_sequence):
+        """
+        Returns a ``(sequence, image)`` tuple with the latest frame if it's newer
+        than ``last_sequence``, otherwise, returns ``(last_sequence, None)``.
+        """
+        with self.lock:
+            sequence = self.sequence.value
+            if sequence == last_sequence:
+                return last_sequence, None
+            data = self.buffer.raw
+        return sequence, Image.frombytes(self.mode, self.size, data)
+
+
+class EmulatorProxy(PartialUpdateManager):
 
     device_mode = "1"
     char_width = 6
     char_height = 8
     type = ["char", "b&w"]
 
-    def __init__(self, mode="1", width=128, height=64):
+    def __init__(self, mode="1", width=128, height=64, transport="shm"):
         self.width = width
         self.height = height
         self.mode = mode
         self.device_mode = mode
         self.device = type("MockDevice", (), {"mode":self.mode, "size":(self.width, self.height)})
         self.parent_conn, self.child_conn = Pipe()
+        assert transport in ("shm", "pipe"), "Wrong emulator transport suggested: '{}'!".format(transport)
+        self.framebuffer = SharedFramebuffer(mode, (width, height)) if transport == "shm" else None
         self.__base_classes__ = (GraphicalOutputDevice, CharacterOutputDevice)
         self.current_image = None
+        self.init_partial_updates()
         self.start_process()
 
     def start_process(self):
-        self.proc = Process(target=Emulator, args=(self.child_conn,), kwargs={"mode":self.mode, "width":self.width, "height":self.height})
+        self.proc = Process(target=Emulator, args=(self.child_conn,), kwargs={"mode":self.mode, "width":self.width, "height":self.height, "framebuffer":self.framebuffer})
         self.proc.start()
 
+    def call(self, name):
+        return DummyCallableRPCObject(self.parent_conn, name, framebuffer=self.framebuffer)
+
     def poll_input(self, timeout=1):
         if self.parent_conn.poll(timeout) is True:
             return self.parent_conn.recv()
         return None
 
     def quit(self):
-        DummyCallableRPCObject(self.parent_conn, 'quit')()
+        self.call('quit')()
         self.proc.join()
 
+    def display_image(self, image, **kwargs):
+        """
+        Writes the image into the shared framebuffer - or, if the pipe transport
+        is used, sends only the changed region of the image to the emulator
+        process, instead of the whole frame. Accepts **kwargs but ignores them,
+        same as ``Emulator.display_image``.
+        """
+        start = time()
+        fingerprint = get_image_fingerprint(image)
+        self.current_image = image
+        if fingerprint == self._last_fingerprint:
+            # Same frame is already on the display
+            self.record_push(0, time()-start)
+            return
+        self._last_fingerprint = fingerprint
+        if self.framebuffer is not None and self.framebuffer.accepts(image):
+            self.framebuffer.write(image)
+            self.record_push(self.framebuffer.length, time()-start)
+            return
+        bbox = get_dirty_bbox(self._last_pushed_image, image)
+        partial = False
+        if bbox is None:
+            byte_count = 0
+        elif self._last_pushed_image is None or bbox == (0, 0)+image.size:
+            self.call('display_image')(image)
+            byte_count = len(image.tobytes())
+        else:
+            region = image.crop(bbox)
+            self.call('display_image_region')(region, bbox[:2])
+            byte_count = len(region.tobytes())
+            partial = True
+        # Keeping a copy, in case the caller keeps drawing on the same image
+        self._last_pushed_image = image.copy()
+        self.record_push(byte_count, time()-start, partial=partial)
+
+    def display_data(self, *args):
+        # The emulator process draws the text itself, so the next image needs to be sent in full
+        self.invalidate_last_pushed()
+        self.call('display_data')(*args)
+
+    def clear(self):
+        self.invalidate_last_pushed()
+        self.call('clear')()
+
     def __getattr__(self, name):
         # Raise an exception if the attribute being called
         # doesn't actually exist on the Emulator object
@@ -77,7 +179,7 @@ class EmulatorProxy(object):
         # attribute of the Emulator - for now, only callables
         # are supported, and you can't get the result of a
         # callable.
-        return DummyCallableRPCObject(self.parent_conn, name)
+        return self.call(name)
 
 
 class DummyCallableRPCObject(object):
@@ -87,22 +189,40 @@ class DummyCallableRPCObject(object):
     getting attributes and passing return values (same thing, really),
     which should also allow us to get rid of hard-coded parameters
     in the EmulatorProxy object.
+
+    If a shared framebuffer is used, each call carries the sequence number
+    of the last frame written, so that the emulator can keep calls and
+    frames in order.
     """
-    def __init__(self, parent_conn, name):
+    def __init__(self, parent_conn, name, framebuffer=None):
         self.parent_conn = parent_conn
+        self.framebuffer = framebuffer
         self.__name__ = name
 
     def __call__(self, *args, **kwargs):
-        self.parent_conn.send({
+        message = {
             'func_name': self.__name__,
             'args': args,
             'kwargs': kwargs
-        })
+        }
+        if self.framebuffer is not None:
+            message['frame_sequence'] = self.framebuffer.get_sequence()
+        self.parent_conn.send(message)
+        if self.framebuffer is not None:
+            self.framebuffer.wakeup.set()
 
 
 class Emulator(object):
-    def __init__(self, child_conn, mode="1", width=128, height=64):
+    # Calls that change the displayed image, and have to be ordered with frames
+    # coming through the shared framebuffer
+    display_calls = ["display_image", "display_image_region", "display_data", "clear"]
+    # Pygame events need to be processed even if ZPUI doesn't send anything
+    poll_interval = 0.02
+
+    def __init__(self, child_conn, mode="1", width=128, height=64, framebuffer=None):
         self.child_conn = child_conn
+        self.framebuffer = framebuffer
+        self.frame_sequence = 0
 
         self.width = width
         self.height = height
@@ -148,8 +268,9 @@ class Emulator(object):
             self.child_conn.close()
 
     def _poll_input(self):
-        event = pygame.event.poll()
-        if event.type in [pygame.KEYDOWN, pygame.KEYUP]:
+        for event in pygame.event.get():
+            if event.type not in [pygame.KEYDOWN, pygame.KEYUP]:
+                continue
             key = event.key
             state = {pygame.KEYDOWN: KEY_PRESSED, \
                      pygame.KEYUP: KEY_RELEASED} \
@@ -165,19 +286,42 @@ class Emulator(object):
             self.child_conn.send({'key': key, 'state':state})
 
     def _poll_parent(self):
-        if self.child_conn.poll() is True:
+        while self.child_conn.poll() is True:
             event = self.child_conn.recv()
+            frame_sequence = event.get('frame_sequence', None)
+            if frame_sequence is not None and event['func_name'] in self.display_calls:
+                if self.framebuffer.get_sequence() != frame_sequence:
+                    # A frame was written after this call was made, no need to process it
+                    continue
+                # Showing the frame that was written before this call, if it's not shown yet
+                self._poll_framebuffer()
             func = getattr(self, event['func_name'])
             try:
                 func(*event['args'], **event['kwargs'])
             except:
                 import traceback; traceback.print_exc()
 
+    def _poll_framebuffer(self):
+        if self.framebuffer is None:
+            return
+        sequence, image = self.framebuffer.read(self.frame_sequence)
+        if image is not None:
+            self.frame_sequence = sequence
+            self.display_image(image)
+
+    def _wait_for_events(self):
+        if self.framebuffer is not None:
+            self.framebuffer.wakeup.wait(self.poll_interval)
+            self.framebuffer.wakeup.clear()
+        else:
+            self.child_conn.poll(self.poll_interval)
+
     def _event_loop(self):
         while self._quit is False:
+            self._wait_for_events()
             self._poll_parent()
+            self._poll_framebuffer()
             self._poll_input()
-            sleep(0.001)
 
     def setCursor(self, row, col):
         self.cursor_pos = [
@@ -205,6 +349,19 @@ class Emulator(object):
             self.current_image = image
             self._display_image(image)
 
+    def display_image_region(self, image, position):
+        """
+        Pastes a part of the frame onto the currently displayed image,
+        then displays the result. Used by ``EmulatorProxy`` to only send
+        the parts of the frame that have changed.
+        """
+        with self.busy_flag:
+            if self.current_image is None:
+                logger.warning("Received a partial frame, but there's no frame to apply it to!")
+                return
+            self.current_image.paste(image, position)
+            self._display_image(self.current_image)
+
     def _display_image(self, image):
         self.device.display(image)
 
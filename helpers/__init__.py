@@ -1,6 +1,7 @@
 from config_parse import read_config, write_config, read_or_create_config, save_config_gen, save_config_method_gen
 from general import local_path_gen, flatten, Singleton
 from runners import BooleanEvent, Oneshot, BackgroundRunner
+from timers import monotonic, TimerScheduler, InactivityTimer, get_timer_scheduler
 from usability import ExitHelper, remove_left_failsafe
 from logger import setup_logger
 from process import ProHelper
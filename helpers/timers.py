@@ -0,0 +1,251 @@
+from threading import Thread, Condition, RLock
+from heapq import heappush, heappop
+from itertools import count
+from select import select
+from weakref import WeakSet
+import atexit
+import ctypes
+import fcntl
+import errno
+import os
+
+from logger import setup_logger
+
+logger = setup_logger(__name__, "warning")
+
+try:
+    from time import monotonic
+except ImportError:
+    # Python 2 doesn't have a monotonic clock in the standard library
+    class _timespec(ctypes.Structure):
+        _fields_ = [("tv_sec", ctypes.c_long), ("tv_nsec", ctypes.c_long)]
+
+    CLOCK_MONOTONIC = 1
+    try:
+        _clock_gettime = ctypes.CDLL("librt.so.1", use_errno=True).clock_gettime
+        _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+    except (OSError, AttributeError):
+        from time import time as monotonic
+    else:
+        def monotonic():
+            """Returns the value of a monotonic clock, in seconds."""
+            t = _timespec()
+            if _clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)) != 0:
+                error = ctypes.get_errno()
+                raise OSError(error, "clock_gettime failed")
+            return t.tv_sec + t.tv_nsec * 1e-9
+
+
+# Schedulers with a running thread, stopped on exit. Weak references,
+# so that schedulers that are no longer used can be collected.
+_running_schedulers = WeakSet()
+
+def _stop_running_schedulers():
+    for scheduler in list(_running_schedulers):
+        scheduler.stop()
+
+atexit.register(_stop_running_schedulers)
+
+
+class TimerScheduler(object):
+    """
+    Runs callbacks at given deadlines, all from a single long-lived thread
+    (that's started once the first timer is scheduled). Deadlines are
+    absolute values of the ``monotonic()`` clock, so they don't drift and
+    aren't affected by system time changes.
+
+    Timers are named - scheduling a timer with a name that's already
+    scheduled replaces the previous timer. Callbacks are called without
+    arguments and are expected to return quickly, since all the timers
+    share a thread.
+
+    With no timers pending, the thread blocks on a condition variable. Until
+    the nearest deadline, it sleeps in ``select()`` on a pipe that's written
+    to when it needs to wake up earlier - on Python 2, a timed
+    ``Condition.wait`` polls every few milliseconds instead of sleeping.
+    """
+
+    def __init__(self, name="Timer scheduler thread"):
+        self.name = name
+        self.condition = Condition()
+        self.heap = []
+        self.timers = {}
+        self.counter = count()
+        self.thread = None
+        self.stopped = False
+        self.sleeping = False
+        self.wakeup_pipe = None
+        # Count of times the thread woke up, for diagnostics and tests
+        self.wakeups = 0
+
+    def schedule(self, name, delay, callback):
+        """Schedules ``callback`` to be called in ``delay`` seconds."""
+        self.schedule_at(name, monotonic() + delay, callback)
+
+    def schedule_at(self, name, deadline, callback):
+        """Schedules ``callback`` to be called once ``monotonic()`` reaches ``deadline``."""
+        with self.condition:
+            previous = self.timers.get(name, None)
+            if previous is not None:
+                # Lazy removal - the heap entry is skipped once it comes up
+                previous[3] = None
+            entry = [deadline, next(self.counter), name, callback]
+            self.timers[name] = entry
+            heappush(self.heap, entry)
+            if self.thread is None:
+                self.wakeup_pipe = os.pipe()
+                for fd in self.wakeup_pipe:
+                    fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+                self.thread = Thread(target=self.run, name=self.name)
+                self.thread.daemon = True
+                self.thread.start()
+                _running_schedulers.add(self)
+            if self.heap[0] is entry:
+                # The new timer is the earliest one, the thread needs to wait less
+                self.notify()
+
+    def cancel(self, name):
+        """Cancels a timer, if it's scheduled."""
+        with self.condition:
+            entry = self.timers.pop(name, None)
+            if entry is not None:
+                entry[3] = None
+
+    def is_scheduled(self, name):
+        with self.condition:
+            return name in self.timers
+
+    def get_deadline(self, name):
+        """Returns the deadline of a timer, or ``None`` if it isn't scheduled."""
+        with self.condition:
+            entry = self.timers.get(name, None)
+            return entry[0] if entry else None
+
+    def stop(self):
+        """Stops the scheduler thread. Pending timers won't fire."""
+        with self.condition:
+            self.stopped = True
+            self.notify()
+        _running_schedulers.discard(self)
+
+    def notify(self):
+        """Wakes up the thread, wherever it's waiting. Call with ``condition`` held."""
+        self.condition.notify()
+        if self.sleeping:
+            try:
+                os.write(self.wakeup_pipe[1], b"w")
+            except OSError as e:
+                # The pipe is full - the thread will wake up anyway
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def sleep(self, delay):
+        """Sleeps for ``delay`` seconds, or until woken up with ``notify()``."""
+        read_fd = self.wakeup_pipe[0]
+        readable, _, _ = select([read_fd], [], [], delay)
+        if readable:
+            try:
+                while os.read(read_fd, 64):
+                    pass
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+
+    def wait_for_next_timer(self):
+        while True:
+            with self.condition:
+                self.sleeping = False
+                if self.stopped:
+                    return None
+                while self.heap and self.heap[0][3] is None:
+                    heappop(self.heap)
+                if not self.heap:
+                    # An untimed wait actually blocks, even on Python 2
+                    self.condition.wait()
+                    self.wakeups += 1
+                    continue
+                delay = self.heap[0][0] - monotonic()
+                if delay <= 0:
+                    entry = heappop(self.heap)
+                    self.timers.pop(entry[2], None)
+                    return entry
+                # notify() writes to the pipe from now on, so a timer scheduled
+                # before sleep() starts still interrupts it
+                self.sleeping = True
+            self.sleep(delay)
+            self.wakeups += 1
+
+    def run(self):
+        while True:
+            entry = self.wait_for_next_timer()
+            if entry is None:
+                with self.condition:
+                    for fd in self.wakeup_pipe:
+                        os.close(fd)
+                    self.wakeup_pipe = None
+                return
+            deadline, _, name, callback = entry
+            try:
+                callback()
+            except:
+                logger.exception("Exception in timer {} callback!".format(name))
+
+
+_default_scheduler = None
+
+def get_timer_scheduler():
+    """Returns the ``TimerScheduler`` shared across ZPUI."""
+    global _default_scheduler
+    if _default_scheduler is None:
+        _default_scheduler = TimerScheduler()
+    return _default_scheduler
+
+
+class InactivityTimer(object):
+    """
+    Calls ``callback`` once ``poke()`` hasn't been called for ``interval``
+    seconds. ``poke()`` only stores a timestamp (unless the timer has to be
+    restarted), so it's cheap enough to be called on every keypress or
+    display update. Runs on the shared ``TimerScheduler``, so no threads
+    are started.
+    """
+
+    def __init__(self, interval, callback, name=None, scheduler=None):
+        self.interval = interval
+        self.callback = callback
+        self.name = name if name else "inactivity_timer_{}".format(id(self))
+        self.scheduler = scheduler if scheduler else get_timer_scheduler()
+        self.lock = RLock()
+        self.last_active = monotonic()
+        self.running = False
+
+    def poke(self):
+        """
+        Registers activity. Returns ``True`` if the timer wasn't running
+        (i.e. it's the first ``poke`` or the timer had already expired),
+        ``False`` otherwise.
+        """
+        with self.lock:
+            self.last_active = monotonic()
+            if self.running:
+                return False
+            self.running = True
+        self.scheduler.schedule_at(self.name, self.last_active + self.interval, self.check)
+        return True
+
+    def check(self):
+        # Calling the callback with the lock held, so that a concurrent ``poke``
+        # only returns once the callback has finished
+        with self.lock:
+            deadline = self.last_active + self.interval
+            if deadline > monotonic():
+                # There was activity since the timer was scheduled
+                self.scheduler.schedule_at(self.name, deadline, self.check)
+                return
+            self.running = False
+            self.callback()
+
+    def cancel(self):
+        with self.lock:
+            self.running = False
+        self.scheduler.cancel(self.name)
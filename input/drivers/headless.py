@@ -0,0 +1,175 @@
+"""
+Headless input driver - plays a scripted key timeline instead of reading
+keys from hardware. Meant to be used together with the ``headless`` output
+driver, for benchmarks and reproducible UI runs.
+
+The timeline is a list of ``[delay, key_name]`` or ``[delay, key_name, state]``
+entries, where ``delay`` is the time (in seconds) to wait after the previous
+entry and ``state`` is one of ``"pressed"``, ``"released"`` or ``"held"``.
+It can be passed as the ``timeline`` kwarg, or loaded from a script file
+(``script`` kwarg), which has one entry per line::
+
+    # Waiting for the main menu to load
+    1.0 KEY_DOWN
+    0.1 KEY_DOWN
+    0.1 KEY_ENTER
+    0.5 KEY_LEFT held
+"""
+
+import thread
+from threading import Event
+from time import sleep
+
+from helpers import setup_logger, monotonic, KEY_PRESSED, KEY_RELEASED, KEY_HELD
+from skeleton import InputSkeleton
+
+logger = setup_logger(__name__, "info")
+
+key_states = {"pressed": KEY_PRESSED, "released": KEY_RELEASED, "held": KEY_HELD}
+
+
+def parse_script(text):
+    """
+    Parses a key timeline script into a list of ``[delay, key_name, state]`` entries.
+
+    >>> parse_script("# comment\\n0.5 KEY_DOWN\\n\\n0 KEY_ENTER held")
+    [[0.5, 'KEY_DOWN', None], [0.0, 'KEY_ENTER', 2]]
+    """
+    timeline = []
+    for line in text.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        timeline.append(parse_entry(line.split()))
+    return timeline
+
+def parse_entry(entry):
+    """
+    Converts a ``[delay, key_name]``/``[delay, key_name, state]`` entry
+    into a ``[delay, key_name, state]`` entry, with ``state`` being
+    one of the ``KEY_`` state constants (or ``None``).
+
+    >>> parse_entry(["1", "KEY_UP", "released"])
+    [1.0, 'KEY_UP', 0]
+    """
+    if len(entry) not in (2, 3):
+        raise ValueError("Invalid timeline entry: {}".format(entry))
+    delay, key = float(entry[0]), entry[1]
+    if not key.startswith("KEY_"):
+        raise ValueError("Invalid key name in timeline entry: {}".format(entry))
+    state = None
+    if len(entry) == 3:
+        state = entry[2]
+        if state not in key_states.values():
+            if state not in key_states:
+                raise ValueError("Invalid key state in timeline entry: {}".format(entry))
+            state = key_states[state]
+    return [delay, key, state]
+
+
+class InputDevice(InputSkeleton):
+    """
+    Kwargs:
+
+    * ``script``: path to a key timeline script.
+    * ``timeline``: a key timeline, as a list (used if ``script`` is not passed).
+    * ``speed``: delays are divided by this value - ``0`` means that
+      keys are sent as fast as ZPUI accepts them.
+    * ``start_delay``: time to wait before playing the timeline, in seconds
+      (regardless of ``speed``), so that ZPUI can load.
+    * ``exit_when_done``: interrupt the main thread once the timeline
+      has been played, which makes ZPUI exit.
+    """
+
+    default_mapping = [
+    "KEY_LEFT",
+    "KEY_UP",
+    "KEY_DOWN",
+    "KEY_RIGHT",
+    "KEY_ENTER"]
+
+    supports_key_states = True
+    supports_held_state = True
+
+    def __init__(self, script=None, timeline=None, speed=1, start_delay=0, exit_when_done=False, **kwargs):
+        self.timeline = []
+        # Index of the next timeline entry to be played
+        self.position = 0
+        self.timeline_added = Event()
+        self.started = Event()
+        self.finished = Event()
+        if script:
+            with open(script, "r") as f:
+                self.add_timeline(parse_script(f.read()))
+        elif timeline:
+            self.add_timeline(timeline)
+        self.speed = speed
+        self.start_delay = start_delay
+        self.exit_when_done = exit_when_done
+        # Timestamps of the keys sent, as (timestamp, key, state) tuples
+        self.key_times = []
+        InputSkeleton.__init__(self, **kwargs)
+
+    def add_timeline(self, timeline):
+        """
+        Adds entries to the end of the timeline. If the timeline has already
+        been played, the new entries will be played right away.
+        """
+        self.timeline += [parse_entry(entry) for entry in timeline]
+        self.finished.clear()
+        self.timeline_added.set()
+
+    def set_available_keys(self):
+        InputSkeleton.set_available_keys(self)
+        for _, key, _ in self.timeline:
+            if key not in self.available_keys:
+                self.available_keys.append(key)
+
+    def init_hw(self):
+        return True
+
+    def start(self):
+        InputSkeleton.start(self)
+        self.started.set()
+
+    def runner(self):
+        """
+        Plays the timeline once the driver is attached to ``InputProcessor``,
+        then waits for new timeline entries to be added.
+        """
+        while not self.started.wait(0.1):
+            if self.stop_flag:
+                return
+        sleep(self.start_delay)
+        while not self.stop_flag:
+            if not self.timeline_added.wait(0.1):
+                continue
+            self.timeline_added.clear()
+            self.play()
+            if self.exit_when_done and not self.stop_flag:
+                logger.info("Key timeline finished, exiting")
+                thread.interrupt_main()
+                return
+
+    def play(self):
+        """Sends all the keys left in the timeline, waiting for the delays in between."""
+        deadline = monotonic()
+        while self.position < len(self.timeline):
+            if self.stop_flag:
+                return
+            delay, key, state = self.timeline[self.position]
+            self.position += 1
+            if self.speed:
+                deadline += float(delay) / self.speed
+                remaining = deadline - monotonic()
+                if remaining > 0:
+                    sleep(remaining)
+            self.key_times.append((monotonic(), key, state))
+            self.map_and_send_key(key, state=state)
+        self.finished.set()
+
+
+if __name__ == "__main__":
+    id = InputDevice(timeline=[[0.5, "KEY_DOWN"], [0.5, "KEY_ENTER"]], threaded=False)
+    id.start()
+    id.runner()
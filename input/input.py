@@ -1,6 +1,5 @@
 from threading import Thread, Event
 from traceback import format_exc
-from time import sleep
 from copy import copy
 import importlib
 import inspect
@@ -28,6 +27,8 @@ class InputProcessor(object):
     backlight_cb = None
 
     current_proxy = None
+    # Put into the queue to wake up a blocked ``event_loop`` without a key
+    wakeup_marker = object()
     proxy_methods = ["listen", "stop_listen"]
     proxy_attrs = ["available_keys"]
     proxies = []
@@ -36,6 +37,9 @@ class InputProcessor(object):
         self.global_keymap = {}
         self.cm = context_manager
         self.queue = Queue.Queue()
+        # Set whenever there's something for an idle ``event_loop`` to re-check
+        # (a proxy being attached or a stop being requested)
+        self.state_changed = Event()
         self.available_keys = {}
         self.drivers = {}
         self.initial_drivers = {}
@@ -117,6 +121,7 @@ class InputProcessor(object):
             raise ValueError("A proxy is already attached!")
         logger.info("Attaching proxy for context: {}".format(proxy.context_alias))
         self.current_proxy = proxy
+        self.state_changed.set()
 
     def detach_current_proxy(self):
         """
@@ -160,6 +165,9 @@ class InputProcessor(object):
         make sure the existing event_loop will exit once flag is set, even
         if other event_loop has already started (thought an event_loop can't
         exit if it's still processing a callback.)
+
+        The loop doesn't poll - it blocks on the queue and is woken up by
+        incoming keys, by a proxy being attached and by ``stop_listen``.
         """
         logger.debug("Starting event loop "+str(index))
         self.stop_flag = Event()
@@ -169,21 +177,24 @@ class InputProcessor(object):
         # Praise the holy garbage collector.
         stop_flag.clear()
         while not stop_flag.isSet():
-            if self.get_current_proxy() is not None:
-                try:
-                    data = self.queue.get(False, 0.1)
-                except Queue.Empty:
-                    # here an active event_loop spends most of the time
-                    sleep(0.1)
-                except AttributeError:
-                    # typically happens upon program termination
-                    pass
-                else:
-                    # here event_loop is usually busy
-                    self.process_key(data)
-            else:
-                # No current proxy set yet, not processing anything
-                sleep(0.1)
+            if self.get_current_proxy() is None:
+                # No current proxy set yet, not processing anything.
+                # Clearing the event before re-checking, so that a proxy
+                # attached in between isn't missed.
+                self.state_changed.clear()
+                if self.get_current_proxy() is None and not stop_flag.isSet():
+                    self.state_changed.wait()
+                continue
+            try:
+                # here an active event_loop spends most of the time
+                data = self.queue.get()
+            except AttributeError:
+                # typically happens upon program termination
+                continue
+            if data is self.wakeup_marker:
+                continue
+            # here event_loop is usually busy
+            self.process_key(data)
         logger.debug("Stopping event loop "+str(index))
 
     def global_key_processed_by_proxy(self, key, state, global_cb):
@@ -329,6 +340,9 @@ class InputProcessor(object):
         finish executing."""
         if self.stop_flag is not None:
             self.stop_flag.set()
+        # Waking up the event_loop, whether it's waiting for a key or for a proxy
+        self.state_changed.set()
+        self.queue.put(self.wakeup_marker)
 
     def atexit(self):
         """Exits driver (if necessary) if something wrong happened or ZPUI exits. Also, stops the InputProcessor, and all the associated drivers."""
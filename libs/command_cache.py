@@ -0,0 +1,153 @@
+"""
+A shared service for running commands whose output is requested by several
+UI elements within a short time - i.e. ``wpa_cli status`` or ``lsusb``.
+Output is reused for a per-command TTL, concurrent requests for the same command
+share a single subprocess, and the cached output is invalidated explicitly after
+commands that change the state.
+"""
+
+import sys
+from copy import copy
+from threading import Lock, Event
+from subprocess import check_output
+
+from helpers import setup_logger, monotonic
+
+logger = setup_logger(__name__, "warning")
+
+
+class _InflightCall(object):
+    """A call that's currently running, which other callers can wait for."""
+
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+        self.exc_info = None
+
+    def get_result(self):
+        self.done.wait()
+        if self.exc_info:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+        return self.result
+
+
+class CommandCache(object):
+    """
+    Caches results of commands (and other calls) for a given time, keyed by a tuple
+    (for commands, the command itself). Errors aren't cached - they're raised to all
+    the callers waiting for the call, and the next request runs the command again.
+    """
+
+    max_entries = 64
+
+    def __init__(self):
+        self.lock = Lock()
+        self.entries = {}
+        self.inflight = {}
+        self.reset_stats()
+
+    def check_output(self, command, ttl=1, **kwargs):
+        """
+        Returns the output of ``subprocess.check_output(command, **kwargs)``, reusing
+        output that's less than ``ttl`` seconds old and waiting for the same command
+        if it's already running.
+        """
+        key = tuple(command)
+        if kwargs:
+            key += tuple(sorted(kwargs.items()))
+        return self.call(key, lambda: self.fork(command, **kwargs), ttl=ttl)
+
+    def call(self, key, function, ttl=1):
+        """
+        Returns the result of ``function()``, cached under ``key`` (a tuple) for
+        ``ttl`` seconds. Concurrent callers with the same ``key`` share one call.
+        """
+        owner = False
+        with self.lock:
+            entry = self.entries.get(key, None)
+            if entry is not None:
+                expires, result = entry
+                if monotonic() < expires:
+                    self.stats["hits"] += 1
+                    return result
+                del self.entries[key]
+            inflight = self.inflight.get(key, None)
+            if inflight is not None:
+                self.stats["coalesced"] += 1
+            else:
+                self.stats["misses"] += 1
+                inflight = self.inflight[key] = _InflightCall()
+                owner = True
+        if not owner:
+            return inflight.get_result()
+        try:
+            inflight.result = function()
+        except:
+            inflight.exc_info = sys.exc_info()
+            with self.lock:
+                self.stats["errors"] += 1
+                if self.inflight.get(key, None) is inflight:
+                    del self.inflight[key]
+            inflight.done.set()
+            raise
+        with self.lock:
+            # Not caching the result if the entry was invalidated while the call was running
+            if self.inflight.get(key, None) is inflight:
+                del self.inflight[key]
+                if ttl > 0:
+                    self.store(key, inflight.result, monotonic() + ttl)
+        inflight.done.set()
+        return inflight.result
+
+    def fork(self, command, **kwargs):
+        with self.lock:
+            self.stats["forks"] += 1
+        logger.debug("Running {}".format(command))
+        return check_output(command, **kwargs)
+
+    def store(self, key, result, expires):
+        if len(self.entries) >= self.max_entries:
+            now = monotonic()
+            for old_key, (old_expires, _) in list(self.entries.items()):
+                if old_expires <= now:
+                    del self.entries[old_key]
+            if len(self.entries) >= self.max_entries:
+                del self.entries[min(self.entries, key=lambda k: self.entries[k][0])]
+        self.entries[key] = (expires, result)
+
+    def invalidate(self, prefix=()):
+        """
+        Drops the cached results for all keys starting with ``prefix`` (i.e.
+        ``["wpa_cli"]`` for all ``wpa_cli`` commands) - all the keys, by default.
+        Results of matching calls that are running at the moment won't be cached.
+        """
+        prefix = tuple(prefix)
+        with self.lock:
+            for storage in (self.entries, self.inflight):
+                for key in list(storage.keys()):
+                    if key[:len(prefix)] == prefix:
+                        del storage[key]
+            self.stats["invalidations"] += 1
+
+    def reset_stats(self):
+        with self.lock:
+            self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "forks": 0, "errors": 0, "invalidations": 0}
+
+    def get_stats(self):
+        """
+        Returns a dictionary with the counts of cache hits, misses, calls that
+        waited for the same call already running (``"coalesced"``), subprocesses
+        started, failed calls and invalidations.
+        """
+        with self.lock:
+            return copy(self.stats)
+
+
+_default_cache = None
+
+def get_command_cache():
+    """Returns the ``CommandCache`` shared across ZPUI."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = CommandCache()
+    return _default_cache
@@ -1,10 +1,12 @@
 import subprocess
 
+from libs.command_cache import get_command_cache
+
 
 def get_dmesg(bin_path='dmesg'):
     commandline = [bin_path]
     try:
-        output = subprocess.check_output(commandline, stderr = subprocess.STDOUT)
+        output = get_command_cache().check_output(commandline, ttl=1, stderr = subprocess.STDOUT)
     except subprocess.CalledProcessError:
         print("Dmesg command error!")
         return []
@@ -3,21 +3,39 @@ from ast import literal_eval
 from time import sleep
 
 from helpers import setup_logger
+from libs.command_cache import get_command_cache
 
 logger = setup_logger(__name__, "warning")
 
 current_interface = None
 
+# Commands that only read the wpa_supplicant state, with the time (in seconds)
+# for which their output can be reused. Any other command invalidates the cache.
+cached_commands = {"interface": 5, "ifname": 5, "status": 0.5, "list_networks": 1,
+                   "scan_results": 1, "get_network": 1}
+
 #wpa_cli related functions and objects
 def wpa_cli_command(*command):
     run = ["wpa_cli"]
     if current_interface:
         run += ["-i"+current_interface]
     try:
-        return check_output(run + list(command))
+        if command[0] in cached_commands:
+            return get_command_cache().check_output(run + list(command), ttl=cached_commands[command[0]])
+        try:
+            return check_output(run + list(command))
+        finally:
+            invalidate_cache()
     except CalledProcessError as e:
         raise WPAException(command[0], e.returncode, output=e.output, args=command[1:])
 
+def invalidate_cache():
+    """
+    Drops the cached ``wpa_cli`` output - to be called when the wpa_supplicant
+    state changes (i.e. when a wpa_supplicant event is received).
+    """
+    get_command_cache().invalidate(["wpa_cli"])
+
 class WPAException(Exception):
     def __init__(self, command, exit_code, args=None, output=None):
         self.command = command
@@ -5,7 +5,7 @@ import re
 
 from helpers import ProHelper, setup_logger
 
-from wpa_cli import WPAException
+from wpa_cli import WPAException, invalidate_cache
 
 logger = setup_logger(__name__, "debug")
 
@@ -135,6 +135,8 @@ class WpaMonitor():
         self.status_storage = []
 
     def add_status(self, status):
+        # The wpa_supplicant state has changed, so the cached wpa_cli output is stale
+        invalidate_cache()
         self.status_storage.append(status)
         # avoid taking up too much memory
         if len(self.status_storage) > self.status_storage_len_limit:
@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 
-from subprocess import check_output
+from libs.command_cache import get_command_cache
 
 """
 
@@ -21,7 +21,7 @@ Bus 001 Device 001: ID 1d6b:0002 Linux Foundation 2.0 root hub
 
 def lsusb():
     lsusb_entries = []
-    output = check_output(["lsusb"])
+    output = get_command_cache().check_output(["lsusb"], ttl=2)
     for line in [line.strip(' ') for line in output.split('\n') if line.strip(' ')]:
         location, description = line.split(':', 1)
         id_str, vid_pid_name = description.strip(' ').split(' ', 1)
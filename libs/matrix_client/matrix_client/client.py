@@ -15,6 +15,7 @@
 from .api import MatrixHttpApi
 from .checks import check_user_id
 from .errors import MatrixRequestError, MatrixUnexpectedResponse
+from .listeners import EventListeners
 from .room import Room
 from .user import User
 try:
@@ -27,6 +28,7 @@ from threading import Thread
 from time import sleep
 from uuid import uuid4
 from warnings import warn
+import json
 import logging
 import sys
 
@@ -72,6 +74,15 @@ class MatrixClient(object):
             there are unknown devices in an encrypted room. A client will have to
             inspect those, and resend its message. Note that this can be configured later
             on a per room basis.
+        initial_sync (bool): Optional. Whether to do a /sync request when created with
+            a token. Can be turned off to restore the client state (rooms and the sync
+            token) from a local cache before syncing.
+        lazy_sync (bool): Optional. When enabled, /sync requests use a filter uploaded
+            to the server, which asks for lazy-loaded members, limits the timeline of
+            each room to ``sync_filter_limit`` events and leaves out presence events
+            unless there are presence listeners. Membership state events are then
+            processed only when a room's members are needed (i.e. when the room is
+            opened), unless the room is encrypted and encryption is enabled.
 
     Returns:
         `MatrixClient`
@@ -121,7 +132,8 @@ class MatrixClient(object):
     def __init__(self, base_url, token=None, user_id=None,
                  valid_cert_check=True, sync_filter_limit=20,
                  cache_level=CACHE.ALL, encryption=False, encryption_conf=None,
-                 restore_device_id=False, verify_devices=False):
+                 restore_device_id=False, verify_devices=False, initial_sync=True,
+                 lazy_sync=False):
         if user_id:
             warn(
                 "user_id is deprecated. "
@@ -140,11 +152,12 @@ class MatrixClient(object):
 
         self.api = MatrixHttpApi(base_url, token)
         self.api.validate_certificate(valid_cert_check)
-        self.listeners = []
+        self.listeners = EventListeners()
         self.presence_listeners = {}
         self.invite_listeners = []
         self.left_listeners = []
-        self.ephemeral_listeners = []
+        self.ephemeral_listeners = EventListeners()
+        self.sync_listeners = []
         self.device_id = None
         self._encryption = encryption
         self.encryption_conf = encryption_conf or {}
@@ -161,8 +174,13 @@ class MatrixClient(object):
             )
 
         self.sync_token = None
+        self.sync_filter_limit = sync_filter_limit
         self.sync_filter = '{ "room": { "timeline" : { "limit" : %i } } }' \
             % sync_filter_limit
+        self.lazy_sync = lazy_sync
+        self._uploaded_filters = {
+            # filter JSON: filter ID
+        }
         self.sync_thread = None
         self.should_listen = False
 
@@ -177,7 +195,8 @@ class MatrixClient(object):
         if token:
             response = self.api.whoami()
             self.user_id = response["user_id"]
-            self._sync()
+            if initial_sync:
+                self._sync()
 
     def get_sync_token(self):
         warn("get_sync_token is deprecated. Directly access MatrixClient.sync_token.",
@@ -400,10 +419,7 @@ class MatrixClient(object):
             uuid.UUID: Unique id of the listener, can be used to identify the listener.
         """
         listener_uid = uuid4()
-        # TODO: listeners should be stored in dict and accessed/deleted directly. Add
-        # convenience method such that MatrixClient.listeners.new(Listener(...)) performs
-        # MatrixClient.listeners[uuid4()] = Listener(...)
-        self.listeners.append(
+        self.listeners.add(
             {
                 'uid': listener_uid,
                 'callback': callback,
@@ -418,8 +434,7 @@ class MatrixClient(object):
         Args:
             uuid.UUID: Unique id of the listener to remove.
         """
-        self.listeners[:] = (listener for listener in self.listeners
-                             if listener['uid'] != uid)
+        self.listeners.remove(uid)
 
     def add_presence_listener(self, callback):
         """ Add a presence listener that will send a callback when the client receives
@@ -455,7 +470,7 @@ class MatrixClient(object):
             uuid.UUID: Unique id of the listener, can be used to identify the listener.
         """
         listener_id = uuid4()
-        self.ephemeral_listeners.append(
+        self.ephemeral_listeners.add(
             {
                 'uid': listener_id,
                 'callback': callback,
@@ -470,8 +485,16 @@ class MatrixClient(object):
         Args:
             uuid.UUID: Unique id of the listener to remove.
         """
-        self.ephemeral_listeners[:] = (listener for listener in self.ephemeral_listeners
-                                       if listener['uid'] != uid)
+        self.ephemeral_listeners.remove(uid)
+
+    def add_sync_listener(self, callback):
+        """ Add a listener that will send a callback when a /sync response has
+        been processed.
+
+        Args:
+            callback (func(response)): Callback called with the /sync response.
+        """
+        self.sync_listeners.append(callback)
 
     def add_invite_listener(self, callback):
         """ Add a listener that will send a callback when the client receives
@@ -659,9 +682,38 @@ class MatrixClient(object):
         self.rooms[room_id] = room
         return self.rooms[room_id]
 
+    def build_sync_filter(self):
+        """Build the filter used for /sync requests when ``lazy_sync`` is enabled.
+
+        Returns:
+            dict: The filter.
+        """
+        room_filter = {
+            "state": {"lazy_load_members": True},
+            "timeline": {"limit": self.sync_filter_limit}
+        }
+        sync_filter = {"room": room_filter}
+        if not self.presence_listeners:
+            sync_filter["presence"] = {"not_types": ["*"]}
+        return sync_filter
+
+    def _get_sync_filter(self):
+        if not self.lazy_sync:
+            return self.sync_filter
+        filter_json = json.dumps(self.build_sync_filter(), sort_keys=True)
+        if filter_json not in self._uploaded_filters:
+            try:
+                response = self.api.create_filter(self.user_id, json.loads(filter_json))
+                self._uploaded_filters[filter_json] = response["filter_id"]
+            except (MatrixRequestError, KeyError):
+                logger.warning("Couldn't upload the sync filter, sending it with requests")
+                return filter_json
+        return self._uploaded_filters[filter_json]
+
     # TODO better handling of the blocking I/O caused by update_one_time_key_counts
     def _sync(self, timeout_ms=30000):
-        response = self.api.sync(self.sync_token, timeout_ms, filter=self.sync_filter)
+        response = self.api.sync(self.sync_token, timeout_ms,
+                                 filter=self._get_sync_filter())
 
         if self._encryption and 'device_lists' in response:
             if response['device_lists'].get('changed'):
@@ -677,23 +729,30 @@ class MatrixClient(object):
             self.first_sync = False
             self.olm_device.device_list.update_after_restart(self.sync_token)
 
-        for presence_update in response['presence']['events']:
+        # Filtered responses can leave out the sections that are empty
+        rooms = response.get('rooms', {})
+
+        for presence_update in response.get('presence', {}).get('events', []):
             for callback in self.presence_listeners.values():
                 callback(presence_update)
 
-        for room_id, invite_room in response['rooms']['invite'].items():
+        for room_id, invite_room in rooms.get('invite', {}).items():
             for listener in self.invite_listeners:
                 listener(room_id, invite_room['invite_state'])
 
-        for room_id, left_room in response['rooms']['leave'].items():
+        for room_id, left_room in rooms.get('leave', {}).items():
             for listener in self.left_listeners:
                 listener(room_id, left_room)
             if room_id in self.rooms:
                 del self.rooms[room_id]
 
-        if 'to_device' in response:
-            for event in response['to_device']['events']:
-                if self._encryption:
+        if self._encryption and 'to_device' in response:
+            # The crypto store writes made while processing the events are grouped in
+            # a single transaction, if the store is in write-behind mode. The batch
+            # only covers the to-device events - the network requests and listener
+            # calls made further on would hold the database write lock otherwise
+            with self.olm_device.db.batch():
+                for event in response['to_device']['events']:
                     if event['type'] == 'm.room.encrypted':
                         self.olm_device.olm_handle_encrypted_event(event)
                     elif event['type'] == 'm.room_key_request':
@@ -705,18 +764,24 @@ class MatrixClient(object):
             self.olm_device.update_one_time_key_counts(
                 response['device_one_time_keys_count'])
 
-        for room_id, sync_room in response['rooms']['join'].items():
+        for room_id, sync_room in rooms.get('join', {}).items():
             if room_id not in self.rooms:
                 self._mkroom(room_id)
             room = self.rooms[room_id]
             # TODO: the rest of this for loop should be in room object method
-            room.prev_batch = sync_room["timeline"]["prev_batch"]
+            timeline = sync_room.get("timeline", {})
+            room.prev_batch = timeline.get("prev_batch", room.prev_batch)
+            if "summary" in sync_room:
+                room.summary.update(sync_room["summary"])
 
-            for event in sync_room["state"]["events"]:
+            for event in sync_room.get("state", {}).get("events", []):
                 event['room_id'] = room_id
-                room._process_state_event(event)
+                if self.lazy_sync:
+                    room._defer_state_event(event)
+                else:
+                    room._process_state_event(event)
 
-            for event in sync_room["timeline"]["events"]:
+            for event in timeline.get("events", []):
                 event['room_id'] = room_id
                 room._put_event(event)
 
@@ -724,27 +789,22 @@ class MatrixClient(object):
                 # room.listeners[uuid] having reference to global listener
 
                 # Dispatch for client (global) listeners
-                for listener in self.listeners:
-                    if (
-                        listener['event_type'] is None or
-                        listener['event_type'] == event['type']
-                    ):
-                        listener['callback'](event)
+                for listener in self.listeners.get(event['type']):
+                    listener['callback'](event)
 
             if self._encryption and room.encrypted:
                 # Track the new users in the room
                 self.olm_device.device_list.track_pending_users()
 
-            for event in sync_room['ephemeral']['events']:
+            for event in sync_room.get('ephemeral', {}).get('events', []):
                 event['room_id'] = room_id
                 room._put_ephemeral_event(event)
 
-                for listener in self.ephemeral_listeners:
-                    if (
-                        listener['event_type'] is None or
-                        listener['event_type'] == event['type']
-                    ):
-                        listener['callback'](event)
+                for listener in self.ephemeral_listeners.get(event['type']):
+                    listener['callback'](event)
+
+        for listener in self.sync_listeners:
+            listener(response)
 
     def get_user(self, user_id):
         """Deprecated. Return a User by their id.
@@ -1,9 +1,12 @@
+import atexit
 import logging
 import os
 import sqlite3
 from collections import defaultdict
+from contextlib import contextmanager
 from datetime import timedelta
-from threading import current_thread
+from threading import current_thread, local, Lock
+from weakref import WeakSet
 
 import olm
 from appdirs import user_data_dir
@@ -13,6 +16,18 @@ from ..device import Device
 
 logger = logging.getLogger(__name__)
 
+# Stores in write-behind mode, whose pending writes are committed on exit.
+# Weak references, so that stores that are no longer used can be collected.
+_write_behind_stores = WeakSet()
+
+
+def _flush_write_behind_stores():
+    for store in list(_write_behind_stores):
+        store.flush()
+
+
+atexit.register(_flush_write_behind_stores)
+
 
 class CryptoStore(object):
     """Manages persistent storage for an OlmDevice.
@@ -28,6 +43,12 @@ class CryptoStore(object):
         app_name (str): Optional. The application name, which will be used to determine
             where the database is located. Ignored if db_path is supplied.
         pickle_key (str): Optional. A key to encrypt the database contents.
+        write_behind (bool): Optional. When True, the writes made within :meth:`batch`
+            (i.e. while the to-device events of a sync response are processed) are
+            committed in a single transaction when the batch ends, instead of one
+            transaction per write, and the database uses the WAL journal mode. Writes
+            of the Olm account are always committed immediately, and pending writes are
+            committed on exit.
     """
 
     def __init__(self,
@@ -36,7 +57,8 @@ class CryptoStore(object):
                  db_name='crypto.db',
                  db_path=None,
                  app_name='matrix-python-sdk',
-                 pickle_key='DEFAULT_KEY'):
+                 pickle_key='DEFAULT_KEY',
+                 write_behind=False):
         self.user_id = user_id
         self.device_id = device_id
         data_dir = db_path or user_data_dir(app_name, '')
@@ -45,17 +67,88 @@ class CryptoStore(object):
         except OSError:
             pass
         self.db_filepath = os.path.join(data_dir, db_name)
+        self.write_behind = write_behind
+        # Batch nesting depth, per thread
+        self._batches = local()
+        # Map from a thread id to a connection with uncommitted writes
+        self._pending = {}
+        self._pending_lock = Lock()
 
         # Map from a thread id to a connection object
         self._conn = defaultdict(self.instanciate_connection)
         self.pickle_key = pickle_key
         self.create_tables_if_needed()
+        if write_behind:
+            _write_behind_stores.add(self)
 
     def instanciate_connection(self):
-        con = sqlite3.connect(self.db_filepath, detect_types=sqlite3.PARSE_DECLTYPES)
+        # With write-behind, pending writes can be committed on exit from another thread
+        con = sqlite3.connect(self.db_filepath, detect_types=sqlite3.PARSE_DECLTYPES,
+                              check_same_thread=not self.write_behind)
         con.row_factory = sqlite3.Row
+        if self.write_behind:
+            # Readers in other threads don't wait for the batch transaction to end
+            con.execute('PRAGMA journal_mode=WAL')
+            # With NORMAL, WAL commits can be lost on power loss - account writes
+            # have to be durable, and batching already saves most of the fsyncs
+            con.execute('PRAGMA synchronous=FULL')
         return con
 
+    @contextmanager
+    def batch(self):
+        """Groups the writes made by the current thread in a single transaction.
+
+        Only has an effect in write-behind mode. Batches can be nested, the writes
+        are committed when the outermost one ends.
+        """
+        depth = getattr(self._batches, 'depth', 0)
+        self._batches.depth = depth + 1
+        try:
+            yield
+        finally:
+            self._batches.depth = depth
+            if not depth:
+                with self._pending_lock:
+                    conn = self._pending.pop(current_thread().ident, None)
+                if conn is not None:
+                    conn.commit()
+
+    def commit(self):
+        """Commits the current thread's pending writes, even within a batch.
+
+        Must be called before making network requests or calling callbacks within a
+        batch - the batch transaction holds the database write lock, so writers in other
+        threads would fail with ``database is locked`` if it stayed open while they run.
+        """
+        self._commit(durable=True)
+
+    def flush(self):
+        """Commits the writes pending in all the threads' batches.
+
+        Called on exit for stores in write-behind mode. Other threads' connections
+        are committed from the calling thread, so the threads writing to the store
+        (i.e. the sync thread) should be stopped beforehand - a commit made while a
+        thread is in the middle of a write would include a part of that write.
+        """
+        with self._pending_lock:
+            pending, self._pending = self._pending, {}
+        for conn in pending.values():
+            conn.commit()
+
+    def _commit(self, durable=False):
+        """Commits the current thread's writes, or defers them until the batch ends.
+
+        Args:
+            durable (bool): Optional. Commit immediately, even within a batch.
+        """
+        if self.write_behind and not durable and getattr(self._batches, 'depth', 0):
+            with self._pending_lock:
+                self._pending[current_thread().ident] = self.conn
+            return
+        with self._pending_lock:
+            self._pending.pop(current_thread().ident, None)
+        self.conn.commit()
+
     def create_tables_if_needed(self):
         """Ensures all the tables exist."""
         c = self.conn.cursor()
@@ -129,7 +222,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c.execute('UPDATE accounts SET account=? WHERE device_id=?',
                   (account_data, self.device_id))
         c.close()
-        self.conn.commit()
+        self._commit(durable=True)
 
     def replace_olm_account(self, account):
         """Replace an Olm account.
@@ -145,7 +238,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c.execute('REPLACE INTO accounts (device_id, account, user_id) VALUES (?,?,?)',
                   (self.device_id, account_data, self.user_id))
         c.close()
-        self.conn.commit()
+        self._commit(durable=True)
 
     def get_olm_account(self):
         """Gets the Olm account.
@@ -189,6 +282,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c = self.conn.cursor()
         c.execute('DELETE FROM accounts WHERE user_id=?', (self.user_id,))
         c.close()
+        self._commit(durable=True)
 
     def save_olm_session(self, curve_key, session):
         self.save_olm_sessions({curve_key: [session]})
@@ -205,7 +299,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
                 for key in sessions for s in sessions[key]]
         c.executemany('REPLACE INTO olm_sessions VALUES (?,?,?,?)', rows)
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def load_olm_sessions(self, sessions):
         """Loads all saved Olm sessions.
@@ -266,7 +360,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
                 for curve_key in session.forwarding_chain]
         c.executemany('INSERT OR IGNORE INTO forwarded_chains VALUES(?,?,?)', rows)
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def load_inbound_sessions(self, sessions):
         """Loads all saved inbound Megolm sessions.
@@ -345,7 +439,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c.execute('UPDATE megolm_outbound_sessions SET session=? WHERE device_id=? AND '
                   'room_id=?', (pickle, self.device_id, room_id))
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def load_outbound_sessions(self, sessions):
         """Loads all saved outbound Megolm sessions.
@@ -426,7 +520,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c.execute('DELETE FROM megolm_outbound_sessions WHERE device_id=? AND room_id=?',
                   (self.device_id, room_id))
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def save_megolm_outbound_devices(self, room_id, device_ids):
         """Saves devices an outbound Megolm session is shared with.
@@ -440,7 +534,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c.executemany(
             'INSERT OR IGNORE INTO megolm_outbound_devices VALUES (?,?,?)', rows)
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def save_device_keys(self, device_keys):
         """Saves device keys.
@@ -458,7 +552,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
                              device.ignored))
         c.executemany('REPLACE INTO device_keys VALUES (?,?,?,?,?,?,?,?)', rows)
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def load_device_keys(self, api, device_keys):
         """Loads all saved device keys.
@@ -531,7 +625,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         rows = [(self.device_id, user_id) for user_id in user_ids]
         c.executemany('INSERT OR IGNORE INTO tracked_users VALUES (?,?)', rows)
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def remove_tracked_users(self, user_ids):
         """Removes tracked users.
@@ -543,7 +637,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         rows = [(user_id,) for user_id in user_ids]
         c.executemany('DELETE FROM tracked_users WHERE user_id=?', rows)
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def load_tracked_users(self, tracked_users):
         """Loads all tracked users.
@@ -567,7 +661,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c = self.conn.cursor()
         c.execute('REPLACE INTO sync_tokens VALUES (?,?)', (self.device_id, sync_token))
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def get_sync_token(self):
         """Gets the saved sync token.
@@ -594,7 +688,7 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c.execute('INSERT OR IGNORE INTO outgoing_key_requests VALUES (?,?)',
                   (self.device_id, session_id))
         c.close()
-        self.conn.commit()
+        self._commit()
 
     def remove_outgoing_key_request(self, session_id):
         """Removes a key request.
@@ -621,6 +715,8 @@ CREATE TABLE IF NOT EXISTS outgoing_key_requests(
         c.close()
 
     def close(self):
+        self.flush()
+        _write_behind_stores.discard(self)
         self.conn.close()
 
     @property
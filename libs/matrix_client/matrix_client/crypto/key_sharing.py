@@ -63,9 +63,12 @@ class KeySharingManager(object):
             'request_id': session_id,
             'requesting_device_id': self.device_id
         }
+        # Called while the sync response is processed, in a store batch
+        self.db.commit()
         self.api.send_to_device('m.room_key_request', {self.user_id: {'*': payload}})
         self.outgoing_key_requests.discard(session_id)
         self.db.remove_outgoing_key_request(session_id)
+        self.db.commit()
         if self.key_forward_callback:
             self.key_forward_callback(session_id)
 
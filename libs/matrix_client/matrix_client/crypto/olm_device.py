@@ -432,8 +432,9 @@ class OlmDevice(Device):
                 raise RuntimeError('Error decrypting pre-key message with new session: '
                                    '{}.'.format(e))
             self.olm_account.remove_one_time_keys(session)
-            self.db.save_olm_account(self.olm_account)
+            # Saving the account commits the session with it, even in a write-behind batch
             self.db.save_olm_session(sender_key, session)
+            self.db.save_olm_account(self.olm_account)
             sessions.append(session)
 
         return json.loads(event)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+class EventListeners(object):
+    """A collection of event listeners, indexed by the event type they listen for.
+
+    Listeners are dicts with ``callback`` and ``event_type`` keys (and, optionally,
+    ``uid``), where an ``event_type`` of ``None`` means all event types. Iterating
+    over the collection yields the listeners in the order they were added.
+
+    :meth:`get` returns the listeners for an event type without going through
+    all the listeners each time. The collection is copied on modification, so
+    listeners can be added or removed while an event is being dispatched.
+    """
+
+    def __init__(self):
+        self._listeners = []
+        self._by_type = {}
+
+    def add(self, listener):
+        self._listeners = self._listeners + [listener]
+        self._by_type = {}
+
+    def remove(self, uid):
+        """Remove the listener with the given uid."""
+        self._listeners = [listener for listener in self._listeners
+                           if listener.get('uid') != uid]
+        self._by_type = {}
+
+    def get(self, event_type):
+        """Return the listeners for an event type, including the wildcard ones.
+
+        Args:
+            event_type (str): The event type.
+
+        Returns:
+            list: Listeners, in the order they were added.
+        """
+        by_type = self._by_type
+        try:
+            return by_type[event_type]
+        except KeyError:
+            listeners = [listener for listener in self._listeners
+                         if listener['event_type'] is None or
+                         listener['event_type'] == event_type]
+            by_type[event_type] = listeners
+            return listeners
+
+    def __iter__(self):
+        return iter(self._listeners)
+
+    def __len__(self):
+        return len(self._listeners)
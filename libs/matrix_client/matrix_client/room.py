@@ -15,9 +15,11 @@
 # limitations under the License.
 import logging
 import re
+from collections import deque
 from uuid import uuid4
 
 from .checks import check_room_id
+from .listeners import EventListeners
 from .user import User
 from .errors import MatrixRequestError, MatrixNoEncryptionError, UnableToDecryptError
 
@@ -36,11 +38,11 @@ class Room(object):
 
         self.room_id = room_id
         self.client = client
-        self.listeners = []
-        self.state_listeners = []
-        self.ephemeral_listeners = []
-        self.events = []
-        self.event_history_limit = 20
+        self.listeners = EventListeners()
+        self.state_listeners = EventListeners()
+        self.ephemeral_listeners = EventListeners()
+        # The most recent events, the oldest ones are discarded once the limit is reached
+        self.events = deque(maxlen=20)
         self.name = None
         self.canonical_alias = None
         self.aliases = []
@@ -52,6 +54,14 @@ class Room(object):
         self.members_displaynames = {
             # user_id: displayname
         }
+        # With lazy-loaded members, only some members are known until the full
+        # member list is requested, and membership events are processed when needed
+        self.lazy_members = getattr(client, "lazy_sync", False)
+        self._pending_state = {
+            # user_id: membership state event
+        }
+        # Room summary (heroes and member counts), sent with lazy-loaded members
+        self.summary = {}
         self.encrypted = False
         self.rotation_period_msgs = None
         self.rotation_period_ms = None
@@ -91,17 +101,27 @@ class Room(object):
         elif self.canonical_alias:
             return self.canonical_alias
 
-        # Member display names without me
-        members = [u.get_display_name(self) for u in self.get_joined_members() if
-                   self.client.user_id != u.user_id]
+        heroes = self.summary.get("m.heroes")
+        if self.lazy_members and heroes is not None:
+            # Not requesting the full member list just to get the room name
+            self.load_state()
+            members = [self.members_displaynames.get(user_id) or user_id
+                       for user_id in heroes if self.client.user_id != user_id]
+            count = self.summary.get("m.joined_member_count", 0) + \
+                self.summary.get("m.invited_member_count", 0) - 1
+        else:
+            # Member display names without me
+            members = [u.get_display_name(self) for u in self.get_joined_members() if
+                       self.client.user_id != u.user_id]
+            count = len(members)
         members.sort()
 
-        if len(members) == 1:
+        if count == 1 and members:
             return members[0]
-        elif len(members) == 2:
+        elif count == 2 and len(members) >= 2:
             return "{0} and {1}".format(members[0], members[1])
-        elif len(members) > 2:
-            return "{0} and {1} others".format(members[0], len(members) - 1)
+        elif count > 2 and members:
+            return "{0} and {1} others".format(members[0], count - 1)
         else:  # len(members) <= 0 or not an integer
             # TODO i18n
             return "Empty room"
@@ -289,7 +309,7 @@ class Room(object):
             uuid.UUID: Unique id of the listener, can be used to identify the listener.
         """
         listener_id = uuid4()
-        self.listeners.append(
+        self.listeners.add(
             {
                 'uid': listener_id,
                 'callback': callback,
@@ -300,8 +320,7 @@ class Room(object):
 
     def remove_listener(self, uid):
         """Remove listener with given uid."""
-        self.listeners[:] = (listener for listener in self.listeners
-                             if listener['uid'] != uid)
+        self.listeners.remove(uid)
 
     def add_ephemeral_listener(self, callback, event_type=None):
         """Add a callback handler for ephemeral events going to this room.
@@ -313,7 +332,7 @@ class Room(object):
             uuid.UUID: Unique id of the listener, can be used to identify the listener.
         """
         listener_id = uuid4()
-        self.ephemeral_listeners.append(
+        self.ephemeral_listeners.add(
             {
                 'uid': listener_id,
                 'callback': callback,
@@ -324,8 +343,7 @@ class Room(object):
 
     def remove_ephemeral_listener(self, uid):
         """Remove ephemeral listener with given uid."""
-        self.ephemeral_listeners[:] = (listener for listener in self.ephemeral_listeners
-                                       if listener['uid'] != uid)
+        self.ephemeral_listeners.remove(uid)
 
     def add_state_listener(self, callback, event_type=None):
         """Add a callback handler for state events going to this room.
@@ -334,7 +352,7 @@ class Room(object):
             callback (func(roomchunk)): Callback called when an event arrives.
             event_type (str): The event_type to filter for.
         """
-        self.state_listeners.append(
+        self.state_listeners.add(
             {
                 'callback': callback,
                 'event_type': event_type
@@ -352,25 +370,30 @@ class Room(object):
                     logger.warning(e)
                     self.client.olm_device.key_sharing_manager.request_missing_key(event)
         self.events.append(event)
-        if len(self.events) > self.event_history_limit:
-            self.events.pop(0)
         if 'state_key' in event:
             self._process_state_event(event)
 
         # Dispatch for room-specific listeners
-        for listener in self.listeners:
-            if listener['event_type'] is None or listener['event_type'] == event['type']:
-                listener['callback'](self, event)
+        for listener in self.listeners.get(event['type']):
+            listener['callback'](self, event)
 
     def _put_ephemeral_event(self, event):
         # Dispatch for room-specific listeners
-        for listener in self.ephemeral_listeners:
-            if listener['event_type'] is None or listener['event_type'] == event['type']:
-                listener['callback'](self, event)
+        for listener in self.ephemeral_listeners.get(event['type']):
+            listener['callback'](self, event)
 
     def get_events(self):
         """Get the most recent events for this room."""
-        return self.events
+        return list(self.events)
+
+    @property
+    def event_history_limit(self):
+        """The count of the most recent events kept in ``events``."""
+        return self.events.maxlen
+
+    @event_history_limit.setter
+    def event_history_limit(self, limit):
+        self.events = deque(self.events, maxlen=limit)
 
     def invite_user(self, user_id):
         """Invite a user to this room.
@@ -531,13 +554,15 @@ class Room(object):
 
     def get_joined_members(self):
         """Returns list of joined members (User objects)."""
-        if self._members:
+        self.load_state()
+        if self._members and not self.lazy_members:
             return list(self._members.values())
         response = self.client.api.get_room_members(self.room_id)
         for event in response["chunk"]:
             if event["content"]["membership"] == "join":
                 user_id = event["state_key"]
                 self._add_member(user_id, event["content"].get("displayname"))
+        self.lazy_members = False
         return list(self._members.values())
 
     def _add_member(self, user_id, displayname=None):
@@ -705,12 +730,35 @@ class Room(object):
         except MatrixRequestError:
             return False
 
+    def _defer_state_event(self, state_event):
+        """Process a membership state event when the room members are needed.
+
+        Other state events (and all of them, in encrypted rooms when encryption is
+        enabled) are processed right away.
+        """
+        if state_event.get("type") != "m.room.member" or \
+                (self.encrypted and self.client._encryption):
+            self._process_state_event(state_event)
+        else:
+            self._pending_state[state_event["state_key"]] = state_event
+
+    def load_state(self):
+        """Process the state events that were deferred until they're needed."""
+        if not self._pending_state:
+            return
+        pending_state, self._pending_state = self._pending_state, {}
+        for state_event in pending_state.values():
+            self._process_state_event(state_event)
+
     def _process_state_event(self, state_event):
         if "type" not in state_event:
             return  # Ignore event
         etype = state_event["type"]
         econtent = state_event["content"]
         clevel = self.client._cache_level
+        if etype == "m.room.member" and self._pending_state:
+            # A newer membership event supersedes the deferred one
+            self._pending_state.pop(state_event["state_key"], None)
 
         # Don't keep track of room state if caching turned off
         if clevel >= 0:
@@ -750,12 +798,8 @@ class Room(object):
                             self.client.olm_device.megolm_remove_outbound_session(
                                 self.room_id)
 
-        for listener in self.state_listeners:
-            if (
-                listener['event_type'] is None or
-                listener['event_type'] == state_event['type']
-            ):
-                listener['callback'](state_event)
+        for listener in self.state_listeners.get(state_event['type']):
+            listener['callback'](state_event)
 
     @property
     def prev_batch(self):
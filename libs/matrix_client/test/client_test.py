@@ -1,6 +1,8 @@
 import pytest
 import responses
 import json
+import re
+from contextlib import contextmanager
 from ..matrix_client import client as matrix_client_client
 from copy import deepcopy
 from ..matrix_client.client import MatrixClient, Room, User, CACHE
@@ -42,6 +44,21 @@ def test_create_client_with_token():
     assert whoami_url in req.url
 
 
+@responses.activate
+def test_create_client_without_initial_sync():
+    user_id = "@alice:example.com"
+    whoami_url = HOSTNAME+MATRIX_V2_API_PATH+"/account/whoami"
+    responses.add(
+        responses.GET,
+        whoami_url,
+        body='{"user_id": "%s"}' % user_id
+    )
+    client = MatrixClient(HOSTNAME, token="token", initial_sync=False)
+    assert len(responses.calls) == 1
+    assert client.user_id == user_id
+    assert client.sync_token is None
+
+
 def test_sync_token():
     client = MatrixClient("http://example.com")
     assert client.get_sync_token() is None
@@ -338,6 +355,150 @@ def test_presence_listener():
     assert accumulator == []
 
 
+@responses.activate
+def test_sync_listener():
+    client = MatrixClient("http://example.com")
+    accumulator = []
+    sync_url = HOSTNAME + MATRIX_V2_API_PATH + "/sync"
+    response_body = json.dumps(response_examples.example_sync)
+    responses.add(responses.GET, sync_url, body=response_body)
+    client.add_sync_listener(accumulator.append)
+    client._sync()
+    assert len(accumulator) == 1
+    assert accumulator[0]["next_batch"] == client.sync_token
+    assert "!726s6s6q:example.com" in client.rooms
+
+
+@responses.activate
+def test_lazy_sync():
+    client = MatrixClient(HOSTNAME, lazy_sync=True)
+    client.user_id = "@alice:example.com"
+    room_id = "!726s6s6q:example.com"
+    filter_url = re.compile(HOSTNAME + MATRIX_V2_API_PATH + "/user/.*/filter")
+    sync_url = HOSTNAME + MATRIX_V2_API_PATH + "/sync"
+    members_url = HOSTNAME + MATRIX_V2_API_PATH + "/rooms/" + quote(room_id) + "/members"
+    sync_response = deepcopy(response_examples.example_sync)
+    sync_response["rooms"]["join"][room_id]["summary"] = {
+        "m.heroes": ["@bob:example.com"],
+        "m.joined_member_count": 2
+    }
+    del sync_response["presence"]
+    responses.add(responses.POST, filter_url, body='{"filter_id": "1"}')
+    responses.add(responses.GET, sync_url, body=json.dumps(sync_response))
+    responses.add(responses.GET, members_url, body=json.dumps({"chunk": [
+        {"state_key": "@alice:example.com", "content": {"membership": "join"}},
+        {"state_key": "@bob:example.com", "content": {"membership": "join"}},
+        {"state_key": "@charlie:example.com", "content": {"membership": "join"}}
+    ]}))
+
+    client._sync()
+    uploaded_filter = json.loads(responses.calls[0].request.body)
+    assert uploaded_filter["room"]["state"]["lazy_load_members"]
+    assert uploaded_filter["presence"] == {"not_types": ["*"]}
+    assert "filter=1" in responses.calls[1].request.url
+    room = client.rooms[room_id]
+    # Membership from the state section is deferred, from the timeline - processed
+    assert "@alice:example.com" in room._pending_state
+    assert list(room._members.keys()) == ["@bob:example.com"]
+    # The room name comes from the summary, without requesting the members
+    assert room.display_name == "@bob:example.com"
+    assert not room._pending_state
+    assert len(responses.calls) == 2
+    assert len(room.get_joined_members()) == 3
+    assert not room.lazy_members
+
+    # The filter is only uploaded once
+    responses.add(responses.GET, sync_url, body=json.dumps(sync_response))
+    client._sync()
+    assert len(responses.calls) == 4
+
+
+@responses.activate
+def test_listener_index():
+    client = MatrixClient("http://example.com")
+    sync_url = HOSTNAME + MATRIX_V2_API_PATH + "/sync"
+    responses.add(responses.GET, sync_url, body=json.dumps(response_examples.example_sync))
+    all_events, messages, typing = [], [], []
+    client.add_listener(all_events.append)
+    client.add_listener(messages.append, event_type="m.room.message")
+    client.add_ephemeral_listener(typing.append, event_type="m.typing")
+    client._sync()
+    assert [e["type"] for e in all_events] == ["m.room.member", "m.room.message"]
+    assert [e["type"] for e in messages] == ["m.room.message"]
+    assert [e["type"] for e in typing] == ["m.typing"]
+
+
+def test_room_event_history():
+    client = MatrixClient("http://example.com")
+    room = client._mkroom("!UcYsUzyxTGDxLBEvLz:matrix.org")
+    messages, reactions = [], []
+    room.add_listener(lambda room, event: messages.append(event), event_type="m.room.message")
+    uid = room.add_listener(lambda room, event: reactions.append(event), event_type="m.reaction")
+    room.event_history_limit = 5
+    for i in range(8):
+        room._put_event({"type": "m.room.message", "content": {"body": str(i)}})
+    room.remove_listener(uid)
+    room._put_event({"type": "m.reaction", "content": {}})
+    assert [e["content"].get("body") for e in room.get_events()] == ["4", "5", "6", "7", None]
+    assert len(messages) == 8
+    assert reactions == []
+    # Lowering the limit keeps the most recent events
+    room.event_history_limit = 2
+    assert [e["type"] for e in room.get_events()] == ["m.room.message", "m.reaction"]
+    room._put_event({"type": "m.room.message", "content": {"body": "8"}})
+    assert len(room.get_events()) == 2
+
+
+@responses.activate
+def test_sync_crypto_batch():
+    """The crypto store batch only covers the to-device events, not the network
+    requests and listener calls made while processing the rest of the response."""
+    client = MatrixClient(HOSTNAME)
+    client._encryption = True
+    client.first_sync = False
+    calls = []
+
+    class Store(object):
+        in_batch = False
+
+        @contextmanager
+        def batch(self):
+            self.in_batch = True
+            try:
+                yield
+            finally:
+                self.in_batch = False
+
+    class Recorder(object):
+        def __init__(self, name):
+            self.name = name
+
+        def __getattr__(self, attr):
+            return lambda *args: calls.append((attr, store.in_batch))
+
+    store = Store()
+    client.olm_device = Recorder('olm_device')
+    client.olm_device.db = store
+    client.olm_device.device_list = Recorder('device_list')
+    client.olm_device.key_sharing_manager = Recorder('key_sharing_manager')
+    client.add_sync_listener(lambda response: calls.append(('sync_listener', store.in_batch)))
+    sync_response = {
+        "next_batch": "s72595_4483_1934",
+        "device_lists": {"changed": ["@bob:example.com"]},
+        "device_one_time_keys_count": {"signed_curve25519": 0},
+        "to_device": {"events": [{"type": "m.room.encrypted", "content": {}},
+                                 {"type": "m.room_key_request", "content": {}}]},
+    }
+    responses.add(responses.GET, HOSTNAME + MATRIX_V2_API_PATH + "/sync", json=sync_response)
+    client._sync()
+    assert ('olm_handle_encrypted_event', True) in calls
+    assert ('handle_key_request', True) in calls
+    assert ('update_one_time_key_counts', False) in calls
+    assert ('sync_listener', False) in calls
+    in_batch = [attr for attr, batched in calls if batched]
+    assert in_batch == ['olm_handle_encrypted_event', 'handle_key_request']
+
+
 @responses.activate
 def test_changing_user_power_levels():
     client = MatrixClient(HOSTNAME)
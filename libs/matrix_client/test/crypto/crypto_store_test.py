@@ -2,9 +2,12 @@ import pytest
 olm = pytest.importorskip("olm")  # noqa
 
 import os
+import sqlite3
 from collections import defaultdict
 from tempfile import mkdtemp
+from threading import Thread
 
+from matrix_client.crypto import crypto_store
 from matrix_client.crypto.crypto_store import CryptoStore
 from matrix_client.crypto.olm_device import OlmDevice
 from matrix_client.crypto.sessions import MegolmOutboundSession, MegolmInboundSession
@@ -376,3 +379,72 @@ class TestCryptoStore(object):
         assert saved_out_session.devices == out_session.devices
         assert device.device_keys[self.user_id][self.device_id].curve25519 == \
             device.curve25519
+
+    def test_write_behind(self):
+        store = CryptoStore(self.user_id, device_id=self.device_id, db_path=self.db_path,
+                            db_name='write_behind.db', write_behind=True)
+        reader = CryptoStore(self.user_id, device_id=self.device_id, db_path=self.db_path,
+                             db_name='write_behind.db')
+        try:
+            account = olm.Account()
+            store.save_olm_account(account)
+            with store.batch():
+                with store.batch():
+                    store.save_sync_token('batched')
+                # Writes are committed when the outermost batch ends
+                assert not reader.get_sync_token()
+                # Account writes are committed immediately, with the writes before them
+                store.save_olm_account(account)
+                assert reader.get_sync_token() == 'batched'
+                store.save_tracked_users({self.user_id})
+                tracked_user_ids = set()
+                reader.load_tracked_users(tracked_user_ids)
+                assert not tracked_user_ids
+            reader.load_tracked_users(tracked_user_ids)
+            assert tracked_user_ids == {self.user_id}
+
+            # Writes pending when the program exits are committed by flush()
+            with store.batch():
+                store.save_sync_token('pending')
+                store.flush()
+                assert reader.get_sync_token() == 'pending'
+            # Commits in WAL mode have to survive power loss
+            assert store.conn.execute('PRAGMA synchronous').fetchone()[0] == 2
+            assert store in crypto_store._write_behind_stores
+        finally:
+            store.close()
+            reader.close()
+            os.remove(os.path.join(self.db_path, 'write_behind.db'))
+        # Closed stores aren't flushed on exit anymore
+        assert store not in crypto_store._write_behind_stores
+
+    def test_write_behind_concurrent_writers(self):
+        store = CryptoStore(self.user_id, device_id=self.device_id, db_path=self.db_path,
+                            db_name='concurrent.db', write_behind=True)
+        try:
+            store.save_olm_account(olm.Account())
+            errors = []
+
+            def write():
+                try:
+                    store.save_tracked_users({'@bob:example.com'})
+                except sqlite3.OperationalError as e:
+                    errors.append(e)
+
+            with store.batch():
+                store.save_sync_token('batched')
+                # Committed before a network request or a callback, during which
+                # other threads write to the store
+                store.commit()
+                writer = Thread(target=write)
+                writer.start()
+                writer.join()
+                store.save_sync_token('batched again')
+            assert not errors
+            tracked_user_ids = set()
+            store.load_tracked_users(tracked_user_ids)
+            assert tracked_user_ids == {'@bob:example.com'}
+            assert store.get_sync_token() == 'batched again'
+        finally:
+            store.close()
+            os.remove(os.path.join(self.db_path, 'concurrent.db'))
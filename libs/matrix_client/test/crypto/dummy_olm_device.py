@@ -1,5 +1,7 @@
 """Tests can import OlmDevice from here, and know it won't try to use a database."""
 
+from contextlib import contextmanager
+
 from matrix_client.crypto.crypto_store import CryptoStore
 from matrix_client.crypto.olm_device import OlmDevice as BaseOlmDevice
 
@@ -9,7 +11,13 @@ class DummyStore(CryptoStore):
 
     def nop(*args, **kw): pass
 
+    @contextmanager
+    def nop_batch(*args, **kw):
+        yield
+
     def __getattribute__(self, name):
+        if name == 'batch':
+            return object.__getattribute__(self, 'nop_batch')
         if name in dir(CryptoStore):
             return object.__getattribute__(self, 'nop')
         raise AttributeError
@@ -1,4 +1,5 @@
 from helpers import setup_logger
+from libs.command_cache import get_command_cache
 from pydbus import SystemBus
 
 from operator import itemgetter
@@ -44,7 +45,7 @@ def list_units(unit_filter_field = None, unit_filter_values = []):
         logger.error("Set unit_filter_field '{}' not one of '{}'".format(unit_filter_field, available_unit_filter_fields))
         return False
 
-    for unit in systemd.ListUnits():
+    for unit in get_command_cache().call(("systemctl", "ListUnits"), systemd.ListUnits, ttl=1):
         unit_dict = {}
         assert (len(unit) == len(unit_params)), "Can't unpack the unit list - wrong number of arguments!"
         for i, param in enumerate(unit_params):
@@ -84,6 +85,8 @@ def action_unit(action, unit, mode="fail", en_dis_runtime=False, en_force=False)
     except Exception as e:
         logger.exception("Exception while trying to run '{}' on unit '{}'".format(action, unit))
         raise
+    finally:
+        get_command_cache().invalidate(["systemctl"])
 
     return job
 
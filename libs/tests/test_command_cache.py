@@ -0,0 +1,96 @@
+"""tests for the command cache"""
+import os
+import unittest
+from time import sleep
+from threading import Thread, Event
+from subprocess import CalledProcessError
+
+try:
+    from libs.command_cache import CommandCache
+except (ValueError, ImportError) as e:
+    print("Absolute imports failed, trying relative imports")
+    os.sys.path.append(os.path.dirname(os.path.abspath('.')))
+    from command_cache import CommandCache
+
+
+class TestCommandCache(unittest.TestCase):
+    """Tests the CommandCache class"""
+
+    def test_ttl(self):
+        cc = CommandCache()
+        calls = []
+        def function():
+            calls.append(None)
+            return len(calls)
+        assert(cc.call(("test",), function, ttl=0.05) == 1)
+        assert(cc.call(("test",), function, ttl=0.05) == 1)
+        sleep(0.06)
+        assert(cc.call(("test",), function, ttl=0.05) == 2)
+        stats = cc.get_stats()
+        assert(stats["hits"] == 1)
+        assert(stats["misses"] == 2)
+
+    def test_check_output(self):
+        cc = CommandCache()
+        assert(cc.check_output(["echo", "hello"]).strip() == "hello")
+        assert(cc.check_output(["echo", "hello"]).strip() == "hello")
+        assert(cc.check_output(["echo", "world"]).strip() == "world")
+        assert(cc.get_stats()["forks"] == 2)
+        self.assertRaises(CalledProcessError, cc.check_output, ["false"])
+        self.assertRaises(CalledProcessError, cc.check_output, ["false"])
+        # Errors aren't cached
+        assert(cc.get_stats()["forks"] == 4)
+        assert(cc.get_stats()["errors"] == 2)
+
+    def test_coalescing(self):
+        """Tests that concurrent callers share a single call"""
+        cc = CommandCache()
+        proceed = Event()
+        calls = []
+        def function():
+            calls.append(None)
+            proceed.wait()
+            return "result"
+        results = []
+        threads = [Thread(target=lambda: results.append(cc.call(("test",), function))) for _ in range(5)]
+        for t in threads:
+            t.start()
+        sleep(0.05)
+        proceed.set()
+        for t in threads:
+            t.join()
+        assert(results == ["result"]*5)
+        assert(len(calls) == 1)
+        stats = cc.get_stats()
+        assert(stats["misses"] == 1)
+        assert(stats["coalesced"] == 4)
+
+    def test_invalidation(self):
+        cc = CommandCache()
+        calls = []
+        def function():
+            calls.append(None)
+            return len(calls)
+        cc.call(("wpa_cli", "status"), function)
+        cc.call(("lsusb",), function)
+        cc.invalidate(["wpa_cli"])
+        assert(cc.call(("wpa_cli", "status"), function) == 3)
+        assert(cc.call(("lsusb",), function) == 2)
+        cc.invalidate()
+        assert(cc.call(("lsusb",), function) == 4)
+
+    def test_invalidation_while_running(self):
+        """Tests that results of calls running during invalidation aren't cached"""
+        cc = CommandCache()
+        proceed = Event()
+        t = Thread(target=cc.call, args=(("test",), lambda: proceed.wait() or "stale"))
+        t.start()
+        sleep(0.05)
+        cc.invalidate(["test"])
+        proceed.set()
+        t.join()
+        assert(cc.call(("test",), lambda: "fresh") == "fresh")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -235,6 +235,12 @@ if __name__ == '__main__':
         help='Launch ZPUI with a single app loaded (useful for testing)',
         dest='name',
         default=None)
+    parser.add_argument(
+        '--config',
+        '-c',
+        help='Use this config file instead of the default ones (useful with the headless drivers)',
+        dest='config_path',
+        default=None)
     parser.add_argument(
         '--log-level',
         '-l',
@@ -246,6 +252,8 @@ if __name__ == '__main__':
         help='Skips PID check on startup (not applicable for emulator as it doesn\'t do PID check)',
         action='store_true')
     args = parser.parse_args()
+    if args.config_path:
+        config_paths.insert(0, args.config_path)
 
     # Setup logging
     logger = logging.getLogger()
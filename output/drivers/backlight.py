@@ -1,6 +1,4 @@
-from threading import Thread, Event
-from time import sleep
-from datetime import datetime
+from helpers import InactivityTimer
 
 def activate_backlight_wrapper(func):
     def wrapper(display, *args, **kwargs):
@@ -9,7 +7,7 @@ def activate_backlight_wrapper(func):
            if b:
                if not hasattr(display, "trigger_backlight_on_change"):
                    print("Backlight only on change requested but display driver doesn't have a change check hook!")
-               elif not display.trigger_backlight_on_change(display, func.__name__, *args, **kwargs):
+               elif not display.trigger_backlight_on_change(func.__name__, *args, **kwargs):
                    # No need to re-trigger backlight at the moment, return
                    # if the image keeps being the same, it will just timeout
                    # Also, assuming that trigger_backlight_on_change implies
@@ -17,12 +15,11 @@ def activate_backlight_wrapper(func):
                    # if it were to be executed => we don't need to update
                    # current_image and so on
                    return
+        # Restarting the timers before enabling the backlight, in case
+        # the backlight is being turned off at this very moment
+        display._backlight_woken = display.reset_backlight_timers()
         display.enable_backlight()
-        display._backlight_active.set()
-        result = func(display, *args, **kwargs)
-        if display._backlight_interval and display._bl_thread is None:
-            display.start_backlight_thread()
-        return result
+        return func(display, *args, **kwargs)
     return wrapper
 
 def enable_backlight_wrapper(func):
@@ -42,11 +39,20 @@ def disable_backlight_wrapper(func):
     return wrapper
 
 class BacklightManager(object):
-    _last_active = datetime.now()
+    """
+    A mixin for output drivers that turns the backlight off after
+    ``backlight_interval`` seconds of inactivity (and, optionally, dims it
+    after ``backlight_dim_interval`` seconds, if the driver supports dimming).
+    The timeouts run on the shared timer scheduler thread, so display updates
+    and keypresses only need to update a timestamp.
+    """
     _backlight_enabled = False
-    _backlight_active = Event()
+    _backlight_dimmed = False
+    _backlight_woken = False
+    _bl_timer = None
+    _bl_dim_timer = None
 
-    def init_backlight(self, backlight_active_level=True, backlight_pin = None, backlight_interval = None, **kwargs):
+    def init_backlight(self, backlight_active_level=True, backlight_pin = None, backlight_interval = None, backlight_dim_interval = None, **kwargs):
         self._backlight_active_level = backlight_active_level
         self._backlight_pin = backlight_pin
         if self._backlight_pin:
@@ -57,16 +63,34 @@ class BacklightManager(object):
             self._bl_gpio.setup(self._backlight_pin, self._bl_gpio.OUT)
         self._backlight_interval = backlight_interval
         if self._backlight_interval:
-            self.start_backlight_thread()
+            self._bl_timer = InactivityTimer(self._backlight_interval, self.disable_backlight, name="backlight_{}".format(id(self)))
+            self._bl_timer.poke()
+        if backlight_dim_interval:
+            self._bl_dim_timer = InactivityTimer(backlight_dim_interval, self.dim_backlight, name="backlight_dim_{}".format(id(self)))
+            self._bl_dim_timer.poke()
 
     def set_backlight_callback(self, obj):
         obj.backlight_cb = self.activate_backlight
 
+    def reset_backlight_timers(self):
+        """
+        Restarts the backlight timeouts, undimming the backlight if necessary.
+        Returns ``True`` if the backlight timeout had already expired
+        (i.e. the backlight was off), ``False`` otherwise.
+        """
+        if self._bl_dim_timer is not None:
+            self._bl_dim_timer.poke()
+            if self._backlight_dimmed:
+                self.undim_backlight()
+        if self._bl_timer is not None:
+            return self._bl_timer.poke()
+        return False
+
     @activate_backlight_wrapper
     def activate_backlight(self):
-        """Returns True when backlight has been activated, False if 
+        """Returns True when backlight has been activated, False if
         backlight timer is disabled or backlight is already enabled"""
-        return self._backlight_interval and self._bl_thread is None
+        return self._backlight_woken
 
     @enable_backlight_wrapper
     def enable_backlight(self):
@@ -78,18 +102,17 @@ class BacklightManager(object):
         if self._backlight_pin:
             self._bl_gpio.output(self._backlight_pin, not self._backlight_active_level)
 
-    def start_backlight_thread(self):
-        self._bl_thread = Thread(target=self.backlight_manager, name="Screen backlight manager thread")
-        self._bl_thread.daemon = True
-        self._bl_thread.start()
+    def dim_backlight(self):
+        """Dims the backlight. Drivers that support dimming need to override
+        ``set_backlight_dimmed``."""
+        if self._backlight_enabled and not self._backlight_dimmed:
+            self._backlight_dimmed = True
+            self.set_backlight_dimmed(True)
+
+    def undim_backlight(self):
+        if self._backlight_dimmed:
+            self._backlight_dimmed = False
+            self.set_backlight_dimmed(False)
 
-    def backlight_manager(self):
-        while True:
-            if self._backlight_active.isSet():
-                self._backlight_active.clear()
-                self._last_active = datetime.now()
-            elif (datetime.now() - self._last_active).total_seconds() >self._backlight_interval and self._backlight_enabled:
-                self.disable_backlight()
-                self._bl_thread = None
-                return
-            sleep(float(self._backlight_interval)/2) #Doesn't need to be done much often unless you need your backlight to be super precise. /2 is minimum though. 1 cycle to clear the flag and 1 cycle to disable backlight
+    def set_backlight_dimmed(self, dimmed):
+        pass
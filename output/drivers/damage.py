@@ -0,0 +1,187 @@
+"""
+Helpers for partial ("dirty region") display updates. A new frame is compared
+against the frame that was pushed to the display the last time, and only
+the changed part of the frame is sent over the bus (or the pipe, in case
+of the emulator).
+
+SSD1306/SH1106-style controllers organize their memory in 8 pixel high
+"pages", where each byte is one 8-pixel column of a page (LSB on top),
+so the helpers here work in terms of pages and column ranges.
+"""
+
+from copy import copy
+
+from PIL import Image, ImageChops
+
+PAGE_HEIGHT = 8
+
+
+def get_image_fingerprint(image):
+    """
+    Returns a compact value identifying the contents of an image - two images
+    with the same contents will have the same fingerprint. Much cheaper
+    than diffing the images, and doesn't need the previous image around.
+
+    >>> a = Image.new("1", (128, 64))
+    >>> b = a.copy()
+    >>> get_image_fingerprint(a) == get_image_fingerprint(b)
+    True
+    >>> b.putpixel((10, 20), 1)
+    >>> get_image_fingerprint(a) == get_image_fingerprint(b)
+    False
+    """
+    return (image.mode, image.size, hash(image.tobytes()))
+
+def get_data_fingerprint(data, cursor_position=None):
+    """
+    Returns a fingerprint for a ``display_data`` call, so that unchanged text
+    can be detected without rendering it onto an image.
+    """
+    return ("display_data", tuple(data), cursor_position)
+
+def get_dirty_bbox(old, new):
+    """
+    Returns the bounding box of the area that differs between two images,
+    or ``None`` if the images are the same. If there's no previous image
+    (or it can't be compared to the new one), the whole new image is
+    considered to be dirty.
+
+    >>> a = Image.new("1", (128, 64))
+    >>> b = a.copy()
+    >>> get_dirty_bbox(a, b) is None
+    True
+    >>> b.putpixel((10, 20), 1)
+    >>> get_dirty_bbox(a, b)
+    (10, 20, 11, 21)
+    >>> get_dirty_bbox(None, b)
+    (0, 0, 128, 64)
+    """
+    if old is None or old.size != new.size or old.mode != new.mode:
+        return (0, 0) + new.size
+    return ImageChops.difference(old, new).getbbox()
+
+def get_dirty_pages(old, new, page_height=PAGE_HEIGHT):
+    """
+    Returns a ``(pages, x0, x1)`` tuple, where ``pages`` is a list of page
+    numbers that have changed between two images, and ``x0``/``x1`` is
+    the range of columns that need to be re-sent (``x1`` is exclusive).
+    Returns ``([], 0, 0)`` if nothing changed.
+
+    >>> a = Image.new("1", (128, 64))
+    >>> b = a.copy()
+    >>> get_dirty_pages(a, b)
+    ([], 0, 0)
+    >>> b.putpixel((10, 3), 1)
+    >>> b.putpixel((20, 60), 1)
+    >>> get_dirty_pages(a, b)
+    ([0, 7], 10, 21)
+    """
+    bbox = get_dirty_bbox(old, new)
+    if bbox is None:
+        return [], 0, 0
+    x0, y0, x1, y1 = bbox
+    first_page = y0 // page_height
+    last_page = (y1 - 1) // page_height
+    if old is None or old.size != new.size or old.mode != new.mode:
+        return list(range(first_page, last_page+1)), x0, x1
+    pages = []
+    for page in range(first_page, last_page+1):
+        # Pages in between the first and last changed ones might be unchanged
+        page_box = (x0, page*page_height, x1, (page+1)*page_height)
+        if old.crop(page_box).tobytes() != new.crop(page_box).tobytes():
+            pages.append(page)
+    return pages, x0, x1
+
+def group_pages(pages):
+    """
+    Groups a sorted list of page numbers into ``(first, last)`` runs
+    of consecutive pages, so that each run can be sent in one transfer.
+
+    >>> group_pages([0, 1, 2, 5, 7, 8])
+    [(0, 2), (5, 5), (7, 8)]
+    """
+    runs = []
+    for page in pages:
+        if runs and runs[-1][1] == page - 1:
+            runs[-1] = (runs[-1][0], page)
+        else:
+            runs.append((page, page))
+    return runs
+
+def get_page_data(image, first_page, last_page, x0, x1, page_height=PAGE_HEIGHT):
+    """
+    Converts a region of a "1"-mode image into the SSD1306/SH1106 memory
+    layout - for each page, one byte per column, LSB being the top pixel.
+
+    >>> i = Image.new("1", (16, 16))
+    >>> i.putpixel((1, 0), 1)
+    >>> i.putpixel((1, 7), 1)
+    >>> i.putpixel((2, 9), 1)
+    >>> list(get_page_data(i, 0, 1, 0, 3))
+    [0, 129, 0, 0, 0, 2]
+    """
+    if image.mode != "1":
+        image = image.convert("1")
+    region = image.crop((x0, first_page*page_height, x1, (last_page+1)*page_height))
+    data = bytearray()
+    for page in range(last_page-first_page+1):
+        strip = region.crop((0, page*page_height, x1-x0, (page+1)*page_height))
+        # Rotating clockwise makes each column a row of 8 pixels, with
+        # the bottom pixel first - which packs into the column byte we need
+        data += bytearray(strip.transpose(Image.ROTATE_270).tobytes())
+    return data
+
+
+class PartialUpdateManager(object):
+    """
+    A mixin for output drivers that keeps a copy (and a fingerprint) of the last
+    frame pushed to the display, as well as counters of frames pushed and bytes sent.
+    Drivers call ``record_push`` after every transfer; the counters
+    are available through ``get_output_stats``.
+    """
+    _partial_updates = False
+    _last_pushed_image = None
+    _last_fingerprint = None
+    output_stats = None
+
+    def init_partial_updates(self, partial_updates=True, **kwargs):
+        self._partial_updates = partial_updates
+        self._last_pushed_image = None
+        self._last_fingerprint = None
+        self.reset_output_stats()
+
+    def reset_output_stats(self):
+        self.output_stats = {"frames":0, "full_frames":0, "partial_frames":0,
+                             "skipped_frames":0, "bus_bytes":0, "push_time":0.0,
+                             "last_frame_bytes":0, "last_push_time":0.0}
+
+    def get_output_stats(self):
+        """
+        Returns a dictionary with frame, byte and push time counters -
+        both the totals and the values for the last frame pushed.
+        """
+        return copy(self.output_stats)
+
+    def record_push(self, byte_count, push_time, partial=False):
+        if self.output_stats is None:
+            self.reset_output_stats()
+        stats = self.output_stats
+        stats["frames"] += 1
+        if byte_count == 0:
+            stats["skipped_frames"] += 1
+        elif partial:
+            stats["partial_frames"] += 1
+        else:
+            stats["full_frames"] += 1
+        stats["bus_bytes"] += byte_count
+        stats["push_time"] += push_time
+        stats["last_frame_bytes"] = byte_count
+        stats["last_push_time"] = push_time
+
+    def invalidate_last_pushed(self):
+        """
+        Forgets the last pushed frame, so that the next frame is sent in full
+        (to be called when the display contents are changed by other means).
+        """
+        self._last_pushed_image = None
+        self._last_fingerprint = None
@@ -0,0 +1,195 @@
+"""
+Headless output driver - keeps the framebuffer in memory instead of
+showing it anywhere, and records a timestamp for every frame displayed.
+Together with the ``headless`` input driver, allows running ZPUI (and
+benchmarking UI elements and apps) without any hardware or X server.
+
+Frames can optionally be dumped as PNG files (one file per frame) and,
+if the Pillow version installed supports it, as an APNG animation once
+ZPUI exits.
+"""
+
+import os
+import atexit
+from threading import Lock
+
+from luma.core.device import dummy
+from luma.core.render import canvas
+from PIL import Image
+
+from helpers import setup_logger, monotonic
+from ..output import GraphicalOutputDevice, CharacterOutputDevice
+
+logger = setup_logger(__name__, "info")
+
+
+def apng_supported():
+    Image.init()
+    return "PNG" in Image.SAVE_ALL
+
+
+class Screen(GraphicalOutputDevice, CharacterOutputDevice):
+    """
+    Kwargs:
+
+    * ``width``, ``height``, ``mode``: framebuffer parameters.
+    * ``trace_dir``: if set, every frame is saved as a PNG file in this directory.
+    * ``apng_path``: if set, all the frames are saved as an APNG animation at exit
+      (frame durations are taken from the frame timestamps).
+    * ``stats_path``: if set, frame timestamps are written into this file at exit,
+      one per line, relative to the first frame.
+    """
+
+    current_image = None
+
+    __base_classes__ = (GraphicalOutputDevice, CharacterOutputDevice)
+
+    type = ["char", "b&w"]
+    cursor_enabled = False
+    cursor_pos = (0, 0) #x, y
+
+    def __init__(self, width=128, height=64, mode="1", trace_dir=None, apng_path=None, stats_path=None):
+        self.width = width
+        self.height = height
+        self.char_width = 6
+        self.char_height = 8
+        self.cols = self.width / self.char_width
+        self.rows = self.height / self.char_height
+        self.device = dummy(width=self.width, height=self.height, mode=mode)
+        self.device_mode = self.device.mode
+        self.busy_flag = Lock()
+        self.trace_dir = trace_dir
+        if self.trace_dir and not os.path.isdir(self.trace_dir):
+            os.makedirs(self.trace_dir)
+        self.apng_path = apng_path
+        if self.apng_path and not apng_supported():
+            logger.warning("APNG saving is not supported by the installed Pillow version, not saving the trace!")
+            self.apng_path = None
+        self.stats_path = stats_path
+        self.frame_times = []
+        self.frames = []
+        if self.apng_path or self.stats_path:
+            atexit.register(self.save_traces)
+
+    def display_image(self, image, **kwargs):
+        """Displays a PIL Image object onto the display
+        Also saves it for the case where display needs to be refreshed"""
+        with self.busy_flag:
+            self.current_image = image
+            self._display_image(image)
+
+    def _display_image(self, image):
+        self.frame_times.append(monotonic())
+        self.device.display(image)
+        if self.trace_dir:
+            path = os.path.join(self.trace_dir, "frame_{:06d}.png".format(len(self.frame_times)-1))
+            image.save(path)
+        if self.apng_path:
+            self.frames.append(image.copy())
+
+    def get_frame_stats(self):
+        """
+        Returns a dictionary with the frame count, as well as
+        the time between the first and the last frame, and the frame
+        intervals (minimum, average and maximum).
+        """
+        times = self.frame_times[:]
+        stats = {"frames": len(times), "duration": 0}
+        if len(times) > 1:
+            intervals = [b-a for a, b in zip(times, times[1:])]
+            stats["duration"] = times[-1] - times[0]
+            stats["min_interval"] = min(intervals)
+            stats["avg_interval"] = stats["duration"] / len(intervals)
+            stats["max_interval"] = max(intervals)
+        return stats
+
+    def save_traces(self):
+        if self.stats_path and self.frame_times:
+            start = self.frame_times[0]
+            with open(self.stats_path, "w") as f:
+                for t in self.frame_times:
+                    f.write("{:.6f}\n".format(t-start))
+        if self.apng_path and self.frames:
+            times = self.frame_times[-len(self.frames):]
+            # Durations are in milliseconds, the last frame is shown for a second
+            durations = [int((b-a)*1000) or 1 for a, b in zip(times, times[1:])] + [1000]
+            self.frames[0].save(self.apng_path, save_all=True, append_images=self.frames[1:], duration=durations)
+
+    def display_data_onto_image(self, *args, **kwargs):
+        """
+        This method takes lines of text and draws them onto an image,
+        helping emulate a character display API.
+        """
+        cursor_position = kwargs.pop("cursor_position", None)
+        if not cursor_position:
+            cursor_position = self.cursor_pos if self.cursor_enabled else None
+        args = args[:self.rows]
+        draw = canvas(self.device)
+        d = draw.__enter__()
+        if cursor_position:
+            dims = (self.cursor_pos[0] - 1 + 2, self.cursor_pos[1] - 1, self.cursor_pos[0] + self.char_width + 2,
+                    self.cursor_pos[1] + self.char_height + 1)
+            d.rectangle(dims, outline="white")
+        for line, arg in enumerate(args):
+            y = (line * self.char_height - 1) if line != 0 else 0
+            d.text((2, y), arg, fill="white")
+        return draw.image
+
+    def display_data(self, *args):
+        """Displays data on display. This function does the actual work of printing things to display.
+
+        ``*args`` is a list of strings, where each string corresponds to a row of the display, starting with 0."""
+        image = self.display_data_onto_image(*args)
+        with self.busy_flag:
+            self.current_image = image
+            self._display_image(image)
+
+    def home(self):
+        self.setCursor(0, 0)
+
+    def clear(self):
+        draw = canvas(self.device)
+        self.display_image(draw.image)
+        del draw
+
+    def setCursor(self, row, col):
+        self.cursor_pos = (col * self.char_width, row * self.char_height)
+
+    def createChar(self, char_num, char_contents):
+        pass
+
+    def noDisplay(self):
+        pass
+
+    def display(self):
+        pass
+
+    def noCursor(self):
+        self.cursor_enabled = False
+
+    def cursor(self):
+        self.cursor_enabled = True
+
+    def noBlink(self):
+        pass
+
+    def blink(self):
+        pass
+
+    def scrollDisplayLeft(self):
+        pass
+
+    def scrollDisplayRight(self):
+        pass
+
+    def leftToRight(self):
+        pass
+
+    def rightToLeft(self):
+        pass
+
+    def autoscroll(self):
+        pass
+
+    def noAutoscroll(self):
+        pass
@@ -3,7 +3,8 @@
 #luma.oled library used: https://github.com/rm-hull/luma.oled
 
 from mock import Mock
-from threading import Lock
+from threading import Lock, local
+from time import time
 
 try:
     from luma.core.interface.serial import spi, i2c
@@ -11,14 +12,14 @@ except ImportError:
     #Compatilibity with older luma.oled version
     from luma.core.serial import spi, i2c
 from luma.core.render import canvas
-from PIL import ImageChops
 
 
 from backlight import *
+from damage import PartialUpdateManager, get_dirty_pages, get_image_fingerprint, get_data_fingerprint
 from ..output import GraphicalOutputDevice, CharacterOutputDevice
 
 
-class LumaScreen(GraphicalOutputDevice, CharacterOutputDevice, BacklightManager):
+class LumaScreen(GraphicalOutputDevice, CharacterOutputDevice, BacklightManager, PartialUpdateManager):
     """An object that provides high-level functions for interaction with display. It contains all the high-level logic and exposes an interface for system and applications to use."""
 
     #buffer = " "
@@ -48,9 +49,15 @@ class LumaScreen(GraphicalOutputDevice, CharacterOutputDevice, BacklightManager)
     default_width = 128
     default_height = 64
 
+    # Contrast levels used for backlight dimming
+    default_contrast = 0xCF
+    default_dim_contrast = 0x10
+
     def __init__(self, hw="spi", port=None, address=None, gpio_dc=None, gpio_rst=None, \
-                      width=None, height=None, **kwargs):
+                      width=None, height=None, contrast=None, dim_contrast=None, **kwargs):
         self.hw = hw
+        self.contrast = contrast if contrast else self.default_contrast
+        self.dim_contrast = dim_contrast if dim_contrast else self.default_dim_contrast
         assert hw in ("spi", "i2c", "dummy"), "Wrong hardware suggested: '{}'!".format(hw)
         if self.hw == "spi":
             self.port = port if port else self.default_spi_port
@@ -75,6 +82,10 @@ class LumaScreen(GraphicalOutputDevice, CharacterOutputDevice, BacklightManager)
         else:
             raise ValueError("Unknown interface type: {}".format(hw))
         self.busy_flag = Lock()
+        # Fingerprint calculated by trigger_backlight_on_change for the display_image
+        # call that follows it - per thread, since display_image can be called
+        # from several threads at once
+        self._fingerprint_cache = local()
         self.width = width if width else self.default_width
         self.height = height if height else self.default_height
         self.char_width = 6
@@ -83,7 +94,11 @@ class LumaScreen(GraphicalOutputDevice, CharacterOutputDevice, BacklightManager)
         self.rows = self.height / self.char_height
         self.init_display(**kwargs)
         self.device_mode = self.device.mode
+        # Monochrome OLEDs take 1 bit per pixel, color LCDs take 16 bits (RGB565)
+        bits_per_pixel = 1 if self.device_mode == "1" else 16
+        self.full_frame_bytes = self.width*self.height*bits_per_pixel/8
         BacklightManager.init_backlight(self, **kwargs)
+        PartialUpdateManager.init_partial_updates(self, **kwargs)
 
     @enable_backlight_wrapper
     def enable_backlight(self):
@@ -93,32 +108,79 @@ class LumaScreen(GraphicalOutputDevice, CharacterOutputDevice, BacklightManager)
     def disable_backlight(self):
         self.device.hide()
 
+    def set_backlight_dimmed(self, dimmed):
+        with self.busy_flag:
+            self.device.contrast(self.dim_contrast if dimmed else self.contrast)
+
     @activate_backlight_wrapper
     def display_image(self, image, actually_output=False):
         """Displays a PIL Image object onto the display
         Also saves it for the case where display needs to be refreshed"""
+        fingerprint = self.get_frame_fingerprint("display_image", image)
         with self.busy_flag:
             self.current_image = image
+            if fingerprint == self._last_fingerprint:
+                # Same frame is already on the display
+                self.record_push(0, 0)
+                return
+            self._last_fingerprint = fingerprint
             self._display_image(image)
 
-    def trigger_backlight_on_change(self, func_name, *args, **kwargs):
+    def get_frame_fingerprint(self, func_name, *args):
         """
-        Hook that allows the backlight driver to determine whether the image has changed.
+        Returns a fingerprint of the frame that a ``display_image``/``display_data``
+        call would result in. For images, reuses the fingerprint calculated by
+        ``trigger_backlight_on_change`` during the same call (in the same thread).
         """
         if func_name == "display_image":
             image = args[0]
-            is_new_image = ImageChops.difference(image, self.current_image).getbbox() is None
-            return is_new_image
+            cached = getattr(self._fingerprint_cache, "entry", None)
+            self._fingerprint_cache.entry = None
+            if cached is not None and cached[0] is image:
+                return cached[1]
+            return get_image_fingerprint(image)
         elif func_name == "display_data":
-            # Redundant, sorry =(
-            image = self.display_data_onto_image(*args)
-            is_new_image = ImageChops.difference(image, self.current_image).getbbox() is None
-            return is_new_image
+            cursor_position = self.cursor_pos if self.cursor_enabled else None
+            return get_data_fingerprint(args[:self.rows], cursor_position)
         else:
             raise ValueError("Unknown function wrapped, wtf?")
 
+    def trigger_backlight_on_change(self, func_name, *args, **kwargs):
+        """
+        Hook that allows the backlight driver to determine whether the image has changed.
+        Returns ``True`` if the frame is different from the one on the display.
+        """
+        fingerprint = self.get_frame_fingerprint(func_name, *args)
+        is_new_frame = fingerprint != self._last_fingerprint
+        if is_new_frame and func_name == "display_image":
+            # display_image will be called right after this - no need to calculate it twice
+            self._fingerprint_cache.entry = (args[0], fingerprint)
+        return is_new_frame
+
     def _display_image(self, image):
-        self.device.display(image)
+        """
+        Pushes the image to the display. If the driver supports partial updates
+        (has a ``_push_pages`` method), only the pages that changed since
+        the last pushed frame are sent.
+        """
+        start = time()
+        partial = self._partial_updates and hasattr(self, "_push_pages")
+        if partial:
+            # Comparing frames the way they'll end up in display memory (i.e. rotated)
+            frame = self.device.preprocess(image)
+            pages, x0, x1 = get_dirty_pages(self._last_pushed_image, frame)
+            if self._last_pushed_image is None:
+                self.device.display(image)
+                byte_count = self.full_frame_bytes
+                partial = False
+            else:
+                byte_count = self._push_pages(frame, pages, x0, x1) if pages else 0
+            # Keeping a copy, in case the caller keeps drawing on the same image
+            self._last_pushed_image = frame.copy()
+        else:
+            self.device.display(image)
+            byte_count = self.full_frame_bytes
+        self.record_push(byte_count, time()-start, partial=partial)
 
     def display_data_onto_image(self, *args, **kwargs):
         """
@@ -145,9 +207,15 @@ class LumaScreen(GraphicalOutputDevice, CharacterOutputDevice, BacklightManager)
         """Displays data on display. This function does the actual work of printing things to display.
 
         ``*args`` is a list of strings, where each string corresponds to a row of the display, starting with 0."""
-        image = self.display_data_onto_image(*args)
+        fingerprint = self.get_frame_fingerprint("display_data", *args)
         with self.busy_flag:
+            if fingerprint == self._last_fingerprint:
+                # Same text is already on the display, no need to even render it
+                self.record_push(0, 0)
+                return
+            image = self.display_data_onto_image(*args)
             self.current_image = image
+            self._last_fingerprint = fingerprint
             self._display_image(image)
 
     def home(self):
@@ -1,17 +1,37 @@
 #!/usr/bin/python
 
 from luma_driver import LumaScreen
+from damage import get_page_data
 from luma.oled.device import sh1106
 
 from output.output import OutputDevice
 
+# Addressing command used for partial updates
+SET_PAGE_ADDRESS = 0xB0
+
 
 class Screen(LumaScreen, OutputDevice):
     """An object that provides high-level functions for interaction with display. It contains all the high-level logic and exposes an interface for system and applications to use."""
 
     default_rotate = 0
+    default_contrast = 0x7F
 
     def init_display(self, **kwargs):
         """Initializes SH1106 controller. """
         self.rotate = kwargs.pop("rotate", self.default_rotate)
         self.device = sh1106(self.serial, width=self.width, height=self.height, rotate=self.rotate)
+
+    def _push_pages(self, image, pages, x0, x1):
+        """
+        Sends the changed pages to the display, page by page (SH1106 doesn't
+        support addressing windows). Returns the amount of bytes sent.
+        """
+        byte_count = 0
+        for page in pages:
+            # SH1106 has 132 columns of RAM, the visible ones start at column 2
+            column = x0 + 2
+            self.device.command(SET_PAGE_ADDRESS | page, column & 0x0F, 0x10 | (column >> 4))
+            data = get_page_data(image, page, page, x0, x1)
+            self.device.data(list(data))
+            byte_count += 3 + len(data)
+        return byte_count
@@ -1,10 +1,15 @@
 #!/usr/bin/python
 
 from luma_driver import LumaScreen
+from damage import group_pages, get_page_data
 from luma.oled.device import ssd1306
 
 from output.output import OutputDevice
 
+# Addressing commands used for partial updates
+COLUMNADDR = 0x21
+PAGEADDR = 0x22
+
 
 class Screen(LumaScreen, OutputDevice):
     """An object that provides high-level functions for interaction with display. It contains all the high-level logic and exposes an interface for system and applications to use."""
@@ -15,3 +20,17 @@ class Screen(LumaScreen, OutputDevice):
         """Initializes SSD1306 controller. """
         self.rotate = kwargs.pop("rotate", self.default_rotate)
         self.device = ssd1306(self.serial, width=self.width, height=self.height, rotate=self.rotate)
+
+    def _push_pages(self, image, pages, x0, x1):
+        """
+        Sends the changed pages to the display, using one addressing window
+        per run of consecutive pages. Returns the amount of bytes sent.
+        """
+        colstart = getattr(self.device, "_colstart", 0)
+        byte_count = 0
+        for first_page, last_page in group_pages(pages):
+            self.device.command(COLUMNADDR, colstart + x0, colstart + x1 - 1, PAGEADDR, first_page, last_page)
+            data = get_page_data(image, first_page, last_page, x0, x1)
+            self.device.data(list(data))
+            byte_count += 6 + len(data)
+        return byte_count
@@ -1,7 +1,13 @@
+from threading import Thread, Event, Lock
 from functools import wraps
-from copy import deepcopy
+from copy import deepcopy, copy
+from time import time, sleep
 import importlib
 
+from helpers import setup_logger
+
+logger = setup_logger(__name__, "warning")
+
 # These base classes document functions that
 # different output devices are expected to have.
 
@@ -9,6 +15,7 @@ class OutputDevice(object):
     """Common class for all OutputDevices, no matter if they're graphical or character-based."""
 
     current_proxy = None
+    render_scheduler = None
 
     def attach_new_proxy(self, proxy):
         self.detach_current_proxy()
@@ -66,6 +73,13 @@ class OutputDevice(object):
             if o.current_proxy.context_alias == proxy.context_alias:
                 #print("Calling the method directly!")
                 #print(args)
+                if o.render_scheduler is not None:
+                    if method_name == "display_image":
+                        o.render_scheduler.submit(proxy.context_alias, *args, **kwargs)
+                        return
+                    elif method_name in o.render_scheduler.superseding_methods:
+                        # A pending frame would overwrite whatever this call draws
+                        o.render_scheduler.discard(proxy.context_alias)
                 method(*args, **kwargs)
             else:
                 pass #print("Not calling the method directly!")
@@ -81,6 +95,96 @@ class OutputDevice(object):
         setattr(proxy, method_name, proxied_method)
 
 
+class RenderScheduler(object):
+    """
+    Sits between ``OutputProxy`` objects and the output device, coalescing
+    ``display_image`` calls. Only the latest pending frame is kept for each
+    context, and frames are pushed to the device from a separate thread,
+    at most ``max_fps`` times per second - so that bursty redraws (i.e. a key
+    being held) don't result in one bus transfer per redraw.
+    """
+
+    superseding_methods = ["display_data", "clear"]
+
+    def __init__(self, o, max_fps=30):
+        self.o = o
+        self.interval = 1.0/max_fps
+        self.pending = {}
+        self.lock = Lock()
+        self.frame_available = Event()
+        self.stop_flag = Event()
+        self.last_push = 0
+        self.stats = {"submitted":0, "dropped":0, "pushed":0}
+        self.thread = Thread(target=self.run, name="Render scheduler thread")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, context_alias, *args, **kwargs):
+        """
+        Saves a frame to be displayed for a context, replacing the frame
+        that's already pending (if any).
+        """
+        with self.lock:
+            if context_alias in self.pending:
+                self.stats["dropped"] += 1
+            self.pending[context_alias] = (args, kwargs)
+            self.stats["submitted"] += 1
+        self.frame_available.set()
+
+    def discard(self, context_alias):
+        """ Drops the pending frame for a context, if there's one. """
+        with self.lock:
+            if self.pending.pop(context_alias, None) is not None:
+                self.stats["dropped"] += 1
+
+    def flush(self):
+        """
+        Pushes the pending frame of the currently active context to the
+        output device. Frames pending for other contexts are dropped.
+        """
+        current_proxy = self.o.current_proxy
+        current_alias = current_proxy.context_alias if current_proxy else None
+        with self.lock:
+            frame = self.pending.pop(current_alias, None)
+            self.stats["dropped"] += len(self.pending)
+            self.pending = {}
+        if frame is None:
+            return
+        args, kwargs = frame
+        try:
+            self.o.display_image(*args, **kwargs)
+        except:
+            logger.exception("Exception while pushing a frame to the output device!")
+        else:
+            self.stats["pushed"] += 1
+        self.last_push = time()
+
+    def run(self):
+        while not self.stop_flag.isSet():
+            self.frame_available.wait()
+            if self.stop_flag.isSet():
+                break
+            # Waiting until it's time for the next frame - giving more frames
+            # a chance to arrive and supersede the one pending
+            delay = self.last_push + self.interval - time()
+            if delay > 0:
+                sleep(delay)
+            self.frame_available.clear()
+            self.flush()
+
+    def stop(self):
+        self.stop_flag.set()
+        self.frame_available.set()
+
+    def get_stats(self):
+        """
+        Returns a dictionary with counts of frames submitted, dropped
+        (superseded by other frames) and actually pushed to the device.
+        """
+        with self.lock:
+            return copy(self.stats)
+
+
 class CharacterOutputDevice(OutputDevice):
     """Common class for all character-based OutputDevices."""
     rows = None  # number of columns
@@ -123,6 +227,7 @@ class GraphicalOutputDevice(OutputDevice):
     char_width = 8 # width of the default font
 
     current_image = None #an attribute for storing the currently displayed image
+    canvas_pool = None #a ui.canvas.CanvasPool, created by the UI on first use
 
     def display_data_onto_image(self, *args, **kwargs):
         """
@@ -192,7 +297,11 @@ def init(output_config):
     driver_module = importlib.import_module("output.drivers." + driver_name)
     args = screen_config["args"] if "args" in screen_config else []
     kwargs = screen_config["kwargs"] if "kwargs" in screen_config else {}
-    return driver_module.Screen(*args, **kwargs)
+    screen = driver_module.Screen(*args, **kwargs)
+    max_fps = screen_config.get("max_fps", None)
+    if max_fps:
+        screen.render_scheduler = RenderScheduler(screen, max_fps=max_fps)
+    return screen
 
 if __name__ == "__main__":
     o = type("OD", (GraphicalOutputDevice, CharacterOutputDevice), {})()
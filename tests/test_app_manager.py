@@ -0,0 +1,191 @@
+"""tests the app manager"""
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from time import sleep
+
+from mock import patch, Mock
+
+try:
+    from apps import app_manager
+except (ValueError, ImportError) as e:
+    print("Absolute imports failed, trying relative imports")
+    os.sys.path.append(os.path.dirname(os.path.abspath('.')))
+    from apps import app_manager
+
+
+def get_app_manager(config=None):
+    cm = Mock()
+    cm.configure_mock(get_io_for_context=lambda x: (Mock(), Mock()))
+    return app_manager.AppManager("apps/", cm, config=config, default_plugins=False)
+
+
+class TestAppManager(unittest.TestCase):
+    """Tests app loading"""
+
+    def test_app_metadata(self):
+        metadata = app_manager.get_app_metadata("apps/example_apps/test")
+        assert(metadata == {"menu_name": "Hello World", "lazy": True})
+        metadata = app_manager.get_app_metadata("apps/example_apps/class_based_skeleton")
+        assert(metadata == {"menu_name": "Class Based Skeleton", "lazy": True})
+        # Apps that need to be passed a context have to be loaded when ZPUI loads
+        metadata = app_manager.get_app_metadata("apps/zeromenu")
+        assert(metadata["lazy"] is False)
+
+    def test_app_metadata_entry_points(self):
+        """Tests that only module-level functions and app class methods count as entry points"""
+        sources = {
+            "nested": "def init_app(i, o):\n    def callback():\n        pass\n",
+            "other_class": "class Helper(object):\n    def on_start(self):\n        pass\n",
+            "function_based": "menu_name = 'App'\ndef init_app(i, o):\n    pass\ndef callback():\n    pass\n",
+            "class_based": "class App(ZeroApp):\n    def __init__(self, i, o):\n        self.menu_name = 'App'\n"
+                           "    def on_start(self):\n        pass\n",
+        }
+        dir = tempfile.mkdtemp()
+        try:
+            metadata = {}
+            for name, source in sources.items():
+                os.mkdir(os.path.join(dir, name))
+                with open(os.path.join(dir, name, "main.py"), "w") as f:
+                    f.write(source)
+                metadata[name] = app_manager.get_app_metadata(os.path.join(dir, name))
+        finally:
+            shutil.rmtree(dir)
+        assert(metadata["nested"]["lazy"] is False)
+        assert(metadata["other_class"]["lazy"] is False)
+        assert(metadata["function_based"] == {"menu_name": "App", "lazy": True})
+        assert(metadata["class_based"] == {"menu_name": "App", "lazy": True})
+
+    def test_lazy_app_loading(self):
+        am = get_app_manager({"lazy_load": True})
+        metadata = app_manager.get_app_metadata("apps/example_apps/test")
+        app = app_manager.LazyApp(am, "apps/example_apps/test", metadata)
+        assert(am.get_app_name(app, app.path) == "Hello World")
+        am.cm.create_context.assert_called_once_with("apps.example_apps.test")
+        sys.modules.pop("apps.example_apps.test.main", None)
+        with patch("ui.PrettyPrinter") as printer:
+            app.callback()
+            assert(printer.called)
+            # The app is only loaded once
+            app.callback()
+            assert(printer.call_count == 2)
+        assert(am.app_list[app.path] is app.app)
+        assert(am.app_list[app.path].i is not None)
+        assert(am.cm.create_context.call_count == 1)
+        assert("apps/example_apps/test" in am.import_times)
+        # Not leaving the module imported with a mocked PrettyPrinter
+        sys.modules.pop("apps.example_apps.test.main", None)
+
+    def test_discovery_cache_path(self):
+        """Tests that a relative cache path doesn't depend on the working directory"""
+        zpui_dir = os.path.dirname(os.path.dirname(os.path.abspath(app_manager.__file__)))
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+        try:
+            am = get_app_manager({"discovery_cache": "cache.json"})
+        finally:
+            os.chdir(cwd)
+        assert(am.discovery_cache.path == os.path.join(zpui_dir, "cache.json"))
+        am = get_app_manager({"discovery_cache": None})
+        assert(am.discovery_cache is None)
+
+    def test_lazy_app_load_failure(self):
+        """Tests that apps failing to load lazily are recorded like the ones loaded on boot"""
+        am = get_app_manager({"lazy_load": True})
+        app = app_manager.LazyApp(am, "apps/example_apps/test", {"menu_name": "Test", "lazy": True})
+        am.load_app = Mock(side_effect=ImportError("broken app"))
+        with patch.object(app_manager, "Printer") as printer:
+            app.callback()
+            assert(printer.called)
+        assert("broken app" in am.failed_apps["apps/example_apps/test"])
+        assert("apps/example_apps/test" not in am.app_list)
+
+    def test_icon_atlas_paths(self):
+        """Tests that the main menu icons are found regardless of the working directory"""
+        dir = tempfile.mkdtemp()
+        cwd = os.getcwd()
+        try:
+            am = get_app_manager({"icon_atlas_cache": os.path.join(dir, "atlas")})
+            am.o.device_mode = "1"
+            os.chdir(dir)
+            atlas = am.get_icon_atlas()
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(dir)
+        assert("sidebar" in atlas)
+        assert("settings" in atlas)
+
+    def test_prefetch_workers(self):
+        """Tests that several workers prefetch all the apps, and only one logs the import times"""
+        am = get_app_manager({"prefetch_workers": 4})
+        am.log_import_times = Mock()
+        prefetched = []
+        apps = [Mock(path="apps/app{}".format(n), prefetch=lambda n=n: sleep(0.01) or prefetched.append(n))
+                for n in range(10)]
+        am.start_prefetch(apps)
+        am.prefetch_queue.join()
+        sleep(0.05)
+        assert(sorted(prefetched) == range(10))
+        assert(am.log_import_times.call_count == 1)
+
+
+
+class TestAppDiscoveryCache(unittest.TestCase):
+    """Tests the persistent app discovery cache"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.apps_dir = os.path.join(self.dir, "apps")
+        self.cache_path = os.path.join(self.dir, "cache.json")
+        for path in ["", "sub", "sub/app1", "sub/app2", "app3"]:
+            os.mkdir(os.path.join(self.apps_dir, path))
+            open(os.path.join(self.apps_dir, path, "__init__.py"), "w").close()
+        for path in ["sub/app1", "sub/app2", "app3"]:
+            open(os.path.join(self.apps_dir, path, "main.py"), "w").close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def walk(self):
+        cache = app_manager.AppDiscoveryCache(self.cache_path)
+        results = app_manager.app_walk(self.apps_dir, cache=cache)
+        cache.save()
+        return sorted(results), cache
+
+    def test_cached_walk(self):
+        results, cache = self.walk()
+        assert(results == sorted(app_manager.app_walk(self.apps_dir)))
+        assert(len(cache.rescanned) == 5)
+        # Nothing changed - nothing needs to be rescanned
+        results, cache = self.walk()
+        assert(results == sorted(app_manager.app_walk(self.apps_dir)))
+        assert(cache.rescanned == [])
+
+    def test_incremental_rescan(self):
+        self.walk()
+        open(os.path.join(self.apps_dir, "sub/app2", "do_not_load"), "w").close()
+        results, cache = self.walk()
+        assert(cache.rescanned == [os.path.join(self.apps_dir, "sub/app2")])
+        assert(results == sorted(app_manager.app_walk(self.apps_dir)))
+        sub_results = [r for r in results if r[0].endswith("sub")][0]
+        assert(sub_results[2] == ["app1"])
+
+    def test_metadata(self):
+        results, cache = self.walk()
+        sub_path = os.path.join(self.apps_dir, "sub")
+        cache.set_metadata(sub_path, "menu_name", "Submenu")
+        cache.save()
+        results, cache = self.walk()
+        assert(cache.get_metadata(sub_path+"/", "menu_name") == "Submenu")
+        # Changing __init__.py invalidates the metadata
+        with open(os.path.join(sub_path, "__init__.py"), "w") as f:
+            f.write("_menu_name = 'Other'")
+        os.utime(os.path.join(sub_path, "__init__.py"), (0, 0))
+        results, cache = self.walk()
+        assert(cache.get_metadata(sub_path, "menu_name") is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,18 +4,20 @@ import json
 import unittest
 import traceback
 from copy import deepcopy
-from threading import Event
+from threading import Event, Thread
 from mock import patch, Mock
 
 try:
     import main as main_py
     from input.drivers import test_input, pi_gpio, pi_gpio_matrix
+    from output.drivers import damage
     config_path = "tests/test_config.json"
 except (ValueError, ImportError) as e:
     print("Absolute imports failed, trying relative imports")
     os.sys.path.append(os.path.dirname(os.path.abspath('.')))
     import main as main_py
     from input.drivers import test_input, pi_gpio, pi_gpio_matrix
+    from output.drivers import damage
     config_path = "test_config.json"
 
 
@@ -204,5 +206,103 @@ class TestDrivers(unittest.TestCase):
         # so that no ugly exception is raised when the test finishes
         main_py.input_processor.atexit()
 
+    def test_headless_drivers(self):
+        from input.drivers import headless
+        timeline = [[0, "KEY_DOWN"], [0, "KEY_ENTER", "held"]]
+        config = {"input":[{"driver":"headless", "kwargs":{"timeline":timeline, "speed":0}}], \
+                  "output":[{"driver":"headless"}]}
+        with patch.object(main_py, 'load_config') as mocked:
+            mocked.return_value = (config, "test_config.json")
+            i, o = main_py.init()
+        driver = main_py.input_processor.drivers.values()[0]
+        assert(isinstance(driver, headless.InputDevice))
+        assert(driver.finished.wait(1))
+        assert([(key, state) for _, key, state in driver.key_times] == [("KEY_DOWN", None), ("KEY_ENTER", 2)])
+        o.display_data("Hello")
+        o.display_data("World")
+        assert(main_py.screen.get_frame_stats()["frames"] == 2)
+        assert(main_py.screen.current_image.getbbox() is not None)
+        # so that no ugly exception is raised when the test finishes
+        main_py.input_processor.atexit()
+
+
+class TestPartialUpdates(unittest.TestCase):
+    """Tests the dirty region helpers used for partial display updates."""
+
+    def get_random_image(self, seed):
+        import random
+        from PIL import Image
+        r = random.Random(seed)
+        image = Image.new("1", (128, 64))
+        for _ in range(200):
+            image.putpixel((r.randrange(128), r.randrange(64)), 1)
+        return image
+
+    def reference_page_data(self, image):
+        # The way luma.oled converts images for SSD1306/SH1106
+        w, h = image.size
+        buf = bytearray(w * h // 8)
+        for idx, pix in enumerate(image.getdata()):
+            x, y = idx % w, idx // w
+            if pix > 0:
+                buf[x + (y // 8) * w] |= 1 << (y % 8)
+        return buf
+
+    def test_page_data_matches_luma(self):
+        image = self.get_random_image(1)
+        assert(damage.get_page_data(image, 0, 7, 0, 128) == self.reference_page_data(image))
+
+    def test_partial_pages_reconstruct_frame(self):
+        old = self.get_random_image(1)
+        new = old.copy()
+        new.paste(self.get_random_image(2).crop((30, 20, 70, 40)), (30, 20))
+        pages, x0, x1 = damage.get_dirty_pages(old, new)
+        assert(pages == [2, 3, 4])
+        # Applying the partial update to the "display memory" of the old frame
+        memory = self.reference_page_data(old)
+        for first_page, last_page in damage.group_pages(pages):
+            data = damage.get_page_data(new, first_page, last_page, x0, x1)
+            width = x1 - x0
+            for i, page in enumerate(range(first_page, last_page+1)):
+                memory[page*128+x0:page*128+x1] = data[i*width:(i+1)*width]
+        assert(memory == self.reference_page_data(new))
+
+    def test_fingerprints(self):
+        a = self.get_random_image(1)
+        assert(damage.get_image_fingerprint(a) == damage.get_image_fingerprint(a.copy()))
+        assert(damage.get_image_fingerprint(a) != damage.get_image_fingerprint(self.get_random_image(2)))
+        assert(damage.get_image_fingerprint(a) != damage.get_image_fingerprint(a.convert("L")))
+        assert(damage.get_data_fingerprint(["a", "b"]) == damage.get_data_fingerprint(("a", "b")))
+        assert(damage.get_data_fingerprint(["a", "b"]) != damage.get_data_fingerprint(["a", "b"], (0, 0)))
+
+    def test_fingerprint_cache_per_thread(self):
+        from output.drivers import luma_driver
+        from output.drivers.sh1106 import Screen
+        screen = Screen(hw="dummy")
+        a, b = self.get_random_image(1), self.get_random_image(2)
+        assert(screen.trigger_backlight_on_change("display_image", a))
+        # Another thread's display_image doesn't consume the fingerprint calculated for this one
+        with patch.object(luma_driver, "get_image_fingerprint", wraps=damage.get_image_fingerprint) as fp:
+            t = Thread(target=screen.display_image, args=(b,))
+            t.start()
+            t.join()
+            assert(fp.call_count == 1)
+            screen.display_image(a)
+            assert(fp.call_count == 1)
+
+    def test_output_stats(self):
+        m = damage.PartialUpdateManager()
+        m.init_partial_updates()
+        m.record_push(1024, 0.01)
+        m.record_push(100, 0.001, partial=True)
+        m.record_push(0, 0)
+        stats = m.get_output_stats()
+        assert(stats["frames"] == 3)
+        assert(stats["full_frames"] == 1)
+        assert(stats["partial_frames"] == 1)
+        assert(stats["skipped_frames"] == 1)
+        assert(stats["bus_bytes"] == 1124)
+
+
 if __name__ == '__main__':
     unittest.main()
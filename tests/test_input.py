@@ -1,16 +1,17 @@
 """tests output and input drivers and config parsing"""
 import os
 import unittest
+from time import sleep
 from threading import Event
 from mock import patch, Mock
 
 try:
-    from input.input import InputProcessor
+    from input.input import InputProcessor, InputProxy
     from helpers import cb_needs_key_state, KEY_PRESSED, KEY_RELEASED, KEY_HELD
 except (ValueError, ImportError) as e:
     print("Absolute imports failed, trying relative imports")
     os.sys.path.append(os.path.dirname(os.path.abspath('.')))
-    from input.input import InputProcessor
+    from input.input import InputProcessor, InputProxy
     from helpers import cb_needs_key_state, KEY_PRESSED, KEY_RELEASED, KEY_HELD
 
 def get_mock_callback(**kwargs):
@@ -94,6 +95,37 @@ class TestInputProcessor(unittest.TestCase):
         assert(cb.call_args[0] == (dk, KEY_HELD))
         assert(cb.call_count == 4)
 
+    def test_event_loop_wakeups(self):
+        """Event loop is woken up by a proxy being attached, by keys and by stop_listen"""
+        i = InputProcessor({}, None)
+        i.listen()
+        called = Event()
+        cb = get_mock_callback(side_effect=lambda *a: called.set())
+        i.receive_key("KEY_ENTER")
+        # No proxy attached yet, so the key has to wait in the queue
+        assert(not called.wait(0.05))
+        proxy = InputProxy("test")
+        proxy.set_callback("KEY_ENTER", cb)
+        i.attach_proxy(proxy)
+        assert(called.wait(1))
+        called.clear()
+        i.receive_key("KEY_ENTER")
+        assert(called.wait(1))
+        assert(cb.call_count == 2)
+        i.stop_listen()
+        i.processor_thread.join(1)
+        assert(not i.processor_thread.isAlive())
+
+    def test_stop_listen_without_proxy(self):
+        """Event loop waiting for a proxy exits once stop_listen is called"""
+        i = InputProcessor({}, None)
+        i.listen()
+        while i.stop_flag is None:
+            sleep(0.01)
+        i.stop_listen()
+        i.processor_thread.join(1)
+        assert(not i.processor_thread.isAlive())
+
 
 if __name__ == '__main__':
     unittest.main()
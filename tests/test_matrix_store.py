@@ -0,0 +1,79 @@
+"""tests for the Matrix app's message store"""
+import os
+import unittest
+
+try:
+    from apps.messaging_apps.matrix.store import MessageStore
+except (ValueError, ImportError) as e:
+    print("Absolute imports failed, trying relative imports")
+    os.sys.path.append(os.path.dirname(os.path.abspath('.')))
+    from apps.messaging_apps.matrix.store import MessageStore
+
+
+def message(id, timestamp):
+    return {"id": id, "timestamp": timestamp}
+
+
+class TestMessageStore(unittest.TestCase):
+    """Tests the MessageStore class"""
+
+    def test_ordering(self):
+        store = MessageStore()
+        for id, timestamp in (("a", 10), ("b", 30), ("c", 20), ("d", 5), ("e", 20)):
+            assert(store.add(message(id, timestamp)))
+        # Messages with the same timestamp keep the order they were added in
+        assert([m["id"] for m in store] == ["d", "a", "c", "e", "b"])
+        assert(store.get("c")["timestamp"] == 20)
+        assert("e" in store)
+        assert(store.get("x") is None)
+
+    def test_duplicates(self):
+        store = MessageStore()
+        assert(store.add(message("a", 10)))
+        assert(not store.add(message("a", 20)))
+        assert(len(store) == 1)
+        assert(store.get("a")["timestamp"] == 10)
+
+    def test_eviction(self):
+        store = MessageStore(max_messages=3)
+        for n in range(3):
+            store.add(message(str(n), n*10))
+        assert(store.is_full())
+        # Older than all the stored messages - not added
+        assert(not store.add(message("old", -5)))
+        assert("old" not in store)
+        # Newer messages evict the oldest ones
+        assert(store.add(message("new", 15)))
+        assert([m["id"] for m in store] == ["1", "new", "2"])
+        assert("0" not in store)
+        assert(len(store) == 3)
+
+    def test_generation(self):
+        store = MessageStore(max_messages=3)
+        store.add(message("a", 10))
+        store.add(message("b", 20))
+        # Appending messages doesn't change the generation - menus can be updated incrementally
+        assert(store.generation == 0)
+        store.add(message("c", 15))
+        assert(store.generation == 1)
+        store.add(message("d", 30))
+        # Evicting messages does
+        assert(store.generation == 2)
+        assert(not store.add(message("e", 1)))
+        assert(not store.add(message("d", 40)))
+        assert(store.generation == 2)
+
+    def test_seen(self):
+        store = MessageStore(max_seen=3)
+        assert(store.mark_seen("a"))
+        assert(not store.mark_seen("a"))
+        for id in ("b", "c", "d"):
+            assert(store.mark_seen(id))
+        # Only the last max_seen IDs are remembered
+        assert(len(store.seen) == 3)
+        assert(store.mark_seen("a"))
+        assert(not store.mark_seen("d"))
+
+
+if __name__ == '__main__':
+    unittest.main()
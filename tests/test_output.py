@@ -0,0 +1,157 @@
+"""tests output proxies and the render scheduler"""
+import os
+import unittest
+import threading
+from time import sleep
+from threading import Event
+from mock import Mock, patch
+
+try:
+    from output.output import OutputProxy, GraphicalOutputDevice, CharacterOutputDevice, RenderScheduler
+    from output.drivers.backlight import BacklightManager, activate_backlight_wrapper
+except (ValueError, ImportError) as e:
+    print("Absolute imports failed, trying relative imports")
+    os.sys.path.append(os.path.dirname(os.path.abspath('.')))
+    from output.output import OutputProxy, GraphicalOutputDevice, CharacterOutputDevice, RenderScheduler
+    from output.drivers.backlight import BacklightManager, activate_backlight_wrapper
+
+
+class MockScreen(GraphicalOutputDevice, CharacterOutputDevice):
+    __base_classes__ = (GraphicalOutputDevice, CharacterOutputDevice)
+
+    def __init__(self):
+        self.displayed = []
+        self.pushed = Event()
+
+    def display_image(self, image, **kwargs):
+        self.displayed.append(image)
+        self.pushed.set()
+
+    def display_data(self, *data):
+        self.displayed.append(data)
+
+    def display_data_onto_image(self, *data, **kwargs):
+        return None
+
+
+def get_screen_with_proxy(max_fps):
+    screen = MockScreen()
+    screen.render_scheduler = RenderScheduler(screen, max_fps=max_fps)
+    proxy = OutputProxy("test")
+    screen.init_proxy(proxy)
+    screen.attach_new_proxy(proxy)
+    return screen, proxy
+
+
+class TestRenderScheduler(unittest.TestCase):
+    """Tests frame coalescing between output proxies and the output device"""
+
+    def test_frames_pushed(self):
+        screen, proxy = get_screen_with_proxy(max_fps=100)
+        proxy.display_image("frame")
+        assert(screen.pushed.wait(1))
+        assert(screen.displayed == ["frame"])
+        assert(proxy.current_image == "frame")
+        screen.render_scheduler.stop()
+
+    def test_superseded_frames_dropped(self):
+        screen, proxy = get_screen_with_proxy(max_fps=1)
+        # Stopping the scheduler thread so that frames are only pushed on flush()
+        screen.render_scheduler.stop()
+        for i in range(10):
+            proxy.display_image(i)
+        screen.render_scheduler.flush()
+        assert(screen.displayed == [9])
+        stats = screen.render_scheduler.get_stats()
+        assert(stats["submitted"] == 10)
+        assert(stats["dropped"] == 9)
+        assert(stats["pushed"] == 1)
+
+    def test_display_data_supersedes_frame(self):
+        screen, proxy = get_screen_with_proxy(max_fps=1)
+        screen.render_scheduler.stop()
+        proxy.display_image("frame")
+        proxy.display_data("line")
+        screen.render_scheduler.flush()
+        assert(screen.displayed == [("line",)])
+
+    def test_other_context_frames_dropped(self):
+        screen = MockScreen()
+        scheduler = RenderScheduler(screen, max_fps=1)
+        scheduler.stop()
+        screen.current_proxy = Mock(context_alias="current")
+        scheduler.submit("other", "frame1")
+        scheduler.submit("current", "frame2")
+        scheduler.flush()
+        assert(screen.displayed == ["frame2"])
+        assert(scheduler.get_stats()["dropped"] == 1)
+
+
+class BacklightScreen(BacklightManager):
+    def __init__(self, **kwargs):
+        self.displayed = 0
+        self.init_backlight(**kwargs)
+
+    @activate_backlight_wrapper
+    def display_image(self, image):
+        self.displayed += 1
+
+
+class TestBacklightManager(unittest.TestCase):
+    """Tests backlight timeouts"""
+
+    def test_no_threads_started_on_display(self):
+        original_start = threading.Thread.start
+        started = []
+        def counting_start(thread):
+            started.append(thread)
+            original_start(thread)
+        with patch.object(threading.Thread, "start", counting_start):
+            screen = BacklightScreen(backlight_interval=10)
+            for _ in range(10000):
+                screen.display_image(None)
+        assert(screen.displayed == 10000)
+        # At most, the shared timer scheduler thread could've been started
+        assert(len(started) <= 1)
+
+    def test_backlight_timeout(self):
+        screen = BacklightScreen(backlight_interval=0.1)
+        screen.display_image(None)
+        assert(screen._backlight_enabled)
+        # Activity within the interval keeps the backlight on
+        for _ in range(3):
+            sleep(0.05)
+            screen.display_image(None)
+        assert(screen._backlight_enabled)
+        assert(screen.activate_backlight() is False)
+        sleep(0.3)
+        assert(not screen._backlight_enabled)
+        # Backlight was off, so activate_backlight should report it has turned it on
+        assert(screen.activate_backlight() is True)
+        assert(screen._backlight_enabled)
+
+    def test_backlight_only_on_new(self):
+        screen = BacklightScreen(backlight_interval=10)
+        screen.trigger_backlight_on_change = Mock(return_value=False)
+        screen.display_image("frame", backlight_only_on_new=True)
+        screen.trigger_backlight_on_change.assert_called_once_with("display_image", "frame")
+        assert(screen.displayed == 0)
+        screen.trigger_backlight_on_change.return_value = True
+        screen.display_image("frame", backlight_only_on_new=True)
+        assert(screen.displayed == 1)
+
+    def test_backlight_dimming(self):
+        screen = BacklightScreen(backlight_interval=10, backlight_dim_interval=0.1)
+        screen.set_backlight_dimmed = Mock()
+        screen.display_image(None)
+        sleep(0.3)
+        assert(screen._backlight_dimmed)
+        screen.set_backlight_dimmed.assert_called_once_with(True)
+        screen.display_image(None)
+        assert(not screen._backlight_dimmed)
+        screen.set_backlight_dimmed.assert_called_with(False)
+        assert(screen._backlight_enabled)
+
+
+if __name__ == '__main__':
+    unittest.main()
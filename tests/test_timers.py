@@ -0,0 +1,75 @@
+"""tests the timer scheduler"""
+import os
+import gc
+import weakref
+import unittest
+from time import sleep
+from threading import Event
+
+try:
+    from helpers import TimerScheduler, monotonic, timers
+except (ValueError, ImportError) as e:
+    print("Absolute imports failed, trying relative imports")
+    os.sys.path.append(os.path.dirname(os.path.abspath('.')))
+    from helpers import TimerScheduler, monotonic, timers
+
+
+class TestTimerScheduler(unittest.TestCase):
+    """Tests the TimerScheduler class"""
+
+    def test_timers_fire_in_order(self):
+        scheduler = TimerScheduler()
+        fired = []
+        done = Event()
+        scheduler.schedule("second", 0.1, lambda: fired.append("second") or done.set())
+        scheduler.schedule("first", 0.05, lambda: fired.append("first"))
+        assert(done.wait(1))
+        assert(fired == ["first", "second"])
+        scheduler.stop()
+
+    def test_earlier_timer_interrupts_sleep(self):
+        scheduler = TimerScheduler()
+        scheduler.schedule("long", 10, lambda: None)
+        sleep(0.05)
+        fired = Event()
+        start = monotonic()
+        scheduler.schedule("short", 0.05, fired.set)
+        assert(fired.wait(1))
+        assert(monotonic() - start < 0.5)
+        scheduler.stop()
+
+    def test_no_polling_with_pending_timer(self):
+        """Tests that the thread sleeps until the deadline instead of polling"""
+        scheduler = TimerScheduler()
+        scheduler.schedule("long", 60, lambda: None)
+        sleep(0.05)
+        wakeups = scheduler.wakeups
+        sleep(1)
+        assert(scheduler.wakeups - wakeups == 0)
+        scheduler.stop()
+
+    def test_no_polling_without_timers(self):
+        scheduler = TimerScheduler()
+        scheduler.schedule("timer", 0, lambda: None)
+        sleep(0.05)
+        wakeups = scheduler.wakeups
+        sleep(0.5)
+        assert(scheduler.wakeups == wakeups)
+        scheduler.stop()
+
+    def test_stopped_scheduler_collected(self):
+        """Tests that the exit hook doesn't keep stopped schedulers alive"""
+        scheduler = TimerScheduler()
+        scheduler.schedule("timer", 0, lambda: None)
+        assert(scheduler in timers._running_schedulers)
+        scheduler.stop()
+        scheduler.thread.join(1)
+        assert(scheduler not in timers._running_schedulers)
+        ref = weakref.ref(scheduler)
+        del scheduler
+        gc.collect()
+        assert(ref() is None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,10 +20,11 @@ from refresher import Refresher, RefresherExitException, RefresherView
 from scrollable_element import TextReader
 from loading_indicators import ProgressBar, LoadingBar, TextProgressBar, GraphicalProgressBar, CircularProgressBar, IdleDottedMessage, Throbber
 from numbered_menu import NumberedMenu
-from canvas import Canvas, MockOutput, crop
+from canvas import Canvas, MockOutput, crop, get_pooled_canvas
 from date_picker import DatePicker
 from time_picker import TimePicker
 from grid_menu import GridMenu
+from icon_atlas import IconAtlas
 from order_adjust import OrderAdjust
 from overlays import HelpOverlay, FunctionOverlay, GridMenuLabelOverlay, \
                      GridMenuSidebarOverlay, GridMenuNavOverlay, IntegerAdjustInputOverlay, \
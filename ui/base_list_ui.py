@@ -3,11 +3,12 @@ Best example of such an element is a Menu element - it has menu entries you can
  when you click on them. """
 
 from copy import copy
+from collections import OrderedDict
 from time import sleep
-from threading import Event
+from threading import Event, Lock
 
 from entry import Entry
-from canvas import Canvas
+from canvas import Canvas, get_pooled_canvas
 from helpers import setup_logger
 from base_ui import BaseUIElement
 from utils import to_be_foreground, clamp_list_index
@@ -523,10 +524,24 @@ class EightPtView(TextView):
     scrollbar_y_offset = 1
     font = None
     default_full_width_cursor = False
+    # Whether to keep the previous frame and only redraw the parts that changed
+    incremental = True
+    band_cache_size = 256
 
     def __init__(self, *args, **kwargs):
         self.full_width_cursor = kwargs.pop("full_width_cursor", self.default_full_width_cursor)
         TextView.__init__(self, *args, **kwargs)
+        self.render_lock = Lock()
+        self.reset_frame()
+
+    def reset_frame(self):
+        """Discards the previous frame, so that the next frame is drawn from scratch."""
+        self.frame = None
+        self.scratch = None
+        self.frame_first_entry = None
+        self.band_states = []
+        self.strip_state = None
+        self.band_cache = OrderedDict()
 
     def get_fow_width_in_chars(self):
         return (self.o.width - self.x_scrollbar_offset) / self.charwidth
@@ -563,46 +578,71 @@ class EightPtView(TextView):
         bottom = top + length
         return top, bottom
 
+    def get_left_offset(self, scrollbar_coordinates):
+        # left offset is dynamic and depends on whether there's a scrollbar or not
+        if scrollbar_coordinates == (0, 0):
+            return self.x_offset
+        return self.x_scrollbar_offset
+
     def draw_scrollbar(self, c, contents):
         scrollbar_coordinates = self.get_scrollbar_top_bottom(contents)
         # Drawing scrollbar, if applicable
-        if scrollbar_coordinates == (0, 0):
-            # left offset is dynamic and depends on whether there's a scrollbar or not
-            left_offset = self.x_offset
-        else:
-            left_offset = self.x_scrollbar_offset
+        if scrollbar_coordinates != (0, 0):
             y1, y2 = scrollbar_coordinates
             c.rectangle((1, y1, 2, y2))
-        return left_offset
+        return self.get_left_offset(scrollbar_coordinates)
+
+    def get_line_y(self, index):
+        return (index * self.charheight - 1) if index != 0 else 0
+
+    def get_line_extras(self, index):
+        """
+        Returns anything (other than the line's text) that affects the way
+        a line is drawn, so that the line is redrawn when it changes.
+        Meant to be overridden by view mixins that draw extra graphics.
+        """
+        return None
 
     def draw_menu_text(self, c, menu_text, left_offset):
         for i, line in enumerate(menu_text):
-            y = (i * self.charheight - 1) if i != 0 else 0
-            c.text(line, (left_offset, y), font=self.font)
+            # Lines that don't need to be redrawn are passed as None
+            if line is not None:
+                c.text(line, (left_offset, self.get_line_y(i)), font=self.font)
 
-    def draw_cursor(self, c, menu_text, left_offset):
+    def get_cursor_dims(self, menu_text, left_offset):
         cursor_y = self.get_active_line_num()
         # We might not need to draw the cursor if there are no items present
-        if cursor_y is not None:
-            c_y = cursor_y * self.charheight + 1
-            if self.full_width_cursor:
-                x2 = c.width
-            else:
-                menu_texts = menu_text[cursor_y:cursor_y+self.entry_height]
-                max_menu_text_len = max([len(t) for t in menu_texts])
-                x2 = self.charwidth * max_menu_text_len + left_offset
-            cursor_dims = (
-                left_offset - 1,
-                c_y - 1,
-                x2,
-                c_y + self.charheight*self.entry_height - 1
-            )
+        if cursor_y is None:
+            return None
+        c_y = cursor_y * self.charheight + 1
+        if self.full_width_cursor:
+            x2 = self.o.width
+        else:
+            menu_texts = menu_text[cursor_y:cursor_y+self.entry_height]
+            max_menu_text_len = max([len(t) for t in menu_texts])
+            x2 = self.charwidth * max_menu_text_len + left_offset
+        return (
+            left_offset - 1,
+            c_y - 1,
+            x2,
+            c_y + self.charheight*self.entry_height - 1
+        )
+
+    def draw_cursor(self, c, menu_text, left_offset):
+        cursor_dims = self.get_cursor_dims(menu_text, left_offset)
+        if cursor_dims is not None:
             c.invert_rect(cursor_dims)
 
     def get_displayed_image(self):
         """Generates the displayed data for a canvas-based output device. The output of this function can be fed to the o.display_image function.
         |Doesn't support partly-rendering entries yet."""
-        c = Canvas(self.o)
+        if not self.incremental:
+            return self.draw_full_image()
+        with self.render_lock:
+            return self.draw_incremental_image()
+
+    def draw_full_image(self):
+        c = get_pooled_canvas(self.o)
         # Get the display-ready contents
         contents = self.el.get_displayed_contents()
         # Get the menu text
@@ -616,6 +656,125 @@ class EightPtView(TextView):
         # Returning the image
         return c.get_image()
 
+    # Incremental rendering. The frame is split into the scrollbar strip on
+    # the left and horizontal bands, one per text line. Each band has a state
+    # that describes everything that's drawn in it - the text of the lines
+    # that can reach into it, extra graphics and the cursor. Only the bands
+    # whose state changed since the previous frame are redrawn, and when the
+    # list is scrolled, the previous frame is shifted before that. Since band
+    # states don't depend on the band position, recently drawn bands are kept
+    # in a cache, so that going back and forth through a list reuses them.
+
+    def get_line_overlap(self):
+        """
+        Returns how many lines above a band can have text reaching into it,
+        since fonts can be taller than ``charheight``.
+        """
+        font = self.scratch.decypher_font_reference(self.font)
+        try:
+            ascent, descent = font.getmetrics()
+            height = ascent + descent
+        except AttributeError:
+            height = font.getsize("Ag")[1]
+        return max(0, (height - 1) / self.charheight)
+
+    def get_band_count(self):
+        return -(-self.o.height // self.charheight)
+
+    def get_band_lines(self, band, line_count):
+        return range(max(0, band - self.line_overlap), min(line_count, band + 2))
+
+    def get_band_states(self, menu_text, left_offset, cursor_dims):
+        lines = [(self.get_line_y(i), line, self.get_line_extras(i)) for i, line in enumerate(menu_text)]
+        states = []
+        for band in range(len(self.band_states)):
+            top = band * self.charheight
+            bottom = top + self.charheight
+            band_lines = tuple((y - top, line, extras) for y, line, extras in lines[max(0, band - self.line_overlap):band + 2])
+            cursor = None
+            # invert_rect() also clears the row below the cursor
+            if cursor_dims is not None and cursor_dims[1] < bottom and cursor_dims[3] + 1 > top:
+                cursor = (cursor_dims[0], cursor_dims[2], max(cursor_dims[1] - top, 0), min(cursor_dims[3] + 1, bottom) - top)
+            states.append((left_offset, min(bottom, self.o.height) - top, band_lines, cursor))
+        return states
+
+    def get_band_box(self, band, left_offset):
+        top = band * self.charheight
+        return (left_offset - 1, top, self.o.width, min(top + self.charheight, self.o.height))
+
+    def shift_frame(self, lines):
+        """Shifts the previous frame (and the band states) up by ``lines`` lines - or down, if negative."""
+        image = self.frame.image
+        dy = lines * self.charheight
+        width, height = image.size
+        region = image.crop((0, max(dy, 0), width, height + min(dy, 0)))
+        image.paste(region, (0, max(-dy, 0)))
+        band_count = len(self.band_states)
+        states = []
+        for band in range(band_count):
+            old_band = band + lines
+            states.append(self.band_states[old_band] if 0 <= old_band < band_count else None)
+        self.band_states = states
+        # The scrollbar moves independently from the text
+        self.strip_state = None
+
+    def draw_incremental_image(self):
+        if self.frame is None:
+            self.frame = Canvas(self.o)
+            self.scratch = Canvas(self.o)
+            self.line_overlap = self.get_line_overlap()
+            self.band_states = [None] * self.get_band_count()
+        contents = self.el.get_displayed_contents()
+        menu_text = self.get_displayed_text(contents)
+        scrollbar = self.get_scrollbar_top_bottom(contents)
+        left_offset = self.get_left_offset(scrollbar)
+        cursor_dims = self.get_cursor_dims(menu_text, left_offset)
+        if self.frame_first_entry is not None and self.frame_first_entry != self.first_displayed_entry:
+            lines = (self.first_displayed_entry - self.frame_first_entry) * self.entry_height
+            if abs(lines) < len(self.band_states):
+                self.shift_frame(lines)
+        self.frame_first_entry = self.first_displayed_entry
+        states = self.get_band_states(menu_text, left_offset, cursor_dims)
+        image = self.frame.image
+        # Bands that were drawn before (at any position) are taken from the band cache
+        dirty_bands = []
+        for band, state in enumerate(states):
+            if state == self.band_states[band]:
+                continue
+            band_image = self.band_cache.pop(state, None)
+            if band_image is None:
+                dirty_bands.append(band)
+            else:
+                self.band_cache[state] = band_image
+                image.paste(band_image, self.get_band_box(band, left_offset))
+        strip_state = (left_offset, scrollbar)
+        boxes = [self.get_band_box(band, left_offset) for band in dirty_bands]
+        if strip_state != self.strip_state:
+            boxes.append((0, 0, left_offset - 1, self.o.height))
+        if boxes:
+            c = self.scratch
+            for box in boxes:
+                c.image.paste(c.background_color, box)
+            # Everything is drawn on the scratch canvas, then the dirty regions are copied
+            # into the frame - text and the cursor can extend outside of the dirty bands
+            self.draw_scrollbar(c, contents)
+            lines_needed = set()
+            for band in dirty_bands:
+                lines_needed.update(self.get_band_lines(band, len(menu_text)))
+            self.draw_menu_text(c, [line if i in lines_needed else None for i, line in enumerate(menu_text)], left_offset)
+            if any(states[band][3] for band in dirty_bands):
+                self.draw_cursor(c, menu_text, left_offset)
+            for box in boxes:
+                image.paste(c.image.crop(box), box)
+            for band, box in zip(dirty_bands, boxes):
+                self.band_cache[states[band]] = image.crop(box)
+            while len(self.band_cache) > self.band_cache_size:
+                self.band_cache.popitem(last=False)
+        self.band_states = states
+        self.strip_state = strip_state
+        logger.debug("{}: drew {} of {} lines".format(self.el.name, len(dirty_bands), len(states)))
+        return image.copy()
+
 
 class SixteenPtView(EightPtView):
     charwidth = 8
@@ -1,11 +1,19 @@
 import os
+import sys
+from threading import Lock
+from collections import OrderedDict
 
-from PIL import Image, ImageDraw, ImageOps, ImageFont
+from PIL import Image, ImageDraw, ImageOps, ImageFont, ImageChops
 
 from ui.utils import is_sequence_not_string as issequence, Rect
 
 fonts_dir = "ui/fonts/"
 font_cache = {}
+# Guards creation of per-output canvas pools
+canvas_pool_lock = Lock()
+# Resolved coordinates with string offsets, by (canvas size, coordinates)
+coordinate_cache = {}
+coordinate_cache_size = 1024
 
 default_font = None
 def get_default_font():
@@ -17,6 +25,102 @@ def get_default_font():
 from helpers import setup_logger
 logger = setup_logger(__name__, "warning")
 
+
+class TextCache(object):
+    """
+    Caches rasterised text, so that text that was already drawn once doesn't
+    have to go through the font renderer again - list UI elements redraw the
+    same lines on every refresh, including the scrolling ticks.
+
+    Single characters are stored in a glyph cache that holds up to ``max_glyphs``
+    glyphs, whole lines are stored in a cache that holds up to ``max_lines``
+    lines, both LRU. Text sizes are cached the same way as lines. TrueType fonts
+    are keyed by their file and size, so fonts created for each call don't
+    add new entries - other fonts are keyed by the font object.
+    """
+
+    def __init__(self, max_lines=256, max_glyphs=1024):
+        self.max_lines = max_lines
+        self.max_glyphs = max_glyphs
+        self.glyphs = OrderedDict()
+        self.lines = OrderedDict()
+        self.sizes = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_cached(self, cache, key, factory, max_size):
+        with self.lock:
+            value = cache.pop(key, None)
+            if value is not None:
+                # Moving the entry to the end of the LRU order
+                cache[key] = value
+                self.hits += 1
+                return value
+        value = factory()
+        with self.lock:
+            self.misses += 1
+            cache[key] = value
+            while len(cache) > max_size:
+                cache.popitem(last=False)
+        return value
+
+    def get_font_key(self, font):
+        path = getattr(font, "path", None)
+        size = getattr(font, "size", None)
+        if path is not None and size is not None:
+            return (path, size)
+        return font
+
+    def get_mask(self, font, text, mode):
+        """
+        Returns a ``(mask, offset)`` tuple for the text, just like
+        ``ImageFont.getmask2()`` does.
+        """
+        key = (self.get_font_key(font), text, mode)
+        if len(text) == 1:
+            return self.get_cached(self.glyphs, key, lambda: self.render(font, text, mode), self.max_glyphs)
+        return self.get_cached(self.lines, key, lambda: self.render(font, text, mode), self.max_lines)
+
+    def get_size(self, font, text):
+        return self.get_cached(self.sizes, (self.get_font_key(font), text), lambda: font.getsize(text), self.max_lines)
+
+    def render(self, font, text, mode):
+        # Same as what ImageDraw.text() does internally
+        try:
+            return font.getmask2(text, mode)
+        except AttributeError:
+            try:
+                return font.getmask(text, mode), (0, 0)
+            except TypeError:
+                return font.getmask(text), (0, 0)
+
+    def draw_text(self, draw, coords, text, fill, font):
+        """
+        Draws the text on an ``ImageDraw.Draw`` object, producing
+        the same result as ``draw.text(coords, text, fill=fill, font=font)``.
+        Falls back to ``draw.text`` if the ``ImageDraw`` internals it relies on
+        aren't available (i.e. in a different PIL version).
+        """
+        if not hasattr(draw, "_getink") or not hasattr(getattr(draw, "draw", None), "draw_bitmap"):
+            draw.text(coords, text, fill=fill, font=font)
+            return
+        mask, offset = self.get_mask(font, text, draw.fontmode)
+        ink, fill = draw._getink(fill)
+        if ink is None:
+            ink = fill
+        if ink is not None:
+            draw.draw.draw_bitmap((coords[0]+offset[0], coords[1]+offset[1]), mask, ink)
+
+    def clear(self):
+        with self.lock:
+            self.glyphs.clear()
+            self.lines.clear()
+            self.sizes.clear()
+
+text_cache = TextCache()
+
+
 class Canvas(object):
     """
     This object allows you to work with graphics on the display quicker and easier.
@@ -39,6 +143,8 @@ class Canvas(object):
     default_color = "white" #: default color to use for drawing
     default_font = None #: default font, referenced here to avoid loading it every time
     fonts_dir = fonts_dir
+    text_cache = text_cache #: ``TextCache`` used for drawing text (``None`` disables caching)
+    image_shared = False #: whether ``image`` was handed out by ``get_image()`` or ``display()``
 
     def __init__(self, o, base_image=None, name="", interactive=False):
         self.o = o
@@ -54,6 +160,7 @@ class Canvas(object):
         else:
             self.image = Image.new(o.device_mode, self.size)
         self.draw = ImageDraw.Draw(self.image)
+        self.image_shared = False
         if not self.default_font:
             self.default_font = get_default_font()
         self.interactive = interactive
@@ -62,6 +169,16 @@ class Canvas(object):
         assert(image.size == self.size)
         self.image = image.copy()
         self.draw = ImageDraw.Draw(self.image)
+        self.image_shared = False
+
+    def own_image(self):
+        """
+        Makes sure the image can be changed in place - if it was handed out
+        (i.e. it was passed to ``display_image()`` and the output device still
+        shows it), the canvas switches to a copy of it first.
+        """
+        if self.image_shared:
+            self.load_image(self.image)
 
     def load_font(self, path, size, alias=None, type="truetype"):
         """
@@ -145,7 +262,8 @@ class Canvas(object):
           * ``width``: line width (default: 0, which results in a single-pixel-wide line)
         """
         fill = kwargs.pop("fill", self.default_color)
-        coords = self.check_coordinates(coords)
+        # Not reordering the coordinates - lines have a direction
+        coords = self.resolve_coordinates(coords)
         self.draw.line(coords, fill=fill, **kwargs)
         self.display_if_interactive()
 
@@ -171,9 +289,20 @@ class Canvas(object):
         font = self.decypher_font_reference(font)
         coords = self.check_coordinates(coords)
         if text: # Errors out on empty text
-            self.draw.text(coords, text, fill=fill, font=font, **kwargs)
+            self.draw_text(coords, text, fill, font, **kwargs)
             self.display_if_interactive()
 
+    def draw_text(self, coords, text, fill, font, **kwargs):
+        """
+        Draws text using the text cache, if possible. Expects already
+        processed coordinates and a font object.
+        """
+        # Multiline text and extra ImageDraw arguments aren't cached
+        if self.text_cache and not kwargs and "\n" not in text:
+            self.text_cache.draw_text(self.draw, coords, text, fill, font)
+        else:
+            self.draw.text(coords, text, fill=fill, font=font, **kwargs)
+
     def vertical_text(self, text, coords, **kwargs):
         """
         Draw vertical text on the canvas. Coordinates are expected in (x, y)
@@ -198,9 +327,9 @@ class Canvas(object):
         coords = self.check_coordinates(coords)
         char_coords = list(coords)
         if not charheight: # Auto-determining charheight if not available
-            _, charheight = self.draw.textsize("H", font=font)
+            _, charheight = self.get_text_bounds("H", font=font)
         for char in text:
-            self.draw.text(char_coords, char, fill=fill, font=font, **kwargs)
+            self.draw_text(char_coords, char, fill, font, **kwargs)
             char_coords[1] += charheight
         self.display_if_interactive()
 
@@ -230,7 +359,7 @@ class Canvas(object):
         for i, char in enumerate(text):
             coords = coords_cb(i, char)
             coords = self.check_coordinates(coords)
-            self.draw.text(coords, char, fill=fill, font=font, **kwargs)
+            self.draw_text(coords, char, fill, font, **kwargs)
         self.display_if_interactive()
 
     def rectangle(self, coords, **kwargs):
@@ -332,10 +461,52 @@ class Canvas(object):
         self.draw.arc(coords, start, end, fill=fill, **kwargs)
         self.display_if_interactive()
 
+    def draw_batch(self, points=None, lines=None, rectangles=None, checked=False, **kwargs):
+        """
+        Draws many points, lines and rectangles in one call, with a single
+        coordinate validation pass (and a single ``ImageDraw`` call for all
+        the points). Points are expected as ``(x, y)`` pairs, lines and
+        rectangles in ``(x1, y1, x2, y2)`` format, same as for ``point()``,
+        ``line()`` and ``rectangle()``.
+
+        If the coordinates are already integers (and rectangle coordinates
+        are in the right order), pass ``checked=True`` to skip the validation.
+
+        Keyword arguments:
+
+          * ``fill``: point and line color (default: white, as default canvas color)
+          * ``width``: line width (default: 0, which results in a single-pixel-wide line)
+          * ``outline``: rectangle outline color (default: white, as default canvas color)
+          * ``rectangle_fill``: rectangle fill color (default: None, as in, transparent)
+        """
+        fill = kwargs.pop("fill", self.default_color)
+        width = kwargs.pop("width", 0)
+        outline = kwargs.pop("outline", self.default_color)
+        rectangle_fill = kwargs.pop("rectangle_fill", None)
+        if not checked:
+            if points:
+                points = self.check_coordinate_pairs(points)
+            if lines:
+                lines = [self.resolve_coordinates(line) for line in lines]
+            if rectangles:
+                rectangles = [self.check_coordinates(rectangle) for rectangle in rectangles]
+        if rectangles:
+            for rectangle in rectangles:
+                self.draw.rectangle(rectangle, outline=outline, fill=rectangle_fill)
+        if lines:
+            for line in lines:
+                self.draw.line(line, fill=fill, width=width)
+        if points:
+            self.draw.point(points, fill=fill)
+        self.display_if_interactive()
+
     def get_image(self):
         """
-        Get the current ``PIL.Image`` object.
+        Get the current ``PIL.Image`` object. Raster operations that work in place
+        (``invert()``, ``invert_rect()`` and ``clear()``) don't change an image
+        once it's been returned - the canvas makes a copy to work on instead.
         """
+        self.image_shared = True
         return self.image
 
     def get_center(self):
@@ -351,14 +522,19 @@ class Canvas(object):
         Inverts the image that ``Canvas`` is currently operating on.
         """
         image = self.image
-        # "1" won't invert, need "L"
-        if image.mode == "1":
-            image = image.convert("L")
-        image = ImageOps.invert(image)
-        # If was converted to "L", setting back to "1"
-        if image.mode == "L" and self.o.device_mode == "1":
-            image = image.convert("1")
-        self.image = image
+        if image.mode == self.o.device_mode and image.mode in ("1", "L", "RGB"):
+            # Inverting in place, without mode conversions
+            self.own_image()
+            invert_region(self.image)
+        else:
+            # "1" won't invert, need "L"
+            if image.mode == "1":
+                image = image.convert("L")
+            image = ImageOps.invert(image)
+            # If was converted to "L", setting back to "1"
+            if image.mode == "L" and self.o.device_mode == "1":
+                image = image.convert("1")
+            self.load_image(image)
         self.display_if_interactive()
 
     def display(self):
@@ -366,6 +542,7 @@ class Canvas(object):
         Display the current image on the ``o`` object that was supplied to
         ``Canvas``.
         """
+        self.image_shared = True
         self.o.display_image(self.image)
 
     def clear(self, coords=None, fill=None):
@@ -380,7 +557,9 @@ class Canvas(object):
         if fill is None:
             fill = self.background_color
         coords = self.check_coordinates(coords)
-        self.rectangle(coords, fill=fill, outline=fill)  # paint the background black first
+        self.own_image()
+        # Same area as rectangle() would fill - including the right and bottom edges
+        fill_region(self.image, (coords[0], coords[1], coords[2]+1, coords[3]+1), fill)
         self.display_if_interactive()
 
     def check_coordinates(self, coords, check_count=True):
@@ -390,6 +569,50 @@ class Canvas(object):
         functions. Currently, accepts integer coordinates, as well as strings
         - denoting offsets from opposite sides of the screen.
         """
+        coords = self.resolve_coordinates(coords)
+        if len(coords) == 2:
+            return coords
+        elif len(coords) == 4:
+            x1, y1, x2, y2 = coords
+            # sanity checks for coordinates
+            if (x1 >= x2):
+                x2, x1 = x1, x2
+                logger.info("x1 ({}) is smaller than x2 ({}), rearranging".format(x1, x2))
+            if (y1 >= y2):
+                y2, y1 = y1, y2
+                logger.info("y1 ({}) is smaller than y2 ({}), rearranging".format(y1, y2))
+            coords = x1, y1, x2, y2
+            #assert (y2 >= y1), "y2 ({}) is smaller than y1 ({}), rearrange?".format(y2, y1)
+            return coords
+        else:
+            if check_count:
+                raise ValueError("Invalid number of coordinates!")
+            else:
+                return coords
+
+    def resolve_coordinates(self, coords):
+        # type: tuple -> tuple
+        """
+        Converts coordinates into a tuple of integers, resolving string offsets
+        and converting floats. Tuples of integers are returned as-is, and the
+        results for tuples with string offsets are cached per canvas size - as
+        tuples, since the same object is returned to every caller.
+        """
+        if type(coords) is tuple:
+            if all([type(c) is int for c in coords]):
+                return coords
+            key = (self.size, coords)
+            resolved = coordinate_cache.get(key, None)
+            if resolved is None:
+                resolved = tuple(self.parse_coordinates(coords))
+                if any([isinstance(c, basestring) for c in coords]):
+                    if len(coordinate_cache) >= coordinate_cache_size:
+                        coordinate_cache.clear()
+                    coordinate_cache[key] = resolved
+            return resolved
+        return self.parse_coordinates(coords)
+
+    def parse_coordinates(self, coords):
         # Checking for string offset coordinates
         # First, we need to make coords into a mutable sequence - thus, a list
         coords = list(coords)
@@ -415,25 +638,7 @@ class Canvas(object):
         # it's of type we don't process and we should raise an exception now
         for c in coords:
             assert isinstance(c, int), "{} not an integer or 'x' string!".format(c)
-        if len(coords) == 2:
-            return coords
-        elif len(coords) == 4:
-            x1, y1, x2, y2 = coords
-            # sanity checks for coordinates
-            if (x1 >= x2):
-                x2, x1 = x1, x2
-                logger.info("x1 ({}) is smaller than x2 ({}), rearranging".format(x1, x2))
-            if (y1 >= y2):
-                y2, y1 = y1, y2
-                logger.info("y1 ({}) is smaller than y2 ({}), rearranging".format(y1, y2))
-            coords = x1, y1, x2, y2
-            #assert (y2 >= y1), "y2 ({}) is smaller than y1 ({}), rearrange?".format(y2, y1)
-            return coords
-        else:
-            if check_count:
-                raise ValueError("Invalid number of coordinates!")
-            else:
-                return coords
+        return coords
 
     def check_coordinate_pairs(self, coord_pairs):
         # type: tuple -> tuple
@@ -475,6 +680,8 @@ class Canvas(object):
         if text == "":
             return (0, 0)
         font = self.decypher_font_reference(font)
+        if self.text_cache and "\n" not in text:
+            return self.text_cache.get_size(font, text)
         w, h = self.draw.textsize(text, font=font)
         return w, h
 
@@ -504,21 +711,15 @@ class Canvas(object):
         Inverts the image in the given rectangle region. Is useful for
         highlighting a part of the image, for example.
         """
-
         coords = self.check_coordinates(coords)
-        image_subset = self.image.crop(coords)
-
-        if image_subset.mode == "1":
-            # PIL can't invert "1" mode - need to use "L"
-            image_subset = image_subset.convert("L")
-            image_subset = ImageOps.invert(image_subset)
-            image_subset = image_subset.convert(self.o.device_mode)
-        else: # Other mode - invert without workarounds
-            image_subset = ImageOps.invert(image_subset)
-
-        self.clear(coords)
-        self.image.paste(image_subset, (coords[0], coords[1]))
-
+        self.own_image()
+        invert_region(self.image, coords)
+        # The row and the column right past the region have always been cleared
+        # (as the region used to be cleared with rectangle() before pasting the
+        # inverted region back) - UI elements' output depends on that, keeping it
+        x1, y1, x2, y2 = coords
+        fill_region(self.image, (x2, y1, x2+1, y2+1), self.background_color)
+        fill_region(self.image, (x1, y2, x2+1, y2+1), self.background_color)
         self.display_if_interactive()
 
 #    def rotate(self, degrees, expand=True):
@@ -569,6 +770,109 @@ class Canvas(object):
         raise AttributeError
 
 
+class CanvasPool(object):
+    """
+    Hands out cleared ``Canvas`` objects for an output device, reusing canvases
+    (and their images) from previous refreshes instead of allocating a new image
+    and ``ImageDraw`` object every time.
+
+    A canvas is only handed out again once nothing outside of the pool references
+    either the canvas or its image - that is, once the output device (and the render
+    scheduler, and anything else that got hold of the image) has moved on to a newer
+    frame. So, an image that was passed to ``display_image()`` is never drawn on
+    afterwards, and with the frame on the display referencing one canvas,
+    the next frame is drawn on another one (double-buffering).
+
+    Up to ``max_size`` canvases are kept (overlays need one more than double-buffering
+    does, since they draw on a copy of the UI element's image). When all of them are
+    in use, an unpooled canvas is returned. Setting ``max_size`` to 0 disables pooling.
+    """
+
+    max_size = 4
+
+    def __init__(self, o, max_size=None):
+        self.o = o
+        if max_size is not None:
+            self.max_size = max_size
+        self.canvases = []
+        self.lock = Lock()
+        self.reused = 0
+        self.allocated = 0
+
+    def get(self, base_image=None, name=""):
+        """
+        Returns a canvas cleared with its background color or, if ``base_image``
+        is passed, with the image pasted onto it (same as ``Canvas(o, base_image)``).
+        """
+        size = (self.o.width, self.o.height)
+        mode = self.o.device_mode
+        if base_image is not None and (base_image.size != size or base_image.mode != mode):
+            return Canvas(self.o, base_image=base_image, name=name)
+        canvas = None
+        with self.lock:
+            for i in range(len(self.canvases)):
+                # References held by the list and by the getrefcount() argument
+                if sys.getrefcount(self.canvases[i]) == 2 and sys.getrefcount(self.canvases[i].image) == 2:
+                    if self.canvases[i].size == size and self.canvases[i].image.mode == mode:
+                        canvas = self.canvases[i]
+                        break
+                    # The output device was reconfigured - the canvas is no longer usable
+                    self.canvases.pop(i)
+                    break
+            if canvas is not None:
+                self.reused += 1
+            elif len(self.canvases) < self.max_size:
+                canvas = Canvas(self.o, base_image=base_image, name=name)
+                self.canvases.append(canvas)
+                self.allocated += 1
+                return canvas
+        if canvas is None:
+            return Canvas(self.o, base_image=base_image, name=name)
+        # Undoing changes the previous user could've made
+        canvas.__dict__.pop("background_color", None)
+        canvas.__dict__.pop("default_color", None)
+        canvas.name = name
+        canvas.interactive = False
+        # Nothing else references the image anymore
+        canvas.image_shared = False
+        if base_image is not None:
+            canvas.image.paste(base_image, (0, 0))
+        else:
+            canvas.clear()
+        return canvas
+
+    def get_stats(self):
+        """
+        Returns a dictionary with counts of canvases allocated by the pool
+        and canvases that were reused.
+        """
+        with self.lock:
+            return {"allocated":self.allocated, "reused":self.reused}
+
+
+def get_canvas_pool(o):
+    """
+    Returns the ``CanvasPool`` for an output device, creating it if necessary.
+    The pool is stored in the ``canvas_pool`` attribute of the output device.
+    """
+    pool = getattr(o, "canvas_pool", None)
+    if not isinstance(pool, CanvasPool):
+        with canvas_pool_lock:
+            pool = getattr(o, "canvas_pool", None)
+            if not isinstance(pool, CanvasPool):
+                pool = o.canvas_pool = CanvasPool(o)
+    return pool
+
+def get_pooled_canvas(o, base_image=None, name=""):
+    """
+    Returns a canvas for the output device from its ``CanvasPool`` - a drop-in
+    replacement for ``Canvas(o, base_image=base_image, name=name)`` for code that
+    creates a new canvas on each refresh. Don't keep the canvas around after
+    the image has been displayed - get a new one for the next frame instead.
+    """
+    return get_canvas_pool(o).get(base_image=base_image, name=name)
+
+
 class MockOutput(object):
     """
     A mock output device that you can use to draw icons and other bitmaps using
@@ -591,6 +895,21 @@ class MockOutput(object):
     def display_image(self, *args):
         return True
 
+# Raster operations - work in place, on the image itself, and don't need
+# mode round-trips for "1" images (unlike ImageOps functions).
+
+def invert_region(image, box=None):
+    """
+    Inverts a region of the image (the whole image if ``box`` is not passed) in place.
+    Supports "1", "L" and "RGB" images.
+    """
+    region = image.crop(box) if box else image
+    image.paste(ImageChops.invert(region), box)
+
+def fill_region(image, box, fill):
+    """Fills a region of the image with a color, in place. ``box`` is clipped to the image."""
+    image.paste(fill, box)
+
 def crop(image, min_width=None, min_height=None, align=None):
     bbox = image.getbbox()
     print(bbox)
@@ -1,10 +1,11 @@
 from time import sleep
 from math import ceil
-from copy import copy
+from threading import Lock
+from collections import OrderedDict
 
 from menu import Menu
 from entry import Entry
-from canvas import Canvas, MockOutput
+from canvas import MockOutput, get_pooled_canvas
 
 class GridMenu(Menu):
 
@@ -34,6 +35,10 @@ class GridMenu(Menu):
 			keymap.update({"KEY_F1": "deactivate"})
                 return keymap
 
+	def set_contents(self, contents):
+		Menu.set_contents(self, contents)
+		self.view.clear_tile_cache()
+
 	def grid_move_up(self):
 		Menu.page_up(self, counter=self.cols)
 
@@ -50,65 +55,129 @@ class GridViewMixin(object):
         fde_increment = 3
 	wrappers = []
         font = None
+	text_output = None
+	page_cache_size = 8
+
+	def __init__(self, *args, **kwargs):
+		super(GridViewMixin, self).__init__(*args, **kwargs)
+		self.grid_lock = Lock()
+		self.layout = None
+		self.clear_tile_cache()
+
+	def clear_tile_cache(self):
+		"""
+		Discards the rendered entry tiles and grid pages, so that they're
+		rendered again from the entries on the next refresh.
+		"""
+		self.tiles = {}
+		self.pages = OrderedDict()
 
 	def get_entry_count_per_screen(self):
 		return self.el.cols*self.el.rows
 
-	def draw_grid(self):
-		contents = self.el.get_displayed_contents()
-		pointer = self.el.pointer
-		full_entries_shown = self.get_entry_count_per_screen()
-		entries_shown = min(len(contents), full_entries_shown)
-		disp_entry_positions = range(self.first_displayed_entry, self.first_displayed_entry+entries_shown)
-		for i in copy(disp_entry_positions):
-			if i not in range(len(contents)):
-				disp_entry_positions.remove(i)
-                c = Canvas(self.o)
-
-		# Calculate margins
-		step_width = c.width / self.el.cols if not self.entry_width else self.entry_width
-		step_height = c.height / self.el.rows
-
-                # Create a special canvas for drawing text - making sure it's cropped
-                text_c = Canvas(MockOutput(step_width, step_height))
-
-		# Calculate grid index
-		item_x = (pointer-self.first_displayed_entry)%self.el.cols
-		item_y = (pointer-self.first_displayed_entry)//self.el.rows
-
-		# Draw horizontal and vertical lines
+	def get_layout(self):
+		"""
+		Returns the grid geometry - cell size, cell positions and grid lines.
+		Only recalculated when the grid settings or the screen size change.
+		"""
+		key = (self.el.rows, self.el.cols, self.entry_width, self.o.width, self.o.height, self.draw_lines, self.el.font)
+		if self.layout is not None and self.layout["key"] == key:
+			return self.layout
+		step_width = self.o.width / self.el.cols if not self.entry_width else self.entry_width
+		step_height = self.o.height / self.el.rows
+		lines = []
 		if self.draw_lines:
 			for x in range(1, self.el.cols):
-				c.line((x*step_width, 0, x*step_width, c.height))
+				lines.append((x*step_width, 0, x*step_width, self.o.height))
 			for y in range(1, self.el.rows):
-				c.line((0, y*step_height, c.width, y*step_height))
-
-		# Draw the app names
-		for i, index in enumerate(disp_entry_positions):
-                        entry = contents[index]
-			icon = None
-			text = None
+				lines.append((0, y*step_height, self.o.width, y*step_height))
+		cells = [self.get_cell_coords(i, step_width, step_height) for i in range(self.get_entry_count_per_screen())]
+		if self.text_output is None or (self.text_output.width, self.text_output.height) != (step_width, step_height):
+			# Output for the canvas that text is drawn on - making sure it's cropped
+			self.text_output = MockOutput(step_width, step_height)
+		# Tiles and pages were rendered for the old layout
+		self.clear_tile_cache()
+		self.layout = {"key":key, "step_width":step_width, "step_height":step_height, "lines":lines, "cells":cells}
+		return self.layout
+
+	def get_cell_coords(self, position, step_width, step_height):
+		return ((position%self.el.cols)*step_width, (position//self.el.rows)*step_height)
+
+	def get_tile(self, index, entry, layout):
+		"""
+		Returns a ``(image, offset)`` tuple for an entry - the entry's icon or its label,
+		and where it's to be pasted relative to the cell. Tiles are rendered once
+		and reused until the entry's label or icon changes.
+		"""
+		icon = None
+		text = None
+		if isinstance(entry, Entry):
+			text = entry.text
+			if entry.icon:
+				icon = entry.icon
+		else:
+			text = entry[0]
+		if icon and icon.mode != self.o.device_mode:
+			# Converting the icon once, instead of on every paste
+			icon = icon.convert(self.o.device_mode)
 			if isinstance(entry, Entry):
-				text = entry.text
-				if entry.icon:
-					icon = entry.icon
-                        else:
-				text = entry[0]
-			if icon:
-				coords = ((i%self.el.cols)*step_width, (i//self.el.rows)*step_height)
-				c.image.paste(icon, coords)
+				entry.icon = icon
+		cached = self.tiles.get(index, None)
+		if cached is not None and cached[0] == text and cached[1] is icon:
+			return cached[2]
+		if icon:
+			tile = (icon, (0, 0))
+		else:
+			text_c = get_pooled_canvas(self.text_output)
+			text_bounds = text_c.get_text_bounds(text, font=self.el.font)
+			text_c.text(text, (0, 0), font=self.el.font)
+			tile = (text_c.image.copy(), (0, (layout["step_height"]-text_bounds[1])/2))
+		self.tiles[index] = (text, icon, tile)
+		# Pages with the old tile are no longer valid
+		self.pages.clear()
+		return tile
+
+	def draw_page(self, c, layout, tiles):
+		# Draw horizontal and vertical lines
+		for coords in layout["lines"]:
+			c.line(coords)
+		# Draw the entry icons and labels
+		for i, (image, offset) in enumerate(tiles):
+			x, y = layout["cells"][i]
+			c.image.paste(image, (x+offset[0], y+offset[1]))
+
+	def draw_grid(self):
+		contents = self.el.get_displayed_contents()
+		pointer = self.el.pointer
+		with self.grid_lock:
+			layout = self.get_layout()
+			fde = self.first_displayed_entry
+			entries_shown = min(len(contents), self.get_entry_count_per_screen())
+			disp_entry_positions = range(fde, min(fde+entries_shown, len(contents)))
+			tiles = [self.get_tile(index, contents[index], layout) for index in disp_entry_positions]
+			c = get_pooled_canvas(self.o)
+			page = self.pages.pop(fde, None)
+			if page is None:
+				self.draw_page(c, layout, tiles)
+				# The page image, and the page with each of the cells inverted
+				page = (c.image.copy(), {})
+			else:
+				c.image.paste(page[0], (0, 0))
+			self.pages[fde] = page
+			while len(self.pages) > self.page_cache_size:
+				self.pages.popitem(last=False)
+
+			# Invert the selected cell
+			step_width, step_height = layout["step_width"], layout["step_height"]
+			selected_x, selected_y = self.get_cell_coords(pointer-fde, step_width, step_height)
+			coords = c.check_coordinates((selected_x, selected_y, selected_x+step_width, selected_y+step_height))
+			inverted = page[1].get(pointer-fde, None)
+			if inverted is None:
+				c.invert_rect(coords)
+				# invert_rect() also clears the row and the column past the region
+				page[1][pointer-fde] = c.image.crop((coords[0], coords[1], coords[2]+1, coords[3]+1))
 			else:
-                                text_c.clear()
-				text_bounds = c.get_text_bounds(text, font=self.el.font)
-				x_cord = (i%self.el.cols)*step_width #+(step_width-text_bounds[0])/2
-				y_cord = (i//self.el.rows)*step_height+(step_height-text_bounds[1])/2
-				text_c.text(text, (0, 0), font=self.el.font)
-                                c.image.paste(text_c.image, (x_cord, y_cord))
-
-		# Invert the selected cell
-		selected_x = (item_x)*step_width
-		selected_y = (item_y)*step_height
-		c.invert_rect((selected_x, selected_y, selected_x+step_width, selected_y+step_height))
+				c.image.paste(inverted, (coords[0], coords[1]))
 
 		return c.get_image()
 
@@ -0,0 +1,139 @@
+import os
+import json
+
+from PIL import Image, ImageOps
+
+from helpers import setup_logger
+logger = setup_logger(__name__, "warning")
+
+
+class IconAtlas(object):
+    """
+    Decodes a set of icons once, converts them to the output device's mode
+    and packs them into a single image, which can then be cached on disk
+    in the device's native format - so that the next time, all the icons
+    are loaded with a single read, without decoding any PNG files.
+
+    Args:
+
+        * ``mode``: ``PIL.Image`` mode to convert the icons to (``o.device_mode``)
+        * ``cache_path``: path prefix for the cache files (``None`` disables the on-disk cache)
+        * ``max_width``: maximum width of the atlas image
+    """
+
+    version = 1
+
+    def __init__(self, mode, cache_path=None, max_width=256):
+        self.mode = mode
+        self.cache_path = cache_path
+        self.max_width = max_width
+        self.sources = {}
+        self.regions = {}
+        self.icons = {}
+        self.image = None
+
+    def add(self, name, path, invert=False):
+        """
+        Adds an icon to the atlas. If ``invert`` is set, the icon is
+        converted to grayscale and inverted before being converted
+        to the atlas mode. Icons need to be added before ``load`` is called.
+        """
+        self.sources[name] = [path, invert]
+
+    def get_source_stamps(self):
+        stamps = {}
+        for name, (path, invert) in self.sources.items():
+            stat = os.stat(path)
+            stamps[name] = [path, invert, stat.st_mtime, stat.st_size]
+        return stamps
+
+    def load(self):
+        """Loads the atlas from the cache, or builds it (and saves it to the cache)."""
+        stamps = self.get_source_stamps()
+        if not self.load_cache(stamps):
+            self.build()
+            self.save_cache(stamps)
+        self.icons = {}
+
+    def get_cache_paths(self):
+        prefix = "{}_{}".format(self.cache_path, self.mode)
+        return prefix + ".json", prefix + ".raw"
+
+    def load_cache(self, stamps):
+        if not self.cache_path:
+            return False
+        index_path, data_path = self.get_cache_paths()
+        try:
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            if index["version"] != self.version or index["mode"] != self.mode or index["sources"] != stamps:
+                return False
+            with open(data_path, "rb") as f:
+                data = f.read()
+            self.image = Image.frombytes(self.mode, tuple(index["size"]), data)
+        except (IOError, ValueError, KeyError):
+            return False
+        self.regions = {name: tuple(region) for name, region in index["regions"].items()}
+        return True
+
+    def save_cache(self, stamps):
+        if not self.cache_path:
+            return
+        index_path, data_path = self.get_cache_paths()
+        index = {"version": self.version, "mode": self.mode, "size": self.image.size,
+                 "sources": stamps, "regions": self.regions}
+        # Writing to temporary files and renaming them into place, so that an
+        # interrupted write doesn't leave a broken atlas to be loaded on next boot.
+        # The old index is removed first - it mustn't be used with the new data.
+        try:
+            with open(data_path + ".tmp", "wb") as f:
+                f.write(self.image.tobytes())
+            with open(index_path + ".tmp", "w") as f:
+                json.dump(index, f)
+            if os.path.exists(index_path):
+                os.remove(index_path)
+            os.rename(data_path + ".tmp", data_path)
+            os.rename(index_path + ".tmp", index_path)
+        except (IOError, OSError):
+            logger.exception("Can't save the icon atlas cache to {}".format(self.cache_path))
+
+    def decode_icon(self, path, invert):
+        image = Image.open(path)
+        if invert:
+            image = ImageOps.invert(image.convert("L"))
+        # Same conversion as the one Image.paste() does implicitly
+        return image.convert(self.mode)
+
+    def build(self):
+        """
+        Decodes all the icons and packs them into rows ("shelves"),
+        tallest icons first.
+        """
+        icons = {name: self.decode_icon(path, invert) for name, (path, invert) in self.sources.items()}
+        order = sorted(icons.keys(), key=lambda name: (-icons[name].size[1], name))
+        self.regions = {}
+        x = y = row_height = width = 0
+        for name in order:
+            w, h = icons[name].size
+            if x and x + w > self.max_width:
+                x = 0
+                y += row_height
+                row_height = 0
+            self.regions[name] = (x, y, w, h)
+            x += w
+            width = max(width, x)
+            row_height = max(row_height, h)
+        self.image = Image.new(self.mode, (max(width, 1), max(y + row_height, 1)))
+        for name in order:
+            x, y, w, h = self.regions[name]
+            self.image.paste(icons[name], (x, y))
+
+    def get(self, name):
+        """Returns the icon, as an image in the atlas mode."""
+        if name not in self.icons:
+            x, y, w, h = self.regions[name]
+            self.icons[name] = self.image.crop((x, y, x+w, y+h))
+        return self.icons[name]
+
+    def __contains__(self, name):
+        return name in self.regions
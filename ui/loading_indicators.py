@@ -3,7 +3,7 @@ from math import cos
 from threading import Thread
 from time import time
 
-from canvas import Canvas
+from canvas import get_pooled_canvas
 from refresher import Refresher
 from helpers import setup_logger
 from utils import clamp, Chronometer, to_be_foreground, Rect
@@ -131,7 +131,7 @@ class Throbber(BaseLoadingIndicator):
     @to_be_foreground
     def refresh(self):
         self.update_throbber_angle()
-        c = Canvas(self.o)
+        c = get_pooled_canvas(self.o)
         self.draw_throbber(c)
         if self.message:
             self.draw_message(c)
@@ -193,7 +193,7 @@ class CircularProgressBar(ProgressIndicator):
         BaseLoadingIndicator.__init__(self, i, o, *args, **kwargs)
 
     def refresh(self):
-        c = Canvas(self.o)
+        c = get_pooled_canvas(self.o)
         x, y = c.size
         radius = min(x, y) / 4
         center_coordinates = (x / 2 - radius, y / 2 - radius, x / 2 + radius, y / 2 + radius)
@@ -271,7 +271,7 @@ class GraphicalProgressBar(ProgressIndicator):
         BaseLoadingIndicator.__init__(self, i, o, *args, **kwargs)
 
     def refresh(self):
-        c = Canvas(self.o)
+        c = get_pooled_canvas(self.o)
         if self.show_percentage:
             percentage_text = "{}%".format(self.progress)
             coords = c.get_centered_text_bounds(percentage_text)
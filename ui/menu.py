@@ -213,10 +213,32 @@ class MenuRenderingMixin(object):
             )
             c.polygon(coords, fill=c.default_color)
 
+    def get_line_extras(self, index):
+        contents_entry = self.el.contents[self.first_displayed_entry + index/self.entry_height]
+        return self.has_second_callback(contents_entry)
+
+    def line_extras_cover_graphics(self):
+        """
+        Returns whether ``get_line_extras`` was overridden along with ``draw_graphic``,
+        so that the band cache knows about everything ``draw_graphic`` draws.
+        """
+        mro = type(self).__mro__
+        graphic_owner = next(cls for cls in mro if "draw_graphic" in cls.__dict__)
+        extras_owner = next(cls for cls in mro if "get_line_extras" in cls.__dict__)
+        return issubclass(extras_owner, graphic_owner)
+
+    def get_displayed_image(self):
+        # Views that draw their own graphics without describing them in get_line_extras
+        # would get stale graphics from incremental rendering - redrawing them from scratch
+        if not self.line_extras_cover_graphics():
+            return self.draw_full_image()
+        return super(MenuRenderingMixin, self).get_displayed_image()
+
     def draw_menu_text(self, c, menu_text, left_offset):
         for i, line in enumerate(menu_text):
-            y = (i * self.charheight - 1) if i != 0 else 0
-            c.text(line, (left_offset, y), font=self.font)
+            if line is None:
+                continue
+            c.text(line, (left_offset, self.get_line_y(i)), font=self.font)
             if "b&w" in self.o.type:
                 self.draw_graphic(c, i)
 
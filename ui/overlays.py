@@ -1,12 +1,13 @@
 from functools import wraps
-from threading import Event
+from threading import Event, Lock
+from collections import OrderedDict
 
 from scrollable_element import TextReader
-from canvas import Canvas
+from canvas import Canvas, get_pooled_canvas
 from utils import Rect, clamp
 from entry import Entry
 
-from PIL import Image
+from PIL import Image, ImageChops
 Image = Image.Image
 
 # Shorter code
@@ -15,10 +16,119 @@ class AttrDict(dict):
     __getattr__ = dict.__getitem__
     __setattr__ = dict.__setitem__
 
+
+class OverlayLayer(object):
+    """
+    Pixels drawn by an overlay, together with a mask of the pixels that
+    were drawn and the position of the layer on the screen.
+    """
+
+    def __init__(self, image, mask, position):
+        self.image = image
+        self.mask = mask
+        self.position = position
+
+    def apply(self, image):
+        """Pastes the layer onto an image, in place."""
+        image.paste(self.image, self.position, self.mask)
+
+
+def render_layer(o, draw):
+    """
+    Renders whatever ``draw(c)`` draws on a ``Canvas`` into an ``OverlayLayer``
+    (or returns ``None`` if it draws nothing). ``draw`` is called twice,
+    for a black and a white canvas - the pixels that end up the same on both
+    are the ones that it has drawn (or cleared).
+    """
+    black = Canvas(o)
+    draw(black)
+    white = Canvas(o)
+    white.clear(fill="white")
+    draw(white)
+    difference = ImageChops.difference(black.image, white.image).convert("L")
+    mask = difference.point(lambda v: 255 if v < 128 else 0, "1")
+    bbox = mask.getbbox()
+    if bbox is None:
+        return None
+    return OverlayLayer(black.image.crop(bbox), mask.crop(bbox), bbox[:2])
+
+
+class OverlayCompositor(object):
+    """
+    Draws the overlays applied to an UI element onto the UI element's frames.
+    Overlays describe what they're going to draw with a layer state, and
+    layers are only rendered when an overlay's state changes - then, the frame
+    is copied once and the layers of all the overlays are pasted onto it.
+
+    Overlays that can't be cached (``cache_layers = False``) draw
+    onto the frame copy directly, in their turn.
+    """
+
+    layer_cache_size = 64
+
+    def __init__(self, ui_el):
+        self.ui_el = ui_el
+        self.overlays = []
+        self.layers = {}
+        self.lock = Lock()
+        ui_el.add_view_wrapper(self.composite)
+
+    def add_overlay(self, overlay):
+        self.overlays.append(overlay)
+        self.layers[overlay] = OrderedDict()
+
+    def get_layer(self, overlay, state):
+        cache = self.layers[overlay]
+        if state in cache:
+            # Moving the layer to the end of the LRU order
+            layer = cache[state] = cache.pop(state)
+            return layer
+        layer = render_layer(self.ui_el.o, lambda c: overlay.draw_layer(c, self.ui_el, state))
+        cache[state] = layer
+        while len(cache) > self.layer_cache_size:
+            cache.popitem(last=False)
+        return layer
+
+    def composite(self, image):
+        if not isinstance(image, Image):
+            return image
+        layers = []
+        with self.lock:
+            for overlay in self.overlays:
+                state = overlay.get_layer_state(self.ui_el)
+                if state is None:
+                    continue
+                layer = self.get_layer(overlay, state) if overlay.cache_layers else None
+                if layer is not None or not overlay.cache_layers:
+                    layers.append((overlay, state, layer))
+        if not layers:
+            return image
+        c = get_pooled_canvas(self.ui_el.o, base_image=image)
+        for overlay, state, layer in layers:
+            if layer is None:
+                overlay.draw_layer(c, self.ui_el, state)
+            else:
+                layer.apply(c.image)
+        return c.get_image()
+
+
+def get_overlay_compositor(ui_el):
+    """
+    Returns the ``OverlayCompositor`` of an UI element, creating it
+    (and adding it to the UI element's view wrappers) if necessary.
+    """
+    compositor = getattr(ui_el, "overlay_compositor", None)
+    if not isinstance(compositor, OverlayCompositor):
+        compositor = ui_el.overlay_compositor = OverlayCompositor(ui_el)
+    return compositor
+
+
 class BaseOverlay(object):
     # Idea: an overlay could be applied to multiple UI elements
     # Implementation: all UI-element-specific data is stored by the UI element name
     # Requirement: unique UI element names ;,-(
+    cache_layers = True # Whether the layers drawn by the overlay can be cached
+
     def __init__(self):
         self.uie = {} # Stores AttrDict for each UI element to which the overlay is applied
 
@@ -27,6 +137,21 @@ class BaseOverlay(object):
         self.uie[n] = AttrDict()
         ui_el.overlays.append(self)
 
+    def wrap_view(self, ui_el):
+        get_overlay_compositor(ui_el).add_overlay(self)
+
+    def get_layer_state(self, ui_el):
+        """
+        Returns a hashable description of what the overlay is going to draw on
+        the UI element's next frame (``None`` if nothing) - the overlay's layer
+        is only re-rendered when it changes. Called once per frame.
+        """
+        return None
+
+    def draw_layer(self, c, ui_el, state):
+        """Draws the overlay onto a canvas, for a state returned by ``get_layer_state``."""
+        pass
+
 class BaseOverlayWithState(BaseOverlay):
 
     def __init__(self, duration = 20):
@@ -123,13 +248,6 @@ class HelpOverlay(BaseOverlayWithTimeout):
         ui_el.generate_keymap = wrapper
         ui_el.set_default_keymap()
 
-    def wrap_view(self, ui_el):
-        def wrapper(image):
-            if isinstance(image, Image):
-                image = self.modify_image_if_needed(ui_el, image)
-            return image
-        ui_el.add_view_wrapper(wrapper)
-
     def push_callback(self, callback):
         self.callbacks.append(callback)
 
@@ -139,13 +257,18 @@ class HelpOverlay(BaseOverlayWithTimeout):
     def get_key_and_callback(self):
         return self.key, self.callbacks[-1]
 
-    def modify_image_if_needed(self, ui_el, image):
+    def get_layer_state(self, ui_el):
         n = ui_el.name
         if self.uie[n].active:
-            c = Canvas(ui_el.o, base_image=image)
-            self.draw_icon(c)
-            image = c.get_image()
-        return image
+            return self.get_icon_state()
+        return None
+
+    def get_icon_state(self):
+        # The icon is always the same
+        return True
+
+    def draw_layer(self, c, ui_el, state):
+        self.draw_icon(c)
 
     def draw_icon(self, c):
         c.clear((str(-(self.right_offset+c.o.char_width)), self.top_offset, str(-self.right_offset), self.top_offset+c.o.char_height))
@@ -190,6 +313,9 @@ class FunctionOverlay(HelpOverlay):
         ui_el.generate_keymap = wrapper
         ui_el.set_default_keymap()
 
+    def get_icon_state(self):
+        return tuple(self.labels)
+
     def draw_icon(self, c):
         half_line_length = c.o.cols/self.num_keys
         last_line = "".join([label.center(half_line_length) for label in self.labels])
@@ -198,10 +324,17 @@ class FunctionOverlay(HelpOverlay):
 
 
 class GridMenuSidebarOverlay(BaseOverlay):
+    """
+    Draws a sidebar next to a GridMenu, using a callback that's passed a canvas
+    with the frame, the UI element and the sidebar coordinates. If the callback
+    always draws the same thing, pass ``static=True`` so that the sidebar
+    is only drawn once and then reused.
+    """
 
-    def __init__(self, sidebar_cb, top_o = None, bottom_o = None, left_o = None, right_o = None):
+    def __init__(self, sidebar_cb, top_o = None, bottom_o = None, left_o = None, right_o = None, static=False):
         BaseOverlay.__init__(self)
         self.sidebar_cb = sidebar_cb
+        self.cache_layers = static
         self.top_o = top_o
         self.bottom_o = bottom_o
         self.left_o = left_o
@@ -215,19 +348,11 @@ class GridMenuSidebarOverlay(BaseOverlay):
     def get_coords_for_unrecognized_ui_el(self, ui_el):
         return None
 
-    def wrap_view(self, ui_el):
-        def wrapper(image):
-            if isinstance(image, Image):
-                image = self.modify_image(ui_el, image)
-            return image
-        ui_el.add_view_wrapper(wrapper)
+    def get_layer_state(self, ui_el):
+        return tuple(self.get_sidebar_coords(ui_el))
 
-    def modify_image(self, ui_el, image):
-        c = Canvas(ui_el.o, base_image=image)
-        coords = self.get_sidebar_coords(ui_el)
-        self.draw_sidebar(c, ui_el, coords)
-        image = c.get_image()
-        return image
+    def draw_layer(self, c, ui_el, state):
+        self.draw_sidebar(c, ui_el, Rect(*state))
 
     def get_sidebar_coords(self, ui_el):
         if self.top_o is None and self.bottom_o is None \
@@ -283,13 +408,6 @@ class GridMenuLabelOverlay(HelpOverlay):
                 self.uie[n].is_clear_refresh.set()
                 ui_el.refresh()
 
-    def wrap_view(self, ui_el):
-        def wrapper(image):
-            if isinstance(image, Image):
-                image = self.modify_image_if_needed(ui_el, image)
-            return image
-        ui_el.add_view_wrapper(wrapper)
-
     def wrap_refresh(self, ui_el):
         refresh = ui_el.refresh
         n = ui_el.name
@@ -305,14 +423,17 @@ class GridMenuLabelOverlay(HelpOverlay):
             return refresh()
         ui_el.refresh = wrapper
 
-    def modify_image_if_needed(self, ui_el, image):
+    def get_layer_state(self, ui_el):
         n = ui_el.name
         if not self.uie[n].active:
-            return image
-        c = Canvas(ui_el.o, base_image=image)
-        self.draw_text(c, ui_el)
-        image = c.get_image()
-        return image
+            return None
+        if self.uie[n].get("canvas", None) is None:
+            # Only used for text measurements
+            self.uie[n].canvas = Canvas(ui_el.o)
+        return self.get_label(self.uie[n].canvas, ui_el)
+
+    def draw_layer(self, c, ui_el, state):
+        self.draw_label(c, state)
 
     def get_text_position(self, c, ui_el, text):
         n = ui_el.name
@@ -361,15 +482,23 @@ class GridMenuLabelOverlay(HelpOverlay):
         self.uie[n].last_pointer = pointer
         return text_coords, clear_coords
 
-    def draw_text(self, c, ui_el):
+    def get_label(self, c, ui_el):
+        """Returns the label text, the text coordinates and the coordinates of the area to clear."""
         entry_text = self.get_current_entry_text(ui_el)
         text_coords, clear_coords = self.get_text_position(c, ui_el, entry_text)
         entry_width = getattr(ui_el.view, "entry_width", 32)
         if entry_width is None: entry_width = 32
         clear_coords = (0, clear_coords[1], entry_width*ui_el.cols, clear_coords[3])
+        return entry_text, text_coords, clear_coords
+
+    def draw_label(self, c, label):
+        entry_text, text_coords, clear_coords = label
         c.clear(clear_coords)
         c.text(entry_text, text_coords, font=self.font)
 
+    def draw_text(self, c, ui_el):
+        self.draw_label(c, self.get_label(c, ui_el))
+
 
 class BaseNumpadOverlay(BaseOverlay):
     def __init__(self, default_cb, keys=None, callbacks=None):
@@ -513,25 +642,18 @@ class SpinnerOverlay(BaseOverlayWithState):
         n = ui_el.name
         self.uie[n].spinner_stage = 0
 
-    def wrap_view(self, ui_el):
-        def wrapper(image):
-            if isinstance(image, Image):
-                image = self.modify_image_if_needed(ui_el, image)
-            return image
-        ui_el.add_view_wrapper(wrapper)
-
-    def modify_image_if_needed(self, ui_el, image):
+    def get_layer_state(self, ui_el):
         n = ui_el.name
         if not self.uie[n].active:
-            return image
+            return None
         if self.uie[n].spinner_stage == 3:
             self.uie[n].spinner_stage = 0
         else:
             self.uie[n].spinner_stage += 1
-        c = Canvas(ui_el.o, base_image=image)
-        self.draw_spinner(c, self.uie[n].spinner_stage)
-        image = c.get_image()
-        return image
+        return (self.uie[n].spinner_stage, self.letter, self.clear_coords)
+
+    def draw_layer(self, c, ui_el, state):
+        self.draw_spinner(c, state[0])
 
     def wrap_idle_loop(self, ui_el):
         idle_loop = ui_el.idle_loop
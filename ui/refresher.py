@@ -1,10 +1,12 @@
 from time import sleep
+from copy import copy
 from functools import wraps
+from threading import Event, Lock, Thread
 from traceback import print_exc
 
 import PIL
 
-from helpers import setup_logger
+from helpers import setup_logger, monotonic, get_timer_scheduler
 from number_input import IntegerAdjustInput
 from utils import to_be_foreground
 from base_ui import BaseUIElement, internal_callback_in_background
@@ -22,9 +24,19 @@ class Refresher(BaseUIElement):
     All you need is to provide a function that'll return the text/image you want to display;
     that function will then be called with the desired frequency and the display
     will be updated with whatever it returns.
+
+    Refreshes happen at absolute deadlines of a monotonic clock, kept by the
+    ``TimerScheduler`` shared across ZPUI - so the refresh timing doesn't drift,
+    and a refresher only wakes up when it's time to refresh or when something
+    (a callback, an interval change or deactivation) wakes it up.
+
+    If ``refresh_function`` is slow (i.e. calls external tools or talks to hardware),
+    pass ``async_refresh=True`` - then, ``refresh_function`` is called in a worker
+    thread, the last data received stays on the screen until the fresh data arrives,
+    and keypresses aren't delayed by the fetches.
     """
 
-    def __init__(self, refresh_function, i, o, refresh_interval=1, keymap=None, name="Refresher", **kwargs):
+    def __init__(self, refresh_function, i, o, refresh_interval=1, keymap=None, name="Refresher", async_refresh=False, refresh_timeout=None, **kwargs):
         """Initialises the Refresher object.
 
         Args:
@@ -43,13 +55,27 @@ class Refresher(BaseUIElement):
             * ``keymap``: Keymap entries you want to set while Refresher is active.
               * By default, KEY_LEFT deactivates the Refresher, if you want to override it, make sure that user can still exit the Refresher.
             * ``name``: Refresher name which can be used internally and for debugging.
+            * ``async_refresh``: if ``True``, ``refresh_function`` is called in a worker thread, and the data it returns is displayed once it arrives - in the meantime, the last data received is shown.
+            * ``refresh_timeout``: (with ``async_refresh``) time after which a ``refresh_function`` call that hasn't returned is abandoned - its result is then discarded and a new call is started on the next refresh. ``None`` means no timeout.
 
         """
         self.custom_keymap = keymap if keymap else {}
+        self.async_refresh = async_refresh
+        self.refresh_timeout = refresh_timeout
+        self.fetch_lock = Lock()
+        self.fetch = None
+        self.fetch_generation = 0
+        self.last_data = None
+        self.data_received = Event()
+        self.wake_event = Event()
+        self.schedule_lock = Lock()
+        self.scheduler = get_timer_scheduler()
+        self.timer_name = "refresher_{}".format(id(self))
+        self.next_refresh = None
         BaseUIElement.__init__(self, i, o, name, input_necessary=False, **kwargs)
+        self.reset_stats()
         self.set_refresh_interval(refresh_interval)
         self.set_refresh_function(refresh_function)
-        self.calculate_intervals()
 
     @property
     def is_active(self):
@@ -94,42 +120,115 @@ class Refresher(BaseUIElement):
                 raise ValueError("Waiting for {} to be active - never became active!".format(self.name))
 
     def set_refresh_interval(self, new_interval):
-        """Allows setting Refresher's refresh intervals after it's been initialized"""
-        #interval for checking the in_background property in the activate()
-        #when refresh_interval is small enough, is the same as refresh_interval
-        if new_interval == 0:
-            raise ValueError("Refresher refresh_interval can't be 0 ({})".format(self.name))
-        self.refresh_interval = new_interval
-        self.sleep_time = 0.1 if new_interval > 0.1 else new_interval
-        self.calculate_intervals()
+        """
+        Allows setting Refresher's refresh intervals after it's been initialized.
+        If the Refresher is running, the next refresh happens ``new_interval``
+        seconds after the previous one (that is, immediately, if that's already
+        in the past).
+        """
+        if new_interval <= 0:
+            raise ValueError("Refresher refresh_interval has to be positive ({})".format(self.name))
+        with self.schedule_lock:
+            if self.next_refresh is not None:
+                self.next_refresh += new_interval - self.refresh_interval
+            self.refresh_interval = new_interval
+        self.wake()
 
     def set_refresh_function(self, refresh_function):
         if isinstance(refresh_function, RefresherView):
             refresh_function.init(self.o)
         self.refresh_function = refresh_function
 
-    def calculate_intervals(self):
-        """Calculates the sleep intervals of the refresher, so that no matter the
-        ``refresh_interval``, the refresher is responsive. Also, sets the counter to zero."""
-        #in_background of the refresher needs to be checked approx. each 0.1 second,
-        #since users expect the refresher to exit almost instantly
-        iterations_before_refresh = self.refresh_interval/self.sleep_time
-        if iterations_before_refresh < 1:
-            logger.warning("{}: self.refresh_interval is smaller than self.sleep_time!".format(self.name))
-            #Failsafe
-            self.iterations_before_refresh = 1
-        else:
-            self.iterations_before_refresh = int(iterations_before_refresh)
-        self._counter = 0
+    def wake(self):
+        """Wakes up ``idle_loop``, so that it re-checks the Refresher state."""
+        self.wake_event.set()
+
+    def to_foreground(self):
+        # The display is refreshed here - the next refresh is an interval away
+        with self.schedule_lock:
+            self.next_refresh = None
+        BaseUIElement.to_foreground(self)
+        self.wake()
+
+    def to_background(self):
+        BaseUIElement.to_background(self)
+        self.wake()
+
+    def deactivate(self):
+        BaseUIElement.deactivate(self)
+        self.scheduler.cancel(self.timer_name)
+        self.cancel_fetch()
+        self.wake()
 
     def idle_loop(self):
+        """
+        Waits until the next refresh deadline (or until woken up), then refreshes
+        the display if it's in foreground and the deadline has passed.
+        """
+        with self.schedule_lock:
+            if self.next_refresh is None:
+                self.next_refresh = monotonic() + self.refresh_interval
+            deadline = self.next_refresh
+        if deadline > monotonic():
+            self.scheduler.schedule_at(self.timer_name, deadline, self.wake)
+        while deadline > monotonic():
+            self.wake_event.wait()
+            self.wake_event.clear()
+            if not self.is_active or self.next_refresh != deadline:
+                # Deactivated or rescheduled - letting the caller re-check the state
+                break
+        if not self.is_active:
+            self.scheduler.cancel(self.timer_name)
+            return
+        now = monotonic()
+        with self.schedule_lock:
+            if self.next_refresh is None or now < self.next_refresh:
+                # Woken up before the deadline - nothing to refresh yet
+                return
+            deadline = self.next_refresh
         if self.in_foreground:
-            if self._counter == self.iterations_before_refresh:
-                self._counter = 0
-            if self._counter == 0:
-                self.refresh()
-            self._counter += 1
-        sleep(self.sleep_time)
+            self.refresh()
+        finished = monotonic()
+        with self.schedule_lock:
+            if self.next_refresh != deadline:
+                # Rescheduled while refreshing
+                return
+            self.next_refresh = deadline + self.refresh_interval
+            missed = 0
+            if self.next_refresh <= finished:
+                # Took longer than the interval - skipping the refreshes that are already late
+                missed = int((finished - deadline) / self.refresh_interval)
+                self.next_refresh = deadline + (missed + 1) * self.refresh_interval
+        self.record_refresh(now - deadline, missed)
+
+    def reset_stats(self):
+        self.stats_lock = Lock()
+        self.stats = {"refreshes": 0, "overruns": 0, "missed": 0, "total_jitter": 0.0, "max_jitter": 0.0,
+                      "fetch_timeouts": 0}
+
+    def record_refresh(self, jitter, missed):
+        with self.stats_lock:
+            self.stats["refreshes"] += 1
+            self.stats["total_jitter"] += jitter
+            self.stats["max_jitter"] = max(self.stats["max_jitter"], jitter)
+            if missed:
+                self.stats["overruns"] += 1
+                self.stats["missed"] += missed
+
+    def get_stats(self):
+        """
+        Returns a dictionary with the count of scheduled refreshes, the average and
+        maximum jitter (how late, in seconds, refreshes happened relative to their
+        deadlines), the count of overruns (refreshes that took longer than
+        ``refresh_interval``) and the count of refreshes skipped because of those,
+        as well as the count of ``async_refresh`` fetches abandoned because of
+        ``refresh_timeout``.
+        """
+        with self.stats_lock:
+            stats = copy(self.stats)
+        refreshes = stats["refreshes"]
+        stats["mean_jitter"] = stats.pop("total_jitter") / refreshes if refreshes else 0.0
+        return stats
 
     @internal_callback_in_background
     def change_interval(self):
@@ -171,6 +270,8 @@ class Refresher(BaseUIElement):
             logger.debug("{}: executed wrapped function: {}".format(self.name, func.__name__))
             if self.in_background:
                 self.to_foreground()
+            else:
+                self.wake()
             if e:
                 raise e
         return wrapper
@@ -178,12 +279,92 @@ class Refresher(BaseUIElement):
     @to_be_foreground
     def refresh(self):
         logger.debug("{}: refreshed data on display".format(self.name))
+        if self.async_refresh:
+            self.refresh_async()
+            return
         try:
             data_to_display = self.refresh_function()
         except RefresherExitException:
             logger.info("{}: received exit exception, deactivating".format(self.name))
             self.deactivate()
             return
+        self.display_refreshed_data(data_to_display)
+
+    def refresh_async(self):
+        """
+        Starts a ``refresh_function`` call in a worker thread (unless one is already
+        running) and shows the last data received. If no data has been received yet,
+        waits for the fetch to finish (or time out) - there's nothing to show otherwise.
+        """
+        data = self.last_data
+        if data is None:
+            # Cleared before the fetch is started, so that its end isn't missed
+            self.data_received.clear()
+        self.start_fetch()
+        if data is not None:
+            self.display_refreshed_data(data)
+        elif self.is_active:
+            # Set once the fetch ends (however it ends), and on deactivation
+            self.data_received.wait(self.refresh_timeout)
+
+    def start_fetch(self):
+        with self.fetch_lock:
+            if self.fetch is not None:
+                generation, started = self.fetch
+                if self.refresh_timeout is None or monotonic() - started < self.refresh_timeout:
+                    # The previous fetch is still running - its result will be displayed
+                    return
+                logger.warning("{}: refresh_function didn't return in {}s, abandoning the call".format(self.name, self.refresh_timeout))
+                with self.stats_lock:
+                    self.stats["fetch_timeouts"] += 1
+            self.fetch_generation += 1
+            generation = self.fetch_generation
+            self.fetch = (generation, monotonic())
+        t = Thread(target=self.run_fetch, args=(generation,), name="{} data fetch".format(self.name))
+        t.daemon = True
+        t.start()
+
+    def cancel_fetch(self):
+        """
+        Discards the result of the ``refresh_function`` call that's currently running
+        in the worker thread, if any.
+        """
+        with self.fetch_lock:
+            self.fetch = None
+        # Nothing is going to be received - not letting refresh_async wait for it
+        self.data_received.set()
+
+    def is_current_fetch(self, generation):
+        return self.fetch is not None and self.fetch[0] == generation
+
+    def run_fetch(self, generation):
+        try:
+            data = None
+            try:
+                data = self.refresh_function()
+            except RefresherExitException:
+                with self.fetch_lock:
+                    current = self.is_current_fetch(generation)
+                if current:
+                    logger.info("{}: received exit exception, deactivating".format(self.name))
+                    self.deactivate()
+                return
+            except Exception:
+                logger.exception("{}: refresh_function failed, keeping the last data on display".format(self.name))
+            with self.fetch_lock:
+                if not self.is_current_fetch(generation):
+                    # Cancelled or timed out - a newer fetch might be running already
+                    return
+                self.fetch = None
+                if data is not None:
+                    self.last_data = data
+            if data is not None and self.in_foreground:
+                self.display_refreshed_data(data)
+        finally:
+            # Wakes up refresh_async, whether there's data to show or not
+            self.data_received.set()
+
+    def display_refreshed_data(self, data_to_display):
         if isinstance(data_to_display, basestring):
             #Passed a string, not a list.
             #Let's be user-friendly and wrap it in a list!
@@ -1,12 +1,14 @@
 """tests for Canvas"""
 import os
+import random
 import unittest
 
 from mock import patch, Mock
-from PIL import Image, ImageFont, ImageChops
+from PIL import Image, ImageFont, ImageChops, ImageOps, ImageDraw
 
 try:
     from ui import Canvas
+    from ui.canvas import TextCache, CanvasPool
 except ImportError:
     print("Absolute imports failed, trying relative imports")
     os.sys.path.append(os.path.dirname(os.path.abspath('.')))
@@ -22,7 +24,7 @@ except ImportError:
         return orig_import(name, *args)
 
     with patch('__builtin__.__import__', side_effect=import_mock):
-        from canvas import Canvas
+        from canvas import Canvas, TextCache, CanvasPool
 
 
 def get_mock_output(width=128, height=64, mode="1"):
@@ -177,6 +179,27 @@ class TestCanvas(unittest.TestCase):
         assert(c.get_image().mode == o.device_mode)
         assert(imgs_are_equal(c.get_image(), test_image))
 
+    def test_invert_handed_out_image(self):
+        """tests that in-place operations don't change images returned by get_image()"""
+        test_image = get_image("canvas_10.png")
+        o = get_mock_output()
+        c = Canvas(o, name=c_name)
+        c.text("Hello world", (5, 5))
+        before = c.get_image().copy()
+        for operation in (c.invert, lambda: c.invert_rect((35, 5, 80, 17)), c.clear):
+            image = c.get_image()
+            operation()
+            assert(imgs_are_equal(image, before))
+            assert(c.get_image() is not image)
+            before = c.get_image().copy()
+        # Images that weren't handed out are still changed in place
+        c = Canvas(o, name=c_name)
+        image = c.image
+        c.text("Hello world", (5, 5))
+        c.invert()
+        assert(c.image is image)
+        assert(imgs_are_equal(c.get_image(), test_image))
+
     def test_invert_region_rgb(self):
         """tests that rgb canvas inversion doesn't fail with RGB displays and returns a valid RGB image"""
         test_image = get_image("canvas_6.png")
@@ -216,6 +239,191 @@ class TestCanvas(unittest.TestCase):
 	assert(c.get_image().mode == o.device_mode)
 	assert(imgs_are_equal(c.get_image(), test_image.convert("RGB")))
 
+    def test_text_cache(self):
+        """tests that cached text rendering is pixel-exact with ImageDraw.text"""
+        texts = ["Hello world", "Hello world", "H", "Main menu entry 12", " ", u"\xe4\xf6"]
+        fonts = [None, ("Fixedsys62.ttf", 16), ("Fixedsys62.ttf", 8)]
+        for mode in ("1", "L", "RGB"):
+            o = get_mock_output(mode=mode)
+            cached = Canvas(o, name=c_name)
+            uncached = Canvas(o, name=c_name)
+            uncached.text_cache = None
+            for font in fonts:
+                for i, text in enumerate(texts):
+                    for c in (cached, uncached):
+                        c.clear()
+                        c.text(text, (i, i*2), font=font)
+                        c.text(text, ("-30", "-20"), font=font, fill="red" if mode == "RGB" else "white")
+                    assert(imgs_are_equal(cached.get_image(), uncached.get_image()))
+                    assert(cached.get_text_bounds(text, font=font) == uncached.get_text_bounds(text, font=font))
+
+    def test_text_cache_lru(self):
+        """tests that the line cache is bounded and glyphs are cached separately"""
+        cache = TextCache(max_lines=3)
+        c = Canvas(get_mock_output(), name=c_name)
+        c.text_cache = cache
+        for text in ["a", "line 1", "line 2", "line 3", "line 1", "line 4"]:
+            c.text(text, (0, 0))
+        assert(len(cache.glyphs) == 1)
+        assert(list(text for _, text, _ in cache.lines.keys()) == ["line 3", "line 1", "line 4"])
+        assert(cache.hits == 1)
+
+    def test_text_cache_fonts(self):
+        """tests that the glyph cache is bounded and fonts are keyed by file and size"""
+        cache = TextCache(max_glyphs=3)
+        c = Canvas(get_mock_output(), name=c_name)
+        c.text_cache = cache
+        path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fonts", "Fixedsys62.ttf")
+        for _ in range(5):
+            # A new font object for each call
+            c.text("a", (0, 0), font=ImageFont.truetype(path, 16))
+        assert(len(cache.glyphs) == 1)
+        for char in "bcde":
+            c.text(char, (0, 0))
+        assert(len(cache.glyphs) == 3)
+
+    def test_text_cache_fallback(self):
+        """tests that text is drawn with ImageDraw.text if PIL internals are missing"""
+        o = get_mock_output()
+        cached = Canvas(o, name=c_name)
+        uncached = Canvas(o, name=c_name)
+        uncached.text_cache = None
+        draw = Mock(wraps=cached.draw, spec=["text"])
+        cached.draw = draw
+        cached.text("line", (2, 3))
+        uncached.text("line", (2, 3))
+        assert(draw.text.called)
+        assert(imgs_are_equal(cached.get_image(), uncached.get_image()))
+
+    def test_coordinate_cache(self):
+        """tests that string offsets are resolved for each canvas size separately"""
+        for w, h in ((128, 64), (320, 240), (128, 64)):
+            c = Canvas(get_mock_output(width=w, height=h), name=c_name)
+            assert (c.check_coordinates(("-2", "-3")) == (w-2, h-3))
+            assert (c.check_coordinates(("-0", "-1", "-2", "-3")) == (w-2, h-3, w, h-1))
+            assert (c.resolve_coordinates(("-0", "-1", "-2", "-3")) == (w, h-1, w-2, h-3))
+            assert (c.check_coordinates([5, 1.0]) == (5, 1))
+
+    def test_coordinate_cache_immutable(self):
+        """tests that callers can't modify the cached coordinates"""
+        c = Canvas(get_mock_output(width=128, height=64), name=c_name)
+        resolved = c.resolve_coordinates(("-10", "-10", "-1", "-1"))
+        assert (type(resolved) is tuple)
+        assert (c.resolve_coordinates(("-10", "-10", "-1", "-1")) is resolved)
+        c.line(("-10", "-10", "-1", "-1"))
+        c.draw_batch(lines=[("-10", "-10", "-1", "-1")])
+        assert (c.resolve_coordinates(("-10", "-10", "-1", "-1")) == (118, 54, 127, 63))
+
+    def test_line_direction(self):
+        """tests that lines aren't mirrored when going right-to-left"""
+        c = Canvas(get_mock_output(), name=c_name)
+        c.line((10, 0, 0, 10))
+        assert(c.get_image().getpixel((10, 0)) and c.get_image().getpixel((0, 10)))
+        assert(not c.get_image().getpixel((0, 0)))
+
+    def test_draw_batch(self):
+        """tests that batched drawing matches drawing the primitives one by one"""
+        points = [(x, (x*7) % 64) for x in range(0, 128, 3)]
+        lines = [(64, 32, 100, 5), (64, 32, 30, "-5"), ("-1", 0, 0, "-1")]
+        rectangles = [(0, 0, "-1", "-1"), (70, 40, 50, 20)]
+        batched = Canvas(get_mock_output(), name=c_name)
+        batched.draw_batch(points=points, lines=lines, rectangles=rectangles, width=2)
+        expected = Canvas(get_mock_output(), name=c_name)
+        for rectangle in rectangles:
+            expected.rectangle(rectangle)
+        for line in lines:
+            expected.line(line, width=2)
+        expected.point(points)
+        assert(imgs_are_equal(batched.get_image(), expected.get_image()))
+        checked = Canvas(get_mock_output(), name=c_name)
+        checked.draw_batch(points=points, lines=[expected.resolve_coordinates(l) for l in lines],
+                           rectangles=[expected.check_coordinates(r) for r in rectangles], width=2, checked=True)
+        assert(imgs_are_equal(checked.get_image(), expected.get_image()))
+
+    def test_invert_rect_regions(self):
+        """tests that in-place region inversion matches inverting through mode conversions"""
+        rng = random.Random(42)
+        for mode in ("1", "L", "RGB"):
+            o = get_mock_output(mode=mode)
+            c = Canvas(o, name=c_name)
+            c.text("Hello world", (5, 5))
+            c.text("Hello world", ("-60", "-20"), font=("Fixedsys62.ttf", 16))
+            for i in range(50):
+                x1, x2 = sorted(rng.sample(range(c.width+1), 2))
+                y1, y2 = sorted(rng.sample(range(c.height+1), 2))
+                expected = c.get_image().copy()
+                convert_invert_rect(expected, (x1, y1, x2, y2))
+                c.invert_rect((x1, y1, x2, y2))
+                assert(imgs_are_equal(c.get_image(), expected))
+
+    def test_invert_in_place(self):
+        """tests that inversion happens in place, so that drawing still works afterwards"""
+        test_image = get_image("canvas_10.png")
+        c = Canvas(get_mock_output(), name=c_name)
+        image = c.image
+        c.invert()
+        c.text("Hello world", (5, 5), fill="black")
+        c.invert()
+        assert(c.image is image)
+        c.text("Hello world", (5, 5))
+        c.invert()
+        assert(imgs_are_equal(c.get_image(), test_image))
+
+    def test_clear(self):
+        """tests that clear() fills the same area as rectangle() does"""
+        for coords in [None, (0, 0, 10, 10), (5, 3, 127, 63), (20, 10, 20, 40)]:
+            c = Canvas(get_mock_output(), name=c_name)
+            c.clear(fill="white")
+            c.clear(coords)
+            expected = Image.new("1", c.size, "white")
+            ImageDraw.Draw(expected).rectangle(coords if coords else (0, 0, c.width, c.height), fill="black")
+            assert(imgs_are_equal(c.get_image(), expected))
+
+    def test_canvas_pool(self):
+        """tests that the pool only reuses canvases once nothing else references their images"""
+        pool = CanvasPool(get_mock_output())
+        c = pool.get()
+        c.text("test", (0, 0))
+        displayed = c.get_image()
+        del c
+        # Image is still referenced (i.e. shown on the display) - has to be left alone
+        c2 = pool.get()
+        assert(c2.get_image() is not displayed)
+        assert(displayed.getbbox() is not None)
+        c2.rectangle((0, 0, 20, 20))
+        displayed = c2.get_image()
+        del c2
+        # The first frame was superseded - its canvas is reused, and cleared
+        c3 = pool.get()
+        assert(c3.get_image().getbbox() is None)
+        assert(pool.get_stats() == {"allocated":2, "reused":1})
+
+    def test_canvas_pool_base_image(self):
+        """tests that pooled canvases work like Canvas(o, base_image=image)"""
+        o = get_mock_output()
+        pool = CanvasPool(o, max_size=1)
+        pool.get().text("test", (0, 0))
+        base_image = Canvas(o).get_image()
+        base_image.paste(1, (10, 10, 30, 30))
+        c = pool.get(base_image=base_image)
+        assert(pool.get_stats()["reused"] == 1)
+        assert(imgs_are_equal(c.get_image(), base_image))
+        assert(c.get_image() is not base_image)
+        # No free canvases left - an unpooled one is returned
+        c2 = pool.get()
+        assert(c2 is not c)
+        assert(pool.get_stats() == {"allocated":1, "reused":1})
+
+def convert_invert_rect(image, coords):
+    """The way Canvas.invert_rect() used to work"""
+    image_subset = image.crop(coords)
+    if image_subset.mode == "1":
+        image_subset = ImageOps.invert(image_subset.convert("L")).convert("1")
+    else:
+        image_subset = ImageOps.invert(image_subset)
+    ImageDraw.Draw(image).rectangle(coords, fill="black", outline="black")
+    image.paste(image_subset, (coords[0], coords[1]))
+
 def imgs_are_equal(i1, i2):
     return ImageChops.difference(i1, i2).getbbox() is None
 
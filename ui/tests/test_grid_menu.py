@@ -202,5 +202,29 @@ class TestGridMenu(unittest.TestCase):
         assert o.display_data.call_count == 1 #One in to_foreground
         assert o.display_data.call_args[0] == ('A0', 'A1', 'A2', 'Back')
 
+    def test_tile_cache(self):
+        """Tests that labels are only rendered once, until the contents are changed"""
+        o = get_mock_graphical_output()
+        contents = [["A" + str(i), "a" + str(i)] for i in range(20)]
+        mu = GridMenu(contents, get_mock_input(), o, name=mu_name, config={})
+        Canvas.fonts_dir = fonts_dir
+        mu.to_foreground()
+        first_frame = o.display_image.call_args[0][0]
+        with patch.object(Canvas, 'text') as text:
+            for i in range(4):
+                mu.move_down()
+            for i in range(4):
+                mu.move_up()
+            assert not text.called
+        # Same selection, same page - the frame should be the same
+        frame = o.display_image.call_args[0][0]
+        assert frame is not first_frame
+        assert frame.tobytes() == first_frame.tobytes()
+        mu.set_contents([["B" + str(i), "b" + str(i)] for i in range(20)])
+        with patch.object(Canvas, 'text') as text:
+            mu.refresh()
+            labels = [call[0][0] for call in text.call_args_list]
+        assert labels == ["B" + str(i) for i in range(9)]
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,92 @@
+"""tests for IconAtlas"""
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import patch, Mock
+from PIL import Image, ImageOps, ImageChops
+
+try:
+    from ui import IconAtlas
+    resources_dir = "resources/"
+except ImportError:
+    print("Absolute imports failed, trying relative imports")
+    os.sys.path.append(os.path.dirname(os.path.abspath('.')))
+    # Store original __import__
+    orig_import = __import__
+
+    def import_mock(name, *args):
+        if name in ['helpers']:
+            return Mock()
+        return orig_import(name, *args)
+
+    with patch('__builtin__.__import__', side_effect=import_mock):
+        from icon_atlas import IconAtlas
+    resources_dir = "../../resources/"
+
+
+class TestIconAtlas(unittest.TestCase):
+    """tests IconAtlas class"""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.icons = [f for f in os.listdir(resources_dir) if f.endswith(".png")]
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def get_atlas(self, mode="1"):
+        atlas = IconAtlas(mode, cache_path=os.path.join(self.dir, "atlas"), max_width=100)
+        for f in self.icons:
+            atlas.add(f, os.path.join(resources_dir, f))
+        atlas.add("inverted", os.path.join(resources_dir, self.icons[0]), invert=True)
+        atlas.load()
+        return atlas
+
+    def assert_same_paste(self, icon, reference, mode):
+        # Icons pasted from the atlas need to look the same as the original icons pasted
+        c1 = Image.new(mode, (40, 30))
+        c1.paste(reference, (2, 3))
+        c2 = Image.new(mode, (40, 30))
+        c2.paste(icon, (2, 3))
+        assert(ImageChops.difference(c1, c2).getbbox() is None)
+
+    def test_icons_match(self):
+        for mode in ("1", "RGB"):
+            atlas = self.get_atlas(mode)
+            for f in self.icons:
+                icon = atlas.get(f)
+                assert(icon.mode == mode)
+                self.assert_same_paste(icon, Image.open(os.path.join(resources_dir, f)), mode)
+            inverted = ImageOps.invert(Image.open(os.path.join(resources_dir, self.icons[0])).convert("L"))
+            self.assert_same_paste(atlas.get("inverted"), inverted, mode)
+
+    def test_cache(self):
+        atlas = self.get_atlas()
+        with patch.object(IconAtlas, "build") as build:
+            cached_atlas = self.get_atlas()
+            assert(not build.called)
+        assert(cached_atlas.regions == atlas.regions)
+        assert(ImageChops.difference(cached_atlas.image, atlas.image).getbbox() is None)
+        # A different set of icons needs the atlas to be rebuilt
+        atlas = IconAtlas("1", cache_path=os.path.join(self.dir, "atlas"))
+        atlas.add("icon", os.path.join(resources_dir, self.icons[0]))
+        atlas.load()
+        assert(atlas.regions.keys() == ["icon"])
+
+    def test_interrupted_save(self):
+        atlas = self.get_atlas()
+        index_path, data_path = atlas.get_cache_paths()
+        # Writing the data fails half-way - the previous cache stays intact
+        with patch.object(atlas.image, "tobytes", side_effect=IOError):
+            atlas.save_cache(atlas.get_source_stamps())
+        with patch.object(IconAtlas, "build") as build:
+            self.get_atlas()
+            assert(not build.called)
+        assert(sorted(os.listdir(self.dir)) == sorted([os.path.basename(index_path), os.path.basename(data_path),
+                                                       os.path.basename(data_path) + ".tmp"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
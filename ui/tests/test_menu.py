@@ -4,9 +4,11 @@ import unittest
 from threading import Event
 
 from mock import patch, Mock
+from PIL import ImageChops
 
 try:
     from ui import Menu, Entry
+    from ui.menu import MenuRenderingMixin
     from ui.base_list_ui import Canvas
     fonts_dir = "ui/fonts"
 except ImportError:
@@ -24,7 +26,7 @@ except ImportError:
         return orig_import(name, *args)
 
     with patch('__builtin__.__import__', side_effect=import_mock):
-        from menu import Menu
+        from menu import Menu, MenuRenderingMixin
         from entry import Entry
         from base_list_ui import Canvas
         fonts_dir = "../fonts"
@@ -218,6 +220,70 @@ class TestMenu(unittest.TestCase):
         assert o.display_image.called
         assert o.display_image.call_count == 1 #One in to_foreground
 
+    def test_incremental_rendering(self):
+        """Tests that incrementally rendered frames match the frames rendered from scratch"""
+        cb = lambda: None
+        contents = [["Entry {}".format(i) * (3 if i % 4 == 1 else 1), cb, cb if i % 3 == 0 else None] for i in range(20)]
+        eh2_contents = [[["Entry {}".format(i), "line 2 y"], cb, cb if i % 2 else None] for i in range(10)]
+        for view in ("EightPtView", "SixteenPtView"):
+            for mode in ("1", "RGB"):
+                self.incremental_rendering_runner(contents, 1, view, mode)
+                self.incremental_rendering_runner(eh2_contents, 2, view, mode)
+
+    def incremental_rendering_runner(self, contents, entry_height, view, mode):
+        o = get_mock_graphical_output(mode=mode)
+        mu = Menu(contents, get_mock_input(), o, name=mu_name, entry_height=entry_height, config={"base_list_ui": {"default": view}})
+        Canvas.fonts_dir = fonts_dir
+        def check():
+            image = o.display_image.call_args[0][0]
+            assert ImageChops.difference(image, mu.view.draw_full_image()).getbbox() is None
+        mu.to_foreground()
+        check()
+        if view == "EightPtView" and entry_height == 1:
+            # Moving the cursor only redraws the lines around its old and new positions
+            with patch.object(mu.view, "draw_menu_text", wraps=mu.view.draw_menu_text) as p:
+                mu.move_down()
+            check()
+            assert len([line for line in p.call_args[0][1] if line is not None]) == 4
+        steps = [mu.move_down]*5 + [mu.scroll]*25 + [mu.move_down]*20 + [mu.page_up, mu.move_up, mu.move_up, mu.move_to_start] \
+                + [mu.page_down, mu.move_to_end, mu.move_down, mu.move_up, mu.move_to_start]
+        for step in steps:
+            step()
+            check()
+        mu.set_contents(contents[:3])
+        mu.refresh()
+        check()
+        assert len(mu.view.band_states) == 64/mu.view.charheight
+
+    def test_incremental_rendering_graphics(self):
+        """Tests that graphics depending on entry attributes are redrawn when only the attributes change"""
+        class MarkerMixin(MenuRenderingMixin):
+            def draw_graphic(self, c, index):
+                entry = self.el.contents[self.first_displayed_entry + index/self.entry_height]
+                if getattr(entry, "marked", False):
+                    c.rectangle((c.width-4, index*self.charheight+2, c.width-2, index*self.charheight+4))
+
+        class MarkerExtrasMixin(MarkerMixin):
+            def get_line_extras(self, index):
+                entry = self.el.contents[self.first_displayed_entry + index/self.entry_height]
+                return (MenuRenderingMixin.get_line_extras(self, index), getattr(entry, "marked", False))
+
+        for mixin in (MarkerMixin, MarkerExtrasMixin):
+            contents = [Entry("Network", marked=False), Entry("Network", marked=True), Entry("Other", marked=False)]
+            MarkerMenu = type("MarkerMenu", (Menu,), {"view_mixin": mixin})
+            o = get_mock_graphical_output()
+            mu = MarkerMenu(contents, get_mock_input(), o, name=mu_name, config={"base_list_ui": {"default": "EightPtView"}})
+            Canvas.fonts_dir = fonts_dir
+            def check():
+                image = o.display_image.call_args[0][0]
+                assert ImageChops.difference(image, mu.view.draw_full_image()).getbbox() is None
+            mu.to_foreground()
+            check()
+            for entry in contents:
+                entry.marked = not entry.marked
+                mu.refresh()
+                check()
+
     def test_callback_is_executed(self):
         num_elements = 2
         contents = [["A" + str(i), "a" + str(i)] for i in range(num_elements)]
@@ -7,6 +7,7 @@ from mock import patch, Mock
 try:
     from ui import Menu, HelpOverlay, FunctionOverlay, GridMenu, GridMenuLabelOverlay, IntegerAdjustInputOverlay, IntegerAdjustInput, SpinnerOverlay
     from ui.base_list_ui import Canvas
+    from ui import overlays
     fonts_dir = "ui/fonts"
 except ImportError:
     print("Absolute imports failed, trying relative imports")
@@ -27,6 +28,7 @@ except ImportError:
         from menu import Menu
         from grid_menu import GridMenu
         from base_list_ui import Canvas
+        import overlays
         from number_input import IntegerAdjustInput
         fonts_dir = "../fonts"
 
@@ -301,5 +303,45 @@ class TestOverlays(unittest.TestCase):
         with patch.object(mu, 'activate', side_effect=activate) as p:
             mu.activate()
 
+    def test_layers_cached(self):
+        """tests that overlay layers are only rendered when the overlay state changes"""
+        Canvas.fonts_dir = fonts_dir
+        o = get_mock_graphical_output()
+        mu = Menu([["Entry", "entry"]], get_mock_input(), o, name=ui_name, config={})
+        mu.idle_loop = lambda *a, **k: True
+        spinner = SpinnerOverlay()
+        spinner.apply_to(mu)
+        HelpOverlay(lambda: True).apply_to(mu)
+        mu.before_foreground()
+        mu.to_foreground()
+        spinner.set_state(mu, True)
+        with patch.object(overlays, 'render_layer', side_effect=overlays.render_layer) as render_layer:
+            for i in range(8):
+                mu.refresh()
+            # One layer for each spinner stage, help icon layer was rendered before
+            assert(render_layer.call_count == 4)
+        # Layers are pasted in place, compared to drawing the overlays the usual way
+        image = mu.view.get_displayed_image()
+        c = Canvas(o, base_image=image)
+        spinner.draw_spinner(c, mu.overlay_compositor.overlays[0].uie[ui_name].spinner_stage)
+        HelpOverlay(lambda: True).draw_icon(c)
+        assert(o.display_image.call_args[0][0].tobytes() == c.get_image().tobytes())
+
+    def test_default_draw_layer(self):
+        """tests that overlays which don't draw a layer leave the frame unchanged"""
+        class StateOverlay(overlays.BaseOverlay):
+            def apply_to(self, ui_el):
+                overlays.BaseOverlay.apply_to(self, ui_el)
+                self.wrap_view(ui_el)
+            def get_layer_state(self, ui_el):
+                return True
+        Canvas.fonts_dir = fonts_dir
+        o = get_mock_graphical_output()
+        mu = Menu([["Entry", "entry"]], get_mock_input(), o, name=ui_name, config={})
+        StateOverlay().apply_to(mu)
+        mu.to_foreground()
+        image = mu.view.get_displayed_image()
+        assert(o.display_image.call_args[0][0].tobytes() == image.tobytes())
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,6 +1,8 @@
 """tests for Refresher"""
 import os
 import unittest
+from time import sleep
+from threading import Thread, Event
 
 from mock import patch, Mock
 
@@ -8,6 +10,7 @@ from PIL import Image
 
 try:
     from ui import Refresher, RefresherExitException, RefresherView
+    from helpers import TimerScheduler
 except ImportError:
     print("Absolute imports failed, trying relative imports")
     os.sys.path.append(os.path.dirname(os.path.abspath('.')))
@@ -183,30 +186,173 @@ class TestRefresher(unittest.TestCase):
     def test_set_interval(self):
         """
         Tests whether the refresh_interval of Refresher is set correctly
-        when using set_refresh_interval.
+        when using set_refresh_interval, and whether the next refresh is rescheduled.
         """
         i = get_mock_input()
         o = get_mock_output()
         r = Refresher(lambda: "Hello", i, o, name=r_name, refresh_interval=1)
 
         assert(r.refresh_interval == 1)
-        assert(r.sleep_time == 0.1)
-        assert(r.iterations_before_refresh == 10)
-        # Refresh intervals up until 0.1 don't change the sleep time
-        r.set_refresh_interval(0.1)
-        assert(r.refresh_interval == 0.1)
-        assert(r.sleep_time == 0.1)
-        assert(r.iterations_before_refresh == 1)
-        # Refresh intervals less than 0.1 change sleep_time to match refresh interval
         r.set_refresh_interval(0.01)
         assert(r.refresh_interval == 0.01)
-        assert(r.sleep_time == 0.01)
-        assert(r.iterations_before_refresh == 1)
-        # Now setting refresh_interval to a high value
+        self.assertRaises(ValueError, r.set_refresh_interval, 0)
+        # A running refresher - the next refresh moves along with the interval
+        r.to_foreground()
+        r.idle_loop()
+        deadline = r.next_refresh
         r.set_refresh_interval(10)
         assert(r.refresh_interval == 10)
-        assert(r.sleep_time == 0.1) # Back to normal
-        assert(r.iterations_before_refresh == 100)
+        assert(abs(r.next_refresh - (deadline + 9.99)) < 0.0001)
+
+    def test_wakes_up_on_deactivate(self):
+        """Tests that the Refresher exits immediately, no matter the refresh interval"""
+        i = get_mock_input()
+        o = get_mock_output()
+        r = Refresher(lambda: "Hello", i, o, name=r_name, refresh_interval=100)
+        t = Thread(target=r.activate)
+        t.daemon = True
+        t.start()
+        r.wait_for_active()
+        sleep(0.05)
+        r.deactivate()
+        t.join(1)
+        assert(not t.is_alive())
+        assert(o.display_data.call_count == 1) # Only the to_foreground() refresh
+        assert(not r.scheduler.is_scheduled(r.timer_name))
+
+    def test_idle_wakeups(self):
+        """Tests that a visible Refresher only wakes up for its refreshes"""
+        i = get_mock_input()
+        o = get_mock_output()
+        r = Refresher(lambda: "Hello", i, o, name=r_name, refresh_interval=0.5)
+        r.scheduler = TimerScheduler()
+        wakes = []
+        wake = r.wake
+        r.wake = lambda: wakes.append(None) or wake()
+        t = Thread(target=r.activate)
+        t.daemon = True
+        t.start()
+        r.wait_for_active()
+        sleep(1.2)
+        r.deactivate()
+        t.join(1)
+        assert(o.display_data.call_count == 3) # to_foreground() and two refreshes
+        # One wakeup of the scheduler thread and of the Refresher per refresh,
+        # and the ones caused by activation and deactivation - polling would be ~25
+        assert(r.scheduler.wakeups <= 6)
+        assert(len(wakes) <= 6)
+        r.scheduler.stop()
+
+    def test_short_intervals(self):
+        """Tests that the Refresher refreshes on time with intervals shorter than 0.1s"""
+        i = get_mock_input()
+        o = get_mock_output()
+        r = Refresher(lambda: "Hello", i, o, name=r_name, refresh_interval=0.02)
+        r.to_foreground()
+        for x in range(10):
+            r.idle_loop()
+        assert(o.display_data.call_count == 11)
+        stats = r.get_stats()
+        assert(stats["refreshes"] == 10)
+        assert(0 <= stats["mean_jitter"] <= stats["max_jitter"])
+
+    def test_overrun_stats(self):
+        """Tests that refreshes taking longer than the interval are counted and skipped"""
+        i = get_mock_input()
+        o = get_mock_output()
+        def slow_refresh():
+            sleep(0.05)
+            return "Hello"
+        r = Refresher(slow_refresh, i, o, name=r_name, refresh_interval=0.02)
+        r.to_foreground()
+        r.idle_loop()
+        stats = r.get_stats()
+        assert(stats["refreshes"] == 1)
+        assert(stats["overruns"] == 1)
+        assert(stats["missed"] >= 1)
+
+    def test_async_refresh(self):
+        """Tests that with async_refresh, the last data stays on screen while the fresh data is fetched"""
+        i = get_mock_input()
+        o = get_mock_output()
+        fetch_allowed = Event()
+        counter = [0]
+        def slow_refresh():
+            fetch_allowed.wait()
+            fetch_allowed.clear()
+            counter[0] += 1
+            return str(counter[0])
+        r = Refresher(slow_refresh, i, o, name=r_name, async_refresh=True)
+        # The first frame is waited for - there's nothing to show otherwise
+        fetch_allowed.set()
+        r.to_foreground()
+        o.display_data.assert_called_with("1")
+        # Next refreshes don't block, showing the last data
+        o.display_data.reset_mock()
+        r.refresh()
+        o.display_data.assert_called_once_with("1")
+        r.refresh() # Doesn't start another fetch while one is running
+        fetch_allowed.set()
+        for _ in range(50):
+            if o.display_data.call_args[0] == ("2",):
+                break
+            sleep(0.01)
+        o.display_data.assert_called_with("2")
+        assert(counter[0] == 2)
+
+    def test_async_refresh_timeout(self):
+        """Tests that async_refresh fetches that time out are abandoned, and their results discarded"""
+        i = get_mock_input()
+        o = get_mock_output()
+        hung_fetch = Event()
+        def refresh_function():
+            if not hung_fetch.is_set():
+                hung_fetch.set()
+                sleep(0.1)
+                return "Stale"
+            return "Fresh"
+        r = Refresher(refresh_function, i, o, name=r_name, async_refresh=True, refresh_timeout=0.02)
+        r.to_foreground()
+        assert(not o.display_data.called)
+        r.refresh()
+        sleep(0.15)
+        o.display_data.assert_called_with("Fresh")
+        assert(("Stale",) not in [c[0] for c in o.display_data.call_args_list])
+        assert(r.get_stats()["fetch_timeouts"] == 1)
+
+    def test_async_refresh_cancel_first_fetch(self):
+        """Tests that deactivating during the first async fetch doesn't leave activate() waiting"""
+        i = get_mock_input()
+        o = get_mock_output()
+        def slow_refresh():
+            sleep(0.5)
+            return "Hello"
+        r = Refresher(slow_refresh, i, o, name=r_name, async_refresh=True)
+        t = Thread(target=r.activate)
+        t.daemon = True
+        t.start()
+        sleep(0.1)
+        r.deactivate()
+        t.join(1)
+        assert(not t.is_alive())
+        sleep(0.5)
+        # The cancelled fetch's result is discarded
+        assert(not o.display_data.called)
+
+    def test_async_refresh_exit_exception(self):
+        """Tests that RefresherExitException in an async fetch exits the Refresher"""
+        i = get_mock_input()
+        o = get_mock_output()
+        def exiting_refresh():
+            sleep(0.05)
+            raise RefresherExitException
+        r = Refresher(exiting_refresh, i, o, name=r_name, async_refresh=True)
+        t = Thread(target=r.activate)
+        t.daemon = True
+        t.start()
+        t.join(1)
+        assert(not t.is_alive())
+        assert(not r.is_active)
 
     def test_update_keymap(self):
         """Tests whether the Refresher updates the keymap correctly."""